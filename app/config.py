@@ -2,18 +2,23 @@
 import os
 from dotenv import load_dotenv
 
+# Nessun print né accesso al filesystem all'import: i messaggi di avvio vengono raccolti
+# qui e stampati da print_config_summary(), le directory create da prepare_directories()
+_STARTUP_MESSAGES = []
+
 # Carica environment variables
-try:
-    load_dotenv()
-    print("✅ File .env caricato")
-except:
-    print("⚠️  File .env non trovato - uso variabili Railway")
+if load_dotenv():
+    _STARTUP_MESSAGES.append("✅ File .env caricato")
+else:
+    _STARTUP_MESSAGES.append("⚠️  File .env non trovato - uso variabili Railway")
 
 # ===== APPLICAZIONE =====
 APP_HOST = os.getenv("APP_HOST", "0.0.0.0")
 APP_PORT = int(os.getenv("APP_PORT", 8000))
 DEBUG = os.getenv("DEBUG", "False").lower() in ("true", "1", "t", "yes")
 APP_VERSION = os.getenv("APP_VERSION", "2.0.0-custom-rag")
+# Avvio minimo: nessun modello spaCy (intent solo a keyword) e nessun pre-caricamento
+FAST_START = os.getenv("FAST_START", "false").lower() in ("true", "1", "t", "yes")
 
 # ===== OPENAI CONFIGURATION =====
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -22,20 +27,20 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 USE_MOCK_ENV = os.getenv("USE_MOCK", "").lower()
 if USE_MOCK_ENV in ("true", "1", "t", "yes"):
     USE_MOCK = True
-    print("🎭 Modalità MOCK forzata")
+    _STARTUP_MESSAGES.append("🎭 Modalità MOCK forzata")
 elif USE_MOCK_ENV in ("false", "0", "f", "no"):
     if not OPENAI_API_KEY:
-        print("⚠️  USE_MOCK=false ma OPENAI_API_KEY mancante. Forzo MOCK.")
+        _STARTUP_MESSAGES.append("⚠️  USE_MOCK=false ma OPENAI_API_KEY mancante. Forzo MOCK.")
         USE_MOCK = True
     else:
         USE_MOCK = False
-        print("✅ Modalità Custom RAG attiva")
+        _STARTUP_MESSAGES.append("✅ Modalità Custom RAG attiva")
 else:
     USE_MOCK = not bool(OPENAI_API_KEY)
     if USE_MOCK:
-        print("🎭 OPENAI_API_KEY mancante. Modalità MOCK attiva.")
+        _STARTUP_MESSAGES.append("🎭 OPENAI_API_KEY mancante. Modalità MOCK attiva.")
     else:
-        print("✅ OPENAI_API_KEY trovata. Custom RAG disponibile.")
+        _STARTUP_MESSAGES.append("✅ OPENAI_API_KEY trovata. Custom RAG disponibile.")
 
 # ===== CUSTOM RAG CONFIGURATION =====
 # OpenAI Models
@@ -43,49 +48,54 @@ EMBEDDINGS_MODEL_NAME = os.getenv("EMBEDDINGS_MODEL_NAME", "text-embedding-ada-0
 LLM_MODEL_NAME = os.getenv("LLM_MODEL_NAME", "gpt-3.5-turbo")
 
 # Document Processing
-CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", 1000))
-CHUNK_OVERLAP = int(os.getenv("CHUNK_OVERLAP", 200))
+# Chunk misurati in token (tiktoken se installato) e divisi su titoli/articoli/frasi
+CHUNK_SIZE_TOKENS = int(os.getenv("CHUNK_SIZE_TOKENS", 300))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 40))
+# Chunk con similarità (MinHash) oltre la soglia non vengono re-embeddati (0 = disattivato)
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", 0.9))
 MAX_CONTEXT_LENGTH = int(os.getenv("MAX_CONTEXT_LENGTH", 4000))
+# Budget del contesto passato al LLM, in token (default: MAX_CONTEXT_LENGTH caratteri ≈ /4)
+MAX_CONTEXT_TOKENS = int(os.getenv("MAX_CONTEXT_TOKENS", MAX_CONTEXT_LENGTH // 4))
+# Compressione estrattiva: di ogni chunk restano le frasi più pertinenti alla domanda (elenchi interi)
+CONTEXT_COMPRESSION_ENABLED = os.getenv("CONTEXT_COMPRESSION_ENABLED", "false").lower() == "true"
+COMPRESSION_SENTENCES_PER_CHUNK = int(os.getenv("COMPRESSION_SENTENCES_PER_CHUNK", 3))
+COMPRESSION_MIN_CHUNK_TOKENS = int(os.getenv("COMPRESSION_MIN_CHUNK_TOKENS", 80))  # chunk più brevi invariati
+COMPRESSION_MIN_KEEP_RATIO = float(os.getenv("COMPRESSION_MIN_KEEP_RATIO", 0.3))  # frazione minima dei token conservata
 
 # Vector Store Configuration
 VECTOR_DB_PATH = os.getenv("VECTOR_DB_PATH", "./data/custom_vector_store.db")
 SIMILARITY_THRESHOLD = float(os.getenv("SIMILARITY_THRESHOLD", 0.2))
+# Risposte dirette dalle FAQ dei documenti (titoli-domanda), senza chiamata al LLM
+FAQ_DIRECT_ANSWERS_ENABLED = os.getenv("FAQ_DIRECT_ANSWERS_ENABLED", "true").lower() == "true"
+FAQ_LEXICAL_THRESHOLD = float(os.getenv("FAQ_LEXICAL_THRESHOLD", 0.85))  # similarità ordinata delle parole
+FAQ_EMBEDDING_THRESHOLD = float(os.getenv("FAQ_EMBEDDING_THRESHOLD", 0.95))  # cosine similarity
+# Reranker CPU di secondo stadio: RERANK_CANDIDATES dal vector store → RERANK_TOP_N al LLM
+RERANKER_ENABLED = os.getenv("RERANKER_ENABLED", "false").lower() == "true"
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", 30))
+RERANK_TOP_N = int(os.getenv("RERANK_TOP_N", 3))
+RERANK_TIME_BUDGET_MS = float(os.getenv("RERANK_TIME_BUDGET_MS", 20))
+RERANKER_WEIGHTS_PATH = os.getenv("RERANKER_WEIGHTS_PATH", "")  # JSON con pesi appresi (opzionale)
 RETRIEVER_K = int(os.getenv("RETRIEVER_K", 5))
+# Snapshot dell'indice costruito offline (python -m app.modules.index_snapshot build):
+# all'avvio con indice vuoto viene caricato al posto di estrazione ed embedding
+INDEX_SNAPSHOT_PATH = os.getenv("INDEX_SNAPSHOT_PATH", "./data/index_snapshot")
+INDEX_IVF_NPROBE = int(os.getenv("INDEX_IVF_NPROBE", 8))  # cluster IVF esplorati per query
 
 # ===== DIRECTORY CONFIGURATION =====
 DOCS_DIRECTORY = os.getenv("DOCS_DIRECTORY", "./insurance_docs")
+# Watcher: nuovi documenti indicizzati in pochi secondi, senza reindex manuale
+DOCS_WATCH_ENABLED = os.getenv("DOCS_WATCH_ENABLED", "true").lower() == "true"
+DOCS_WATCH_DEBOUNCE_SECONDS = float(os.getenv("DOCS_WATCH_DEBOUNCE_SECONDS", 2.0))
+DOCS_WATCH_POLL_INTERVAL = float(os.getenv("DOCS_WATCH_POLL_INTERVAL", 2.0))  # solo senza watchfiles
 DB_PATH = os.getenv("DB_PATH", "./chatbot_conversations.db")
 SMART_CACHE_DB_PATH = os.getenv("SMART_CACHE_DB_PATH", "./data/smart_cache.db")
 
-# Crea directories necessarie
-for directory in [
-    os.path.dirname(VECTOR_DB_PATH),
-    os.path.dirname(SMART_CACHE_DB_PATH),
-    DOCS_DIRECTORY
-]:
-    if directory and not os.path.exists(directory):
-        os.makedirs(directory, exist_ok=True)
-        print(f"📁 Creata directory: {directory}")
-
-# Verifica documenti
-if not os.path.exists(DOCS_DIRECTORY):
-    print(f"⚠️  Directory documenti {DOCS_DIRECTORY} non trovata")
-    os.makedirs(DOCS_DIRECTORY, exist_ok=True)
-else:
-    doc_files = [f for f in os.listdir(DOCS_DIRECTORY) 
-                 if f.endswith(('.txt', '.md', '.pdf'))]
-    print(f"📚 Trovati {len(doc_files)} documenti in {DOCS_DIRECTORY}")
-
 # ===== LOGGING CONFIGURATION =====
 LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
 LOG_FILE = os.getenv("LOG_FILE", "./logs/chatbot_app.log")
 LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", 1024 * 1024 * 5))  # 5MB
 LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", 3))
-
-# Crea directory logs
-log_dir = os.path.dirname(LOG_FILE)
-if log_dir and not os.path.exists(log_dir):
-    os.makedirs(log_dir, exist_ok=True)
+PERFORMANCE_METRICS_FILE = os.getenv("PERFORMANCE_METRICS_FILE", "./logs/performance_metrics.json")
 
 # ===== RAILWAY ENVIRONMENT =====
 RAILWAY_ENVIRONMENT = os.getenv("RAILWAY_ENVIRONMENT")
@@ -93,33 +103,69 @@ RAILWAY_GIT_COMMIT_SHA = os.getenv("RAILWAY_GIT_COMMIT_SHA")
 RAILWAY_GIT_BRANCH = os.getenv("RAILWAY_GIT_BRANCH")
 
 if RAILWAY_ENVIRONMENT:
-    print(f"🚄 Railway Environment: {RAILWAY_ENVIRONMENT}")
+    _STARTUP_MESSAGES.append(f"🚄 Railway Environment: {RAILWAY_ENVIRONMENT}")
     if RAILWAY_GIT_COMMIT_SHA:
-        print(f"📝 Commit: {RAILWAY_GIT_COMMIT_SHA[:8]}")
+        _STARTUP_MESSAGES.append(f"📝 Commit: {RAILWAY_GIT_COMMIT_SHA[:8]}")
     if RAILWAY_GIT_BRANCH:
-        print(f"🌿 Branch: {RAILWAY_GIT_BRANCH}")
+        _STARTUP_MESSAGES.append(f"🌿 Branch: {RAILWAY_GIT_BRANCH}")
 
 # ===== PRODUCTION/DEVELOPMENT =====
 IS_DEVELOPMENT = DEBUG or RAILWAY_ENVIRONMENT == "development"
 IS_PRODUCTION = not IS_DEVELOPMENT
 
 if IS_PRODUCTION:
-    print("🏭 Modalità PRODUZIONE")
+    _STARTUP_MESSAGES.append("🏭 Modalità PRODUZIONE")
     if LOG_LEVEL == "DEBUG":
         LOG_LEVEL = "INFO"
-        print("📝 Log level: DEBUG → INFO (produzione)")
+        _STARTUP_MESSAGES.append("📝 Log level: DEBUG → INFO (produzione)")
 else:
-    print("🔧 Modalità SVILUPPO")
+    _STARTUP_MESSAGES.append("🔧 Modalità SVILUPPO")
 
 # ===== CACHE CONFIGURATION =====
 ENABLE_MEMORY_CACHE = os.getenv("ENABLE_MEMORY_CACHE", "true").lower() == "true"
 ENABLE_PERSISTENT_CACHE = os.getenv("ENABLE_PERSISTENT_CACHE", "true").lower() == "true"
 CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 3600))
+# Cache esatta delle risposte RAG (domanda normalizzata) tramite SmartCache
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+# Cache semantica delle risposte: domande con embedding quasi identico riusano la risposta
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE_ENABLED", "true").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.95))  # cosine similarity minima
+SEMANTIC_CACHE_TTL_SECONDS = int(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", CACHE_TTL_SECONDS))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 2000))
 
 # ===== PERFORMANCE SETTINGS =====
 MAX_WORKERS = int(os.getenv("MAX_WORKERS", 4))
 REQUEST_TIMEOUT = int(os.getenv("REQUEST_TIMEOUT", 30))
 BATCH_SIZE_EMBEDDINGS = int(os.getenv("BATCH_SIZE_EMBEDDINGS", 20))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 0))  # 0 = auto (CPU del container)
+EMBEDDING_CONCURRENCY = int(os.getenv("EMBEDDING_CONCURRENCY", 2))  # richieste embedding in parallelo
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 8))  # batch in coda tra gli stadi
+
+# ===== OCR SETTINGS =====
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", 0))  # 0 = auto (CPU del container)
+OCR_MAX_IN_FLIGHT = int(os.getenv("OCR_MAX_IN_FLIGHT", 0))  # 0 = 2 pagine per worker
+OCR_CACHE_DB_PATH = os.getenv("OCR_CACHE_DB_PATH", "./data/ocr_cache.db")  # vuoto = cache disattivata
+
+OCR_ENGINE = os.getenv("OCR_ENGINE", "auto")  # auto | tesserocr (in-process) | pytesseract (subprocess)
+OCR_LANGUAGES = os.getenv("TESSERACT_LANG", "ita+eng")  # lingua preferita, verificata sul campione
+OCR_BASE_ZOOM = float(os.getenv("OCR_BASE_ZOOM", 2.0))  # zoom del rendering campione (2.0 = 144 DPI)
+OCR_ADAPTIVE_DPI = os.getenv("OCR_ADAPTIVE_DPI", "true").lower() == "true"
+OCR_TARGET_GLYPH_PX = int(os.getenv("OCR_TARGET_GLYPH_PX", 32))  # altezza parole ottimale per Tesseract
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+OCR_BINARIZE = os.getenv("OCR_BINARIZE", "false").lower() == "true"
+
+OCR_CONFIG = {
+    "OCR_WORKERS": OCR_WORKERS,
+    "OCR_MAX_IN_FLIGHT": OCR_MAX_IN_FLIGHT,
+    "OCR_CACHE_DB_PATH": OCR_CACHE_DB_PATH,
+    "OCR_ENGINE": OCR_ENGINE,
+    "OCR_LANGUAGES": OCR_LANGUAGES,
+    "OCR_BASE_ZOOM": OCR_BASE_ZOOM,
+    "OCR_ADAPTIVE_DPI": OCR_ADAPTIVE_DPI,
+    "OCR_TARGET_GLYPH_PX": OCR_TARGET_GLYPH_PX,
+    "OCR_GRAYSCALE": OCR_GRAYSCALE,
+    "OCR_BINARIZE": OCR_BINARIZE
+}
 
 # ===== RAG SPECIFIC SETTINGS =====
 # Sistema di fallback per componenti mancanti
@@ -135,16 +181,45 @@ RAG_CONFIG = {
     "OPENAI_API_KEY": OPENAI_API_KEY,
     "EMBEDDINGS_MODEL_NAME": EMBEDDINGS_MODEL_NAME,
     "LLM_MODEL_NAME": LLM_MODEL_NAME,
-    "CHUNK_SIZE": CHUNK_SIZE,
-    "CHUNK_OVERLAP": CHUNK_OVERLAP,
+    "CHUNK_SIZE_TOKENS": CHUNK_SIZE_TOKENS,
+    "CHUNK_OVERLAP_TOKENS": CHUNK_OVERLAP_TOKENS,
+    "DEDUP_THRESHOLD": DEDUP_THRESHOLD,
     "MAX_CONTEXT_LENGTH": MAX_CONTEXT_LENGTH,
+    "MAX_CONTEXT_TOKENS": MAX_CONTEXT_TOKENS,
+    "CONTEXT_COMPRESSION_ENABLED": CONTEXT_COMPRESSION_ENABLED,
+    "COMPRESSION_SENTENCES_PER_CHUNK": COMPRESSION_SENTENCES_PER_CHUNK,
+    "COMPRESSION_MIN_CHUNK_TOKENS": COMPRESSION_MIN_CHUNK_TOKENS,
+    "COMPRESSION_MIN_KEEP_RATIO": COMPRESSION_MIN_KEEP_RATIO,
     "VECTOR_DB_PATH": VECTOR_DB_PATH,
     "SIMILARITY_THRESHOLD": SIMILARITY_THRESHOLD,
     "RETRIEVER_K": RETRIEVER_K,
+    "FAQ_DIRECT_ANSWERS_ENABLED": FAQ_DIRECT_ANSWERS_ENABLED,
+    "FAQ_LEXICAL_THRESHOLD": FAQ_LEXICAL_THRESHOLD,
+    "FAQ_EMBEDDING_THRESHOLD": FAQ_EMBEDDING_THRESHOLD,
+    "RERANKER_ENABLED": RERANKER_ENABLED,
+    "RERANK_CANDIDATES": RERANK_CANDIDATES,
+    "RERANK_TOP_N": RERANK_TOP_N,
+    "RERANK_TIME_BUDGET_MS": RERANK_TIME_BUDGET_MS,
+    "RERANKER_WEIGHTS_PATH": RERANKER_WEIGHTS_PATH,
+    "INDEX_SNAPSHOT_PATH": INDEX_SNAPSHOT_PATH,
+    "INDEX_IVF_NPROBE": INDEX_IVF_NPROBE,
     "DOCS_DIRECTORY": DOCS_DIRECTORY,
+    "DOCS_WATCH_ENABLED": DOCS_WATCH_ENABLED,
+    "DOCS_WATCH_DEBOUNCE_SECONDS": DOCS_WATCH_DEBOUNCE_SECONDS,
+    "DOCS_WATCH_POLL_INTERVAL": DOCS_WATCH_POLL_INTERVAL,
     "BATCH_SIZE_EMBEDDINGS": BATCH_SIZE_EMBEDDINGS,
+    "INGEST_WORKERS": INGEST_WORKERS,
+    "EMBEDDING_CONCURRENCY": EMBEDDING_CONCURRENCY,
+    "INGEST_QUEUE_SIZE": INGEST_QUEUE_SIZE,
+    "OCR_CONFIG": OCR_CONFIG,
+    "FAST_START": FAST_START,
     "ENABLE_MEMORY_CACHE": ENABLE_MEMORY_CACHE,
-    "CACHE_TTL_SECONDS": CACHE_TTL_SECONDS
+    "CACHE_TTL_SECONDS": CACHE_TTL_SECONDS,
+    "RESPONSE_CACHE_ENABLED": RESPONSE_CACHE_ENABLED,
+    "SEMANTIC_CACHE_ENABLED": SEMANTIC_CACHE_ENABLED,
+    "SEMANTIC_CACHE_THRESHOLD": SEMANTIC_CACHE_THRESHOLD,
+    "SEMANTIC_CACHE_TTL_SECONDS": SEMANTIC_CACHE_TTL_SECONDS,
+    "SEMANTIC_CACHE_MAX_ENTRIES": SEMANTIC_CACHE_MAX_ENTRIES
 }
 
 # ===== SYSTEM PROMPT CUSTOMIZATION =====
@@ -175,20 +250,42 @@ def get_config():
     """Ritorna configurazione completa per Custom RAG System"""
     return RAG_CONFIG
 
+def prepare_directories():
+    """Crea le directory necessarie e verifica i documenti (chiamata all'avvio dell'app)"""
+    for directory in [
+        os.path.dirname(VECTOR_DB_PATH),
+        os.path.dirname(SMART_CACHE_DB_PATH),
+        os.path.dirname(LOG_FILE),
+        DOCS_DIRECTORY
+    ]:
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory, exist_ok=True)
+            print(f"📁 Creata directory: {directory}")
+    
+    # Verifica documenti
+    doc_files = [f for f in os.listdir(DOCS_DIRECTORY) 
+                 if f.endswith(('.txt', '.md', '.pdf', '.docx'))]
+    print(f"📚 Trovati {len(doc_files)} documenti in {DOCS_DIRECTORY}")
+
 def print_config_summary():
     """Stampa riassunto configurazione"""
+    for message in _STARTUP_MESSAGES:
+        print(message)
     print("=" * 60)
     print("📋 CUSTOM RAG SYSTEM - CONFIGURAZIONE")
     print("=" * 60)
     print(f"   🏠 Host:Port: {APP_HOST}:{APP_PORT}")
     print(f"   🧠 Modalità RAG: {'MOCK' if USE_MOCK else 'CUSTOM RAG ATTIVO'}")
     print(f"   🔧 Debug: {DEBUG}")
+    print(f"   ⚡ Fast start: {FAST_START}")
     print(f"   📊 Log Level: {LOG_LEVEL}")
     print(f"   💾 Vector DB: {VECTOR_DB_PATH}")
     print(f"   📁 Documenti: {DOCS_DIRECTORY}")
-    print(f"   🎯 Chunk Size: {CHUNK_SIZE} (overlap: {CHUNK_OVERLAP})")
+    print(f"   🎯 Chunk Size: {CHUNK_SIZE_TOKENS} token (overlap: {CHUNK_OVERLAP_TOKENS})")
     print(f"   🔍 Similarity Threshold: {SIMILARITY_THRESHOLD}")
     print(f"   📊 Retriever K: {RETRIEVER_K}")
+    if SEMANTIC_CACHE_ENABLED:
+        print(f"   🧩 Cache semantica: soglia {SEMANTIC_CACHE_THRESHOLD}, TTL {SEMANTIC_CACHE_TTL_SECONDS}s")
     if OPENAI_API_KEY:
         print(f"   🤖 LLM Model: {LLM_MODEL_NAME}")
         print(f"   🧮 Embeddings: {EMBEDDINGS_MODEL_NAME}")
@@ -196,6 +293,3 @@ def print_config_summary():
     if RAILWAY_ENVIRONMENT:
         print(f"   🚄 Railway: {RAILWAY_ENVIRONMENT}")
     print("=" * 60)
-
-# Auto-print configuration summary
-print_config_summary()
\ No newline at end of file
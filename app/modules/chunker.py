@@ -0,0 +1,264 @@
+# app/modules/chunker.py
+"""
+Chunker strutturale a token.
+
+Un solo passaggio lineare sul testo: le righe vengono classificate (titoli Markdown,
+articoli di polizza, righe vuote), i paragrafi divisi in frasi, e le frasi accumulate
+finché il chunk non raggiunge il budget di token. Titoli e articoli sono confini
+preferenziali: un nuovo chunk parte lì se quello corrente è già abbastanza pieno,
+mentre le sezioni brevi (es. le FAQ) vengono accorpate.
+
+I token sono contati con tiktoken se installato, altrimenti stimati dai caratteri.
+"""
+
+import importlib.util
+import logging
+import re
+from collections import deque
+from typing import Deque, Iterable, Iterator, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Encoding caricato al primo conteggio: il primo get_encoding legge (o scarica) il file BPE
+TIKTOKEN_AVAILABLE = importlib.util.find_spec("tiktoken") is not None
+_ENCODING = None
+_ENCODING_LOADED = False
+
+# Stima per testo italiano quando tiktoken non è disponibile
+_CHARS_PER_TOKEN = 4
+
+_HEADING_RE = re.compile(r"^\s{0,3}#{1,6}\s+\S")
+_ARTICLE_RE = re.compile(r"^\s*(?:Art\.|Articolo|ARTICOLO|Sezione|SEZIONE|Capitolo|CAPITOLO)\s*\d+", re.UNICODE)
+_SENTENCE_END_RE = re.compile(r"(?<=[.!?;:])\s+")
+# Confini di un testo già chunkato: fine frase, inizio di una voce di elenco o a capo
+_TRIM_BOUNDARY_RE = re.compile(r"(?<=[.!?;:])\s+|\s+(?=(?:\d{1,2}[.)]|[-•*])\s)|\n+")
+# Marcatore di voce numerata ("1.", "2)"): il suo punto non chiude una frase
+_NUMBER_MARKER_RE = re.compile(r"(?<!\S)\d{1,2}[.)](?=\s)")
+# Voce di elenco all'inizio di una frase: numero (gruppo 1) o punto elenco
+LIST_ITEM_RE = re.compile(r"^(?:(\d{1,2})[.)]|[-•*])\s")
+
+
+def _get_encoding():
+    global _ENCODING, _ENCODING_LOADED
+    if not _ENCODING_LOADED:
+        if TIKTOKEN_AVAILABLE:
+            try:
+                import tiktoken
+                _ENCODING = tiktoken.get_encoding("cl100k_base")  # encoding di ada-002 e gpt-3.5-turbo
+            except Exception as e:
+                logger.warning(f"tiktoken non utilizzabile, token stimati dai caratteri: {e}")
+        _ENCODING_LOADED = True
+    return _ENCODING
+
+
+def count_tokens(text: str) -> int:
+    """Numero di token del testo (esatto con tiktoken, stimato altrimenti)"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return max(1, (len(text) + _CHARS_PER_TOKEN - 1) // _CHARS_PER_TOKEN)
+
+
+def _sentence_boundaries(text: str) -> Iterator[re.Match]:
+    """Confini di frase del testo, escluso lo spazio che segue un marcatore di elenco"""
+    marker_ends = {marker.end() for marker in _NUMBER_MARKER_RE.finditer(text)}
+    for match in _TRIM_BOUNDARY_RE.finditer(text):
+        if match.start() not in marker_ends:
+            yield match
+
+
+def split_sentences(text: str) -> List[str]:
+    """
+    Frasi (o righe) non vuote di un testo già chunkato. Ogni voce di un elenco
+    numerato o puntato, anche se il chunk è stato ridotto a una sola riga,
+    è una frase che inizia con il suo marcatore.
+    """
+    sentences, start = [], 0
+    for match in _sentence_boundaries(text):
+        sentences.append(text[start:match.start()].strip())
+        start = match.end()
+    sentences.append(text[start:].strip())
+    return [sentence for sentence in sentences if sentence]
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Prefisso del testo che termina a fine frase ed entra in `max_tokens` ("" se nemmeno la prima frase entra)"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    end, used, start = 0, 0, 0
+    for match in _sentence_boundaries(text):
+        used += count_tokens(text[start:match.start()])
+        if used > max_tokens:
+            break
+        end, start = match.start(), match.start()
+    return text[:end].rstrip()
+
+
+def cut_to_tokens(text: str, max_tokens: int) -> str:
+    """Prefisso del testo entro `max_tokens` tagliato all'ultima parola intera, anche a metà frase"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _get_encoding()
+    if encoding is not None:
+        prefix = encoding.decode(encoding.encode(text, disallowed_special=())[:max_tokens])
+    else:
+        prefix = text[:max_tokens * _CHARS_PER_TOKEN]
+    # L'ultima parola (o l'ultimo carattere multibyte) può essere spezzata dal taglio
+    if not text[len(prefix):len(prefix) + 1].isspace():
+        last_space = prefix.rfind(" ")
+        if last_space > 0:
+            prefix = prefix[:last_space]
+    return prefix.rstrip()
+
+
+class StructuredChunker:
+    """
+    Chunker incrementale: `feed()` riceve il testo a segmenti (es. pagine) e restituisce
+    i chunk completati, `flush()` emette l'ultimo. In memoria restano solo la riga
+    e la frase in corso più le frasi del chunk corrente.
+    """
+
+    def __init__(self, max_tokens: int = 300, overlap_tokens: int = 40):
+        self.max_tokens = max(max_tokens, 16)
+        self.overlap_tokens = max(0, min(overlap_tokens, self.max_tokens // 2))
+        # Sotto questa soglia una sezione breve viene accorpata alla successiva
+        self.min_section_tokens = self.max_tokens // 2
+
+        self._line_buffer = ""
+        self._paragraph = ""
+        self._paragraph_tokens = 0
+        self._units: Deque[Tuple[str, int]] = deque()
+        self._tokens = 0
+        self._overlap_len = 0  # unità iniziali del chunk corrente ereditate come overlap
+
+    # ----- API -----
+
+    def feed(self, text: str) -> Iterator[str]:
+        """Aggiunge testo e restituisce i chunk completati"""
+        self._line_buffer += text
+        lines = self._line_buffer.split("\n")
+        # L'ultima riga può proseguire nel prossimo segmento
+        self._line_buffer = lines.pop()
+        for line in lines:
+            yield from self._process_line(line)
+
+    def flush(self) -> Iterator[str]:
+        """Emette il testo residuo come ultimo chunk"""
+        if self._line_buffer:
+            line, self._line_buffer = self._line_buffer, ""
+            yield from self._process_line(line)
+        yield from self._end_paragraph()
+        yield from self._emit(carry_overlap=False)
+
+    def chunk(self, segments: Iterable[str]) -> Iterator[str]:
+        """Chunk di un testo fornito a segmenti"""
+        for segment in segments:
+            yield from self.feed(segment)
+        yield from self.flush()
+
+    # ----- Riga / paragrafo / frase -----
+
+    def _process_line(self, line: str) -> Iterator[str]:
+        stripped = line.strip()
+        if not stripped:
+            yield from self._end_paragraph()
+            return
+
+        if _HEADING_RE.match(line) or _ARTICLE_RE.match(line):
+            yield from self._end_paragraph()
+            yield from self._section_break()
+            yield from self._add_unit(stripped)
+            return
+
+        # Una riga precedente terminata da punteggiatura ha chiuso la sua frase
+        if self._paragraph.endswith((".", "!", "?", ";", ":")):
+            yield from self._end_paragraph()
+
+        # Si divide solo la riga nuova: le frasi complete escono subito,
+        # resta in buffer solo quella in corso
+        sentences = _SENTENCE_END_RE.split(stripped)
+        tail = sentences.pop()
+        if sentences and self._paragraph:
+            sentences[0] = f"{self._paragraph} {sentences[0]}"
+            self._paragraph, self._paragraph_tokens = "", 0
+        for sentence in sentences:
+            yield from self._add_unit(sentence)
+
+        self._paragraph = f"{self._paragraph} {tail}" if self._paragraph else tail
+        self._paragraph_tokens += count_tokens(tail)
+        # Testo senza punteggiatura: il buffer viene tagliato a budget pieno
+        if self._paragraph_tokens >= self.max_tokens:
+            yield from self._end_paragraph()
+
+    def _end_paragraph(self) -> Iterator[str]:
+        if self._paragraph:
+            sentence, self._paragraph = self._paragraph, ""
+            self._paragraph_tokens = 0
+            yield from self._add_unit(sentence)
+
+    # ----- Assemblaggio chunk -----
+
+    def _add_unit(self, text: str) -> Iterator[str]:
+        tokens = count_tokens(text)
+        if tokens > self.max_tokens:
+            # Frase più lunga dell'intero budget: divisa per parole
+            pieces = self._split_long_unit(text)
+            if len(pieces) > 1:
+                for piece in pieces:
+                    yield from self._add_unit(piece)
+                return
+
+        if self._tokens + tokens > self.max_tokens and len(self._units) > self._overlap_len:
+            yield from self._emit(carry_overlap=True)
+            # L'overlap ereditato non deve impedire l'inserimento della nuova frase
+            while self._units and self._tokens + tokens > self.max_tokens:
+                _, dropped = self._units.popleft()
+                self._tokens -= dropped
+                self._overlap_len = max(0, self._overlap_len - 1)
+
+        self._units.append((text, tokens))
+        self._tokens += tokens
+
+    def _section_break(self) -> Iterator[str]:
+        """Confine di sezione: chiude il chunk se abbastanza pieno, senza overlap tra sezioni"""
+        if self._tokens >= self.min_section_tokens:
+            yield from self._emit(carry_overlap=False)
+
+    def _emit(self, carry_overlap: bool) -> Iterator[str]:
+        if len(self._units) > self._overlap_len:
+            yield " ".join(text for text, _ in self._units)
+
+        carried: List[Tuple[str, int]] = []
+        if carry_overlap and self.overlap_tokens:
+            budget = self.overlap_tokens
+            for text, tokens in reversed(self._units):
+                if tokens > budget:
+                    break
+                carried.append((text, tokens))
+                budget -= tokens
+            carried.reverse()
+
+        self._units = deque(carried)
+        self._tokens = sum(tokens for _, tokens in carried)
+        self._overlap_len = len(carried)
+
+    def _split_long_unit(self, text: str) -> List[str]:
+        words = text.split()
+        if len(words) <= 1:
+            # Nessuno spazio: taglio per caratteri
+            step = max(1, min(self.max_tokens * _CHARS_PER_TOKEN // 2, (len(text) + 1) // 2))
+            return [text[i:i + step] for i in range(0, len(text), step)]
+
+        pieces, current, current_tokens = [], [], 0
+        for word in words:
+            word_tokens = count_tokens(word) + 1
+            if current and current_tokens + word_tokens > self.max_tokens:
+                pieces.append(" ".join(current))
+                current, current_tokens = [], 0
+            current.append(word)
+            current_tokens += word_tokens
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
@@ -0,0 +1,145 @@
+# app/modules/context_compressor.py
+"""
+Compressione estrattiva del contesto prima della generazione.
+
+I chunk selezionati dal retrieval vengono divisi in frasi; ogni frase riceve uno score
+rispetto alla domanda (copertura dei termini della domanda) e di ogni chunk restano
+solo le frasi migliori, nell'ordine originale e con la fonte del chunk. Nessuna chiamata
+all'API: il costo è qualche millisecondo di CPU.
+
+Gli elenchi numerati o puntati (procedure, coperture) non vengono spezzati: se una voce
+o la frase che introduce l'elenco viene scelta, l'elenco resta intero. Ogni chunk
+compresso conserva comunque almeno `min_keep_ratio` dei suoi token.
+"""
+
+import logging
+from dataclasses import replace
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.modules.chunker import LIST_ITEM_RE, count_tokens, split_sentences
+from app.utils.text_normalization import query_terms, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Segnala nel contesto le frasi omesse tra due frasi conservate
+OMISSION_MARK = " […] "
+
+
+def list_blocks(sentences: Sequence[str]) -> List[int]:
+    """
+    Id di blocco di ogni frase: le voci consecutive di uno stesso elenco, insieme alla
+    frase che lo introduce (terminata da ':'), formano un blocco; ogni altra frase è
+    un blocco a sé. Una voce numerata che non prosegue la numerazione apre un nuovo elenco.
+    """
+    blocks: List[int] = []
+    block = -1
+    # (numerato, numero) della voce precedente; None se la frase precedente non è una voce
+    previous_item: Optional[Tuple[bool, int]] = None
+    for i, sentence in enumerate(sentences):
+        item = LIST_ITEM_RE.match(sentence)
+        if item is None:
+            block += 1
+            previous_item = None
+        else:
+            numbered = item.group(1) is not None
+            number = int(item.group(1)) if numbered else 0
+            if previous_item is not None:
+                continues = previous_item == (numbered, number - 1) if numbered else previous_item == (False, 0)
+            else:
+                continues = i > 0 and sentences[i - 1].endswith(":")
+            if not continues:
+                block += 1
+            previous_item = (numbered, number)
+        blocks.append(block)
+    return blocks
+
+
+class ExtractiveCompressor:
+    """Riduce ogni chunk alle frasi più pertinenti alla domanda"""
+
+    def __init__(self, sentences_per_chunk: int = 3, min_chunk_tokens: int = 80,
+                 min_keep_ratio: float = 0.3):
+        self.sentences_per_chunk = sentences_per_chunk
+        # Chunk già brevi passano invariati
+        self.min_chunk_tokens = min_chunk_tokens
+        # Frazione minima dei token del chunk da conservare
+        self.min_keep_ratio = min_keep_ratio
+
+        self.chunks_compressed = 0
+        self.tokens_before = 0
+        self.tokens_after = 0
+
+    @staticmethod
+    def _sentence_scores(sentences: Sequence[str], terms: List[str]) -> np.ndarray:
+        scores = np.zeros(len(sentences), dtype=np.float32)
+        if terms:
+            term_set = set(terms)
+            for i, sentence in enumerate(sentences):
+                scores[i] = len(term_set.intersection(tokenize(sentence))) / len(term_set)
+        return scores
+
+    def compress_text(self, question: str, text: str) -> str:
+        """Frasi (ed elenchi interi) più pertinenti di un chunk, nell'ordine originale"""
+        sentences = split_sentences(text)
+        if len(sentences) <= self.sentences_per_chunk:
+            return text
+
+        scores = self._sentence_scores(sentences, query_terms(question))
+        blocks = list_blocks(sentences)
+        block_tokens: Dict[int, int] = {}
+        for block, sentence in zip(blocks, sentences):
+            block_tokens[block] = block_tokens.get(block, 0) + count_tokens(sentence)
+        min_tokens = self.min_keep_ratio * sum(block_tokens.values())
+
+        # A parità di score vince la frase che viene prima (titoli, definizioni);
+        # una frase scelta porta con sé tutto il suo blocco
+        selected, kept_tokens = set(), 0
+        for i in np.argsort(-scores, kind="stable"):
+            if len(selected) >= self.sentences_per_chunk and kept_tokens >= min_tokens:
+                break
+            if blocks[i] not in selected:
+                selected.add(blocks[i])
+                kept_tokens += block_tokens[blocks[i]]
+
+        keep = [i for i, block in enumerate(blocks) if block in selected]
+        if len(keep) == len(sentences):
+            return text
+
+        parts = [sentences[keep[0]]]
+        for previous, current in zip(keep, keep[1:]):
+            parts.append(OMISSION_MARK if current > previous + 1 else " ")
+            parts.append(sentences[current])
+        return "".join(parts)
+
+    def compress(self, question: str, similar_docs: List[Tuple[float, Any]]) -> List[Tuple[float, Any]]:
+        """
+        Stessi (score, Document) con il contenuto compresso: i metadata (fonte) restano
+        quelli del chunk, il Document originale non viene modificato.
+        """
+        compressed_docs = []
+        for score, doc in similar_docs:
+            tokens = count_tokens(doc.content)
+            if tokens < self.min_chunk_tokens:
+                compressed_docs.append((score, doc))
+                continue
+            content = self.compress_text(question, doc.content)
+            compressed_tokens = count_tokens(content)
+            self.chunks_compressed += 1
+            self.tokens_before += tokens
+            self.tokens_after += compressed_tokens
+            compressed_docs.append((score, replace(doc, content=content)))
+        return compressed_docs
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "sentences_per_chunk": self.sentences_per_chunk,
+            "min_keep_ratio": self.min_keep_ratio,
+            "chunks_compressed": self.chunks_compressed,
+            "tokens_before": self.tokens_before,
+            "tokens_after": self.tokens_after,
+            "reduction_percent": (
+                round(100.0 * (1 - self.tokens_after / self.tokens_before), 1) if self.tokens_before else 0.0
+            )
+        }
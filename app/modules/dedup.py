@@ -0,0 +1,90 @@
+# app/modules/dedup.py
+"""
+Deduplicazione dei chunk prima dell'embedding.
+
+- duplicati esatti: hash del testo normalizzato (minuscole, spazi collassati)
+- quasi-duplicati: MinHash su shingle di parole + LSH a bande, verificati
+  con la similarità di Jaccard stimata (intestazioni, piè di pagina,
+  clausole legali ripetute con minime variazioni)
+
+Ogni chunk duplicato viene ricondotto al primo chunk equivalente (canonico).
+"""
+
+import hashlib
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+_MERSENNE_PRIME = (1 << 31) - 1  # prodotti a*x+b restano entro int64
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def normalize_for_hash(text: str) -> str:
+    """Normalizzazione per il confronto esatto"""
+    return " ".join(text.lower().split())
+
+
+class ChunkDeduplicator:
+    """Indice MinHash/LSH dei chunk di un singolo file"""
+
+    # Sotto questo numero di parole la stima di Jaccard è troppo rumorosa: solo confronto esatto
+    MIN_WORDS_FOR_MINHASH = 20
+
+    def __init__(self, threshold: float = 0.9, num_perm: int = 64, bands: int = 16, shingle_size: int = 3):
+        if num_perm % bands:
+            raise ValueError("num_perm deve essere multiplo di bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+
+        rng = np.random.default_rng(1)  # permutazioni fisse: risultati riproducibili
+        self._a = rng.integers(1, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, size=num_perm, dtype=np.int64)
+
+        self._exact: Dict[str, str] = {}
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._buckets: List[Dict[bytes, List[str]]] = [defaultdict(list) for _ in range(bands)]
+
+    def _signature(self, words: List[str]) -> np.ndarray:
+        shingles = {
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        }
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=4).digest(), "little") for s in shingles),
+            dtype=np.int64, count=len(shingles)
+        ) % _MERSENNE_PRIME
+        permuted = (np.outer(hashes, self._a) + self._b) % _MERSENNE_PRIME
+        return permuted.min(axis=0)
+
+    def check(self, chunk_id: str, text: str) -> Optional[str]:
+        """
+        Restituisce l'id del chunk canonico se `text` ne è un duplicato,
+        altrimenti registra il chunk come canonico e restituisce None.
+        """
+        normalized = normalize_for_hash(text)
+        digest = hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+        if digest in self._exact:
+            return self._exact[digest]
+
+        words = _WORD_RE.findall(normalized)
+        signature = None
+        if self.threshold < 1.0 and len(words) >= self.MIN_WORDS_FOR_MINHASH:
+            signature = self._signature(words)
+            candidates = set()
+            for band, buckets in enumerate(self._buckets):
+                key = signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                candidates.update(buckets.get(key, ()))
+            for candidate_id in candidates:
+                if float(np.mean(self._signatures[candidate_id] == signature)) >= self.threshold:
+                    return candidate_id
+
+        self._exact[digest] = chunk_id
+        if signature is not None:
+            self._signatures[chunk_id] = signature
+            for band, buckets in enumerate(self._buckets):
+                buckets[signature[band * self.rows:(band + 1) * self.rows].tobytes()].append(chunk_id)
+        return None
@@ -0,0 +1,167 @@
+# app/modules/docs_watcher.py
+"""
+Watcher di DOCS_DIRECTORY: creazioni, modifiche e cancellazioni di documenti
+vengono raccolte, "debounced" (una raffica come `docker cp` di una cartella
+diventa un solo aggiornamento) e applicate all'indice live in modo incrementale,
+riprocessando solo i file coinvolti.
+
+Usa watchfiles (inotify/FSEvents) se installato, altrimenti un polling di size/mtime.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import os
+import time
+from typing import Any, Dict, Optional, Set, Tuple
+
+from app.modules.rag_system import SUPPORTED_EXTENSIONS
+
+logger = logging.getLogger(__name__)
+
+# Disponibilità verificata senza importare: watchfiles viene caricato solo all'avvio del watcher
+WATCHFILES_AVAILABLE = importlib.util.find_spec("watchfiles") is not None
+
+
+class DocsWatcher:
+    """Osserva la directory dei documenti e aggiorna l'indice dell'engine live"""
+
+    def __init__(self, docs_directory: str, reindex_manager, app_state,
+                 debounce_seconds: float = 2.0, poll_interval: float = 2.0,
+                 max_batch_delay: float = 30.0):
+        self.docs_directory = os.path.abspath(docs_directory)
+        self.reindex_manager = reindex_manager
+        self.app_state = app_state
+        self.debounce_seconds = debounce_seconds
+        self.poll_interval = poll_interval
+        # Anche con eventi continui, un aggiornamento parte al più dopo questo intervallo
+        self.max_batch_delay = max_batch_delay
+
+        self._pending: Set[str] = set()
+        self._changed = asyncio.Event()
+        self._stop_event = asyncio.Event()
+        self._tasks = []
+        self.updates_applied = 0
+        self.last_update: Optional[Dict[str, Any]] = None
+
+    def start(self):
+        if self._tasks:
+            return
+        if not os.path.isdir(self.docs_directory):
+            logger.warning(f"⚠️ Watcher non avviato: directory {self.docs_directory} non trovata")
+            return
+        loop = asyncio.get_running_loop()
+        if WATCHFILES_AVAILABLE:
+            from watchfiles import awatch
+            source = self._watch_events(awatch)
+        else:
+            source = self._poll_events()
+        self._tasks = [loop.create_task(source), loop.create_task(self._apply_loop())]
+        mode = "watchfiles" if WATCHFILES_AVAILABLE else f"polling ogni {self.poll_interval}s"
+        logger.info(f"👀 Watcher documenti attivo su {self.docs_directory} ({mode})")
+
+    async def stop(self):
+        self._stop_event.set()
+        for task in self._tasks:
+            task.cancel()
+        for task in self._tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self._tasks = []
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "running": any(not task.done() for task in self._tasks),
+            "mode": "watchfiles" if WATCHFILES_AVAILABLE else "polling",
+            "pending_files": sorted(self._pending),
+            "updates_applied": self.updates_applied,
+            "last_update": self.last_update
+        }
+
+    # ----- Sorgenti di eventi -----
+
+    def _is_document(self, path: str) -> bool:
+        return (
+            os.path.dirname(os.path.abspath(path)) == self.docs_directory
+            and os.path.splitext(path)[1].lower() in SUPPORTED_EXTENSIONS
+        )
+
+    def _notify(self, names: Set[str]):
+        if names:
+            self._pending.update(names)
+            self._changed.set()
+
+    async def _watch_events(self, awatch):
+        async for changes in awatch(self.docs_directory, stop_event=self._stop_event, recursive=False):
+            self._notify({os.path.basename(path) for _, path in changes if self._is_document(path)})
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        with os.scandir(self.docs_directory) as entries:
+            for entry in entries:
+                if entry.is_file() and self._is_document(entry.path):
+                    stat = entry.stat()
+                    snapshot[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return snapshot
+
+    async def _poll_events(self):
+        previous = await asyncio.to_thread(self._snapshot)
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.poll_interval)
+            try:
+                current = await asyncio.to_thread(self._snapshot)
+            except OSError as e:
+                logger.warning(f"Watcher: lettura directory fallita: {e}")
+                continue
+            changed = {name for name in current.keys() | previous.keys() if current.get(name) != previous.get(name)}
+            previous = current
+            self._notify(changed)
+
+    # ----- Applicazione degli aggiornamenti -----
+
+    async def _apply_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._changed.wait()
+            first_event = loop.time()
+
+            # Debounce: attende una pausa negli eventi prima di aggiornare
+            while loop.time() - first_event < self.max_batch_delay:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), timeout=self.debounce_seconds)
+                except asyncio.TimeoutError:
+                    break
+
+            self._changed.clear()
+            names, self._pending = self._pending, set()
+            try:
+                await self._apply(names)
+            except Exception as e:
+                logger.error(f"❌ Watcher: aggiornamento di {sorted(names)} fallito: {e}", exc_info=True)
+
+    async def _apply(self, names: Set[str]):
+        # Stesso lock della reindicizzazione: mai due scritture concorrenti sull'indice
+        async with self.reindex_manager.ingest_lock:
+            engine = getattr(self.app_state, "rag_system", None)
+            if engine is None or not hasattr(engine, "initialize_documents"):
+                logger.warning(f"⚠️ Watcher: nessun engine RAG attivo, modifiche a {sorted(names)} ignorate")
+                return
+
+            started = time.time()
+            logger.info(f"👀 Watcher: aggiornamento incrementale di {len(names)} file: {sorted(names)}")
+            await engine.initialize_documents(self.docs_directory, only_files=names)
+
+            status = engine.ingestion_status
+            self.updates_applied += 1
+            self.last_update = {
+                "files": sorted(names),
+                "state": status.get("state"),
+                "files_processed": status.get("files_processed", 0),
+                "files_removed": status.get("files_removed", 0),
+                "files_failed": status.get("files_failed", 0),
+                "duration_ms": int((time.time() - started) * 1000),
+                "finished_at": time.time()
+            }
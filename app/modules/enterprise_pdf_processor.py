@@ -5,90 +5,307 @@ Handles ALL types of PDFs: text-based, scanned, complex layouts
 Multi-library approach with OCR fallback
 """
 
-import asyncio
-import aiosqlite
+import importlib
 import json
 import numpy as np
-import openai
 import os
 import logging
-import time
-import hashlib
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Iterator
 from pathlib import Path
-import io
-import base64
-
-# Multi-library PDF support with comprehensive fallbacks
-PDF_LIBRARIES = {}
-OCR_AVAILABLE = False
-
-# Try all PDF processing libraries
-try:
-    import fitz  # pymupdf - most robust
-    PDF_LIBRARIES["fitz"] = fitz
-    print("✅ PyMuPDF (fitz) disponibile - PDF processing robusto")
-except ImportError:
-    print("⚠️  PyMuPDF non disponibile")
-
-try:
-    import pdfplumber
-    PDF_LIBRARIES["pdfplumber"] = pdfplumber
-    print("✅ pdfplumber disponibile - layout-aware processing")
-except ImportError:
-    print("⚠️  pdfplumber non disponibile")
-
-try:
-    import PyPDF2
-    PDF_LIBRARIES["PyPDF2"] = PyPDF2
-    print("✅ PyPDF2 disponibile - fast text extraction")
-except ImportError:
-    print("⚠️  PyPDF2 non disponibile")
-
-try:
-    import pypdf
-    PDF_LIBRARIES["pypdf"] = pypdf
-    print("✅ pypdf disponibile - modern PyPDF2 alternative")
-except ImportError:
-    print("⚠️  pypdf non disponibile")
-
-# OCR capabilities for scanned PDFs
-try:
-    import pytesseract
-    from PIL import Image
-    OCR_AVAILABLE = True
-    print("✅ OCR disponibile - Tesseract + PIL")
-    
-    # Try to configure Tesseract path
-    import platform
-    if platform.system() == "Windows":
-        tesseract_paths = [
-            r'C:\Program Files\Tesseract-OCR\tesseract.exe',
-            r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe'
-        ]
-        for path in tesseract_paths:
-            if os.path.exists(path):
-                pytesseract.pytesseract.tesseract_cmd = path
-                print(f"✅ Tesseract configurato: {path}")
-                break
-    
-except ImportError:
-    print("⚠️  OCR non disponibile - pytesseract/PIL mancanti")
+import functools
+import math
+import multiprocessing
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from app.utils.ocr_cache import OCRCache
+from app.modules.ocr_engine import ocr_engine_available, get_ocr_engine
+from app.modules.chunker import StructuredChunker
+from app.modules.dedup import ChunkDeduplicator
 
 # Setup logging
 logger = logging.getLogger(__name__)
 
-@dataclass
-class PDFProcessingResult:
-    """Risultato elaborazione PDF"""
-    success: bool
-    text: str
-    pages_processed: int
-    method_used: str
-    ocr_pages: int = 0
-    error_message: str = ""
-    metadata: Dict[str, Any] = None
+# Librerie PDF in ordine di preferenza, importate al primo PDF: i processi che
+# non elaborano PDF (web worker, chat) non pagano né il tempo né la memoria
+_PDF_LIBRARY_NAMES = {
+    "fitz": "PyMuPDF (fitz) - PDF processing robusto",
+    "pdfplumber": "pdfplumber - layout-aware processing",
+    "PyPDF2": "PyPDF2 - fast text extraction",
+    "pypdf": "pypdf - modern PyPDF2 alternative",
+}
+_PDF_LIBRARIES: Optional[Dict[str, Any]] = None
+_PDF_LIBRARIES_LOCK = threading.Lock()
+
+
+def get_pdf_libraries() -> Dict[str, Any]:
+    """Librerie PDF disponibili (nome → modulo), importate una sola volta per processo"""
+    global _PDF_LIBRARIES
+    if _PDF_LIBRARIES is None:
+        with _PDF_LIBRARIES_LOCK:
+            if _PDF_LIBRARIES is None:
+                libraries = {}
+                for name, description in _PDF_LIBRARY_NAMES.items():
+                    try:
+                        libraries[name] = importlib.import_module(name)
+                        logger.info(f"✅ {description} disponibile")
+                    except ImportError:
+                        logger.info(f"⚠️  {name} non disponibile")
+                _PDF_LIBRARIES = libraries
+    return _PDF_LIBRARIES
+
+
+
+def get_available_cpus() -> int:
+    """CPU effettivamente disponibili al processo (affinity + quota cgroup del container)"""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    
+    # Railway/Docker limitano le CPU via cgroup v2 senza cambiare l'affinity
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cpus = min(cpus, max(1, math.ceil(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    
+    return max(1, cpus)
+
+
+# ===== OCR PARALLELO PER PAGINA =====
+_OCR_EXECUTOR: Optional[Executor] = None
+_OCR_EXECUTOR_LOCK = threading.Lock()
+_OCR_CACHE: Optional[OCRCache] = None
+
+
+def get_ocr_workers(options: Dict[str, Any]) -> int:
+    """
+    Dimensione del pool OCR. Dentro un worker di ingestione le CPU sono già divise
+    tra INGEST_WORKERS processi: ogni worker ne usa solo la sua quota, così i
+    Tesseract attivi restano al massimo uno per CPU invece di CPU².
+    """
+    if options.get("OCR_WORKERS"):
+        return options["OCR_WORKERS"]
+    cpus = get_available_cpus()
+    if multiprocessing.parent_process() is not None:
+        return max(1, cpus // max(1, options.get("INGEST_WORKERS") or cpus))
+    return cpus
+
+
+def _get_ocr_executor(workers: int) -> Executor:
+    """
+    Pool condiviso per l'OCR delle pagine. Nel processo principale è un process pool;
+    dentro un worker di ingestione (già processo figlio) usa thread, perché
+    Tesseract gira comunque come processo esterno e un pool annidato moltiplicherebbe i processi.
+    Il pool riceve solo i pixel già renderizzati: PyMuPDF non è thread-safe e viene
+    usato esclusivamente dal thread che estrae il documento.
+    """
+    global _OCR_EXECUTOR
+    with _OCR_EXECUTOR_LOCK:
+        if _OCR_EXECUTOR is None:
+            # Parallelismo per pagina: ogni Tesseract deve usare un solo thread OpenMP
+            os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+            if multiprocessing.parent_process() is None:
+                _OCR_EXECUTOR = ProcessPoolExecutor(max_workers=workers)
+            else:
+                _OCR_EXECUTOR = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr")
+            logger.info(f"📸 Pool OCR avviato: {workers} worker ({type(_OCR_EXECUTOR).__name__})")
+        return _OCR_EXECUTOR
+
+
+def _get_ocr_cache(cache_path: Optional[str]) -> Optional[OCRCache]:
+    """Cache OCR del worker corrente (una per processo, connessioni per thread)"""
+    global _OCR_CACHE
+    if not cache_path:
+        return None
+    if _OCR_CACHE is None or _OCR_CACHE.db_path != cache_path:
+        _OCR_CACHE = OCRCache(cache_path)
+    return _OCR_CACHE
+
+
+def _otsu_threshold(pixels: np.ndarray) -> int:
+    """Soglia di Otsu sull'istogramma di un'immagine in scala di grigi"""
+    histogram = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+    total = histogram.sum()
+    if not total:
+        return 128
+    levels = np.arange(256)
+    weight_bg = np.cumsum(histogram)
+    weight_fg = total - weight_bg
+    sum_bg = np.cumsum(histogram * levels)
+    mean_bg = sum_bg / np.maximum(weight_bg, 1)
+    mean_fg = (sum_bg[-1] - sum_bg) / np.maximum(weight_fg, 1)
+    between_variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    return int(np.argmax(between_variance))
+
+
+def _render_page_for_ocr(doc, page_num: int, settings: Dict[str, Any]) -> np.ndarray:
+    """
+    Renderizza una pagina secondo le impostazioni OCR, nel thread che possiede `doc`.
+    Restituisce solo i pixel uint8 (H×W o H×W×3), senza passare da PNG: il buffer
+    va al pool OCR e da lì diretto all'engine.
+    """
+    fitz = get_pdf_libraries()["fitz"]
+    page = doc.load_page(page_num)
+    zoom = settings.get("zoom", 2.0)
+    # La binarizzazione lavora in scala di grigi
+    grayscale = settings.get("grayscale") or settings.get("binarize")
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=colorspace, alpha=False)
+    
+    rows = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+    pixels = rows[:, :pix.width * pix.n]
+    pixels = pixels.reshape(pix.height, pix.width) if pix.n == 1 else pixels.reshape(pix.height, pix.width, pix.n)
+    if settings.get("binarize"):
+        threshold = _otsu_threshold(pixels)
+        pixels = np.where(pixels > threshold, 255, 0).astype(np.uint8)
+    # Copia contigua: il pixmap (e la pagina) possono essere liberati subito
+    return np.ascontiguousarray(pixels)
+
+
+def _pixels_cache_bytes(pixels: np.ndarray) -> bytes:
+    """Pixel con le dimensioni in testa, per le chiavi della cache OCR"""
+    shape = pixels.shape + (1,) if pixels.ndim == 2 else pixels.shape
+    return b"%dx%dx%d:" % (shape[1], shape[0], shape[2]) + pixels.tobytes()
+
+
+# Opzioni che determinano l'esito del rilevamento sulla pagina campione
+_DETECTION_OPTIONS = (
+    "OCR_LANGUAGES", "OCR_ADAPTIVE_DPI", "OCR_TARGET_GLYPH_PX",
+    "OCR_BASE_ZOOM", "OCR_GRAYSCALE", "OCR_BINARIZE"
+)
+
+
+def base_ocr_settings(options: Dict[str, Any]) -> Dict[str, Any]:
+    """Impostazioni di rendering della pagina campione, prima del rilevamento"""
+    return {
+        "zoom": options.get("OCR_BASE_ZOOM", 2.0),
+        "grayscale": options.get("OCR_GRAYSCALE", True),
+        "binarize": options.get("OCR_BINARIZE", False),
+        "lang": None
+    }
+
+
+def detect_ocr_settings_in_worker(pixels: np.ndarray, options: Dict[str, Any], label: str = "",
+                                  cache_path: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Determina una volta per documento, sui pixel di una pagina campione renderizzata
+    con `base_ocr_settings`, la lingua OCR e la risoluzione di rendering;
+    le impostazioni vengono poi riusate per tutte le pagine.
+    
+    - lingua: tra le candidate installate, la prima con confidenza media adeguata
+      (altrimenti quella con confidenza migliore)
+    - DPI adattivi: lo zoom viene scalato perché l'altezza mediana delle parole
+      si avvicini a OCR_TARGET_GLYPH_PX, il range in cui Tesseract è più accurato
+    
+    Il rilevamento costa fino a quattro passate di Tesseract: il risultato va nella
+    cache OCR, con chiave i pixel della pagina campione più opzioni, lingue installate
+    e versione dell'engine, e una reindicizzazione dello stesso documento lo riusa.
+    """
+    settings = base_ocr_settings(options)
+    
+    engine = get_ocr_engine(options.get("OCR_ENGINE", "auto"))
+    settings["engine"] = engine.name
+    
+    preferred = options.get("OCR_LANGUAGES", "ita+eng")
+    installed = set(engine.languages())
+    
+    cache = _get_ocr_cache(cache_path)
+    cache_key = None
+    if cache:
+        detection_options = {name: options.get(name) for name in _DETECTION_OPTIONS}
+        cache_key = OCRCache.make_key(
+            _pixels_cache_bytes(pixels),
+            lang=f"detect|{engine.name}|{json.dumps([detection_options, sorted(installed)], sort_keys=True)}",
+            dpi=int(72 * settings["zoom"]),
+            engine_version=engine.version()
+        )
+        cached_settings = cache.get(cache_key)
+        if cached_settings is not None:
+            settings = json.loads(cached_settings)
+            logger.info(
+                f"📸 Impostazioni OCR per {label} (cache): lingua={settings['lang']}, DPI={int(72 * settings['zoom'])}"
+            )
+            return settings
+    candidates = []
+    for lang in [preferred, "ita+eng", "ita", "eng"]:
+        if lang in candidates:
+            continue
+        if installed and not all(part in installed for part in lang.split("+")):
+            continue
+        candidates.append(lang)
+    
+    best_lang, best_confidence, best_heights = None, -1.0, []
+    for lang in candidates:
+        try:
+            words = engine.word_data(pixels, lang)
+        except Exception as ocr_e:
+            logger.debug(f"OCR campione {lang} fallito: {ocr_e}")
+            continue
+        
+        if not words:
+            continue
+        mean_confidence = sum(conf for conf, _ in words) / len(words)
+        if mean_confidence > best_confidence:
+            best_lang, best_confidence = lang, mean_confidence
+            best_heights = [height for conf, height in words if conf >= 60] or [h for _, h in words]
+        if mean_confidence >= 75:
+            break
+    
+    settings["lang"] = best_lang or (candidates[0] if candidates else None)
+    
+    if options.get("OCR_ADAPTIVE_DPI", True) and best_heights:
+        median_height = float(np.median(best_heights))
+        target = options.get("OCR_TARGET_GLYPH_PX", 32)
+        if median_height > 0:
+            zoom = settings["zoom"] * target / median_height
+            # Passi da 0.25 per massimizzare i riusi della cache OCR
+            settings["zoom"] = round(min(max(zoom, 1.0), 4.0) * 4) / 4
+    
+    logger.info(
+        f"📸 Impostazioni OCR per {label}: engine={engine.name}, lingua={settings['lang']}, "
+        f"DPI={int(72 * settings['zoom'])}, confidenza campione={best_confidence:.0f}"
+    )
+    if cache:
+        cache.set(cache_key, json.dumps(settings))
+    return settings
+
+
+def ocr_page_in_worker(pixels: np.ndarray, settings: Dict[str, Any],
+                       cache_path: Optional[str] = None) -> str:
+    """OCR dei pixel di una pagina già renderizzata (eseguito nel pool OCR)"""
+    lang = settings.get("lang")
+    engine = get_ocr_engine(settings.get("engine", "auto"))
+    
+    # Cache: una pagina già vista costa solo render + hash
+    cache = _get_ocr_cache(cache_path)
+    cache_key = None
+    if cache:
+        preprocessing = ("gray" if settings.get("grayscale") else "rgb") + ("+bin" if settings.get("binarize") else "")
+        cache_key = OCRCache.make_key(
+            _pixels_cache_bytes(pixels),
+            lang=f"{lang or 'default'}|{preprocessing}",
+            dpi=int(72 * settings.get("zoom", 2.0)),
+            engine_version=engine.version()
+        )
+        cached_text = cache.get(cache_key)
+        if cached_text is not None:
+            return cached_text
+    
+    # Una sola passata con la lingua determinata per il documento
+    try:
+        ocr_text = engine.image_to_string(pixels, lang)
+    except Exception as ocr_e:
+        logger.debug(f"OCR pagina fallito: {ocr_e}")
+        return ""
+    
+    if cache:
+        cache.set(cache_key, ocr_text or "")
+    return ocr_text or ""
+
 
 class EnterprisePDFProcessor:
     """
@@ -96,9 +313,11 @@ class EnterprisePDFProcessor:
     Handles all PDF types with multiple fallback strategies
     """
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200,
+                 ocr_options: Optional[Dict[str, Any]] = None):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.ocr_options = ocr_options or {}
         self.processing_stats = {
             "total_pdfs": 0,
             "successful_pdfs": 0,
@@ -107,294 +326,323 @@ class EnterprisePDFProcessor:
             "methods_used": {}
         }
     
-    async def process_pdf_comprehensive(self, file_path: str) -> PDFProcessingResult:
+    def iter_pdf_pages(self, file_path: str, stats: Dict[str, Any]) -> Iterator[str]:
         """
-        Comprehensive PDF processing with multiple strategies
+        Generatore del testo delle pagine, nell'ordine del documento.
+        `stats` viene aggiornato durante l'iterazione (metodo, pagine, pagine OCR, errore).
         
         Strategy order:
-        1. PyMuPDF (fitz) - Most robust for complex PDFs
+        1. PyMuPDF (fitz) con routing per pagina - un solo parse, OCR solo
+           sulle pagine senza text layer
         2. pdfplumber - Best for layout-aware extraction
         3. PyPDF2/pypdf - Fast for simple text PDFs
         4. OCR fallback - For scanned/image PDFs
-        """
         
+        Le strategie 2-4 servono solo se PyMuPDF manca o non riesce ad aprire il file.
+        Una strategia che ha già prodotto pagine non viene più abbandonata:
+        un errore a metà documento conserva le pagine già emesse.
+        """
         self.processing_stats["total_pdfs"] += 1
         logger.info(f"🔍 Processing PDF: {file_path}")
         
-        # Strategy 1: PyMuPDF (fitz) - Most comprehensive
-        if "fitz" in PDF_LIBRARIES:
-            result = await self._process_with_fitz(file_path)
-            if result.success and result.text.strip():
-                self.processing_stats["successful_pdfs"] += 1
-                self.processing_stats["methods_used"]["fitz"] = self.processing_stats["methods_used"].get("fitz", 0) + 1
-                return result
-        
-        # Strategy 2: pdfplumber - Layout-aware
-        if "pdfplumber" in PDF_LIBRARIES:
-            result = await self._process_with_pdfplumber(file_path)
-            if result.success and result.text.strip():
-                self.processing_stats["successful_pdfs"] += 1
-                self.processing_stats["methods_used"]["pdfplumber"] = self.processing_stats["methods_used"].get("pdfplumber", 0) + 1
-                return result
-        
-        # Strategy 3: PyPDF2/pypdf - Fast extraction
+        libraries = get_pdf_libraries()
+        strategies = []
+        if "fitz" in libraries:
+            strategies.append(("fitz", self._iter_pages_routed))
+        if "pdfplumber" in libraries:
+            strategies.append(("pdfplumber", self._iter_pages_pdfplumber))
         for lib_name in ["PyPDF2", "pypdf"]:
-            if lib_name in PDF_LIBRARIES:
-                result = await self._process_with_pypdf(file_path, lib_name)
-                if result.success and result.text.strip():
-                    self.processing_stats["successful_pdfs"] += 1
-                    self.processing_stats["methods_used"][lib_name] = self.processing_stats["methods_used"].get(lib_name, 0) + 1
-                    return result
+            if lib_name in libraries:
+                strategies.append((lib_name, functools.partial(self._iter_pages_pypdf, lib_name=lib_name)))
+        if ocr_engine_available() and "fitz" in libraries:
+            strategies.append(("ocr", self._iter_pages_ocr))
         
-        # Strategy 4: OCR fallback for scanned PDFs
-        if OCR_AVAILABLE and "fitz" in PDF_LIBRARIES:
-            logger.info(f"📸 Tentativo OCR per PDF: {file_path}")
-            result = await self._process_with_ocr(file_path)
-            if result.success and result.text.strip():
+        for method, strategy in strategies:
+            if method == "ocr":
+                logger.info(f"📸 Tentativo OCR per PDF: {file_path}")
+            stats.clear()
+            stats["method_used"] = method
+            yielded = False
+            try:
+                for page_text in strategy(file_path, stats):
+                    if page_text and page_text.strip():
+                        yielded = True
+                        yield page_text
+            except Exception as e:
+                logger.error(f"Errore {method} processing: {e}")
+                stats["error"] = str(e)
+                if not yielded:
+                    continue
+            
+            if yielded:
+                method = stats["method_used"]
                 self.processing_stats["successful_pdfs"] += 1
-                self.processing_stats["ocr_pdfs"] += 1
-                self.processing_stats["methods_used"]["ocr"] = self.processing_stats["methods_used"].get("ocr", 0) + 1
-                return result
+                self.processing_stats["methods_used"][method] = self.processing_stats["methods_used"].get(method, 0) + 1
+                if stats.get("ocr_pages"):
+                    self.processing_stats["ocr_pdfs"] += 1
+                return
+            
+            if method == "fitz":
+                # Documento letto correttamente ma senza testo recuperabile:
+                # riprovare con le altre librerie significherebbe solo riparsarlo
+                self.processing_stats["failed_pdfs"] += 1
+                logger.error(f"❌ Nessun testo estraibile da: {file_path}")
+                return
         
         # All strategies failed
         self.processing_stats["failed_pdfs"] += 1
         logger.error(f"❌ Tutte le strategie fallite per: {file_path}")
-        return PDFProcessingResult(
-            success=False,
-            text="",
-            pages_processed=0,
-            method_used="none",
-            error_message="Tutte le strategie di estrazione fallite"
-        )
+        stats["method_used"] = "none"
+        stats["error"] = "Tutte le strategie di estrazione fallite"
     
-    async def _process_with_fitz(self, file_path: str) -> PDFProcessingResult:
-        """Process PDF with PyMuPDF (fitz) - most robust"""
-        try:
-            fitz = PDF_LIBRARIES["fitz"]
-            doc = fitz.open(file_path)
-            
-            text = ""
-            pages_processed = 0
+    # Soglie del classificatore di pagina
+    MIN_TEXT_LAYER_CHARS = 30       # sotto questa soglia il text layer non è affidabile
+    SCANNED_IMAGE_COVERAGE = 0.5    # frazione di pagina coperta da immagini per considerarla scansione
+    # Caratteri per punto² sotto cui una pagina coperta da immagini è una scansione
+    # anche con un text layer (intestazioni, timbri, numeri di pagina): ~500 caratteri su A4
+    SCANNED_MAX_TEXT_DENSITY = 0.001
+    
+    def _classify_page(self, page) -> Tuple[str, str]:
+        """
+        Classifica una pagina in modo economico (copertura immagini, densità del
+        text layer) e restituisce (tipo, testo):
+        - "scanned": pagina coperta da immagini con testo scarso rispetto all'area,
+          qualunque sia il numero assoluto di caratteri → OCR
+        - "text": text layer adeguato, si usa direttamente
+        - "empty": né testo né immagini significative
+        """
+        page_text = page.get_text()
+        char_count = len(page_text.strip())
+        
+        page_area = abs(page.rect) or 1.0
+        image_area = 0.0
+        for image_info in page.get_image_info():
+            bbox = get_pdf_libraries()["fitz"].Rect(image_info["bbox"]) & page.rect
+            image_area += abs(bbox)
+        image_coverage = min(image_area / page_area, 1.0)
+        text_density = char_count / page_area
+        
+        if image_coverage >= self.SCANNED_IMAGE_COVERAGE and text_density < self.SCANNED_MAX_TEXT_DENSITY:
+            return "scanned", page_text
+        
+        if char_count >= self.MIN_TEXT_LAYER_CHARS:
+            return "text", page_text
+        
+        if not char_count:
+            # Ultimo tentativo economico: testo per span (layout particolari)
+            try:
+                page_text = self._extract_text_from_dict(page.get_text("dict"))
+            except Exception as dict_e:
+                logger.debug(f"Dict extraction failed for page {page.number}: {dict_e}")
+        
+        return ("text" if page_text.strip() else "empty"), page_text
+    
+    # Pagine classificate (ed eventualmente OCRizzate in parallelo) per volta:
+    # limita la memoria a una finestra di pagine mantenendo il pool OCR occupato
+    PAGE_WINDOW = 16
+    
+    def _iter_pages_routed(self, file_path: str, stats: Dict[str, Any]) -> Iterator[str]:
+        """
+        Un solo parse con PyMuPDF, a finestre di PAGE_WINDOW pagine: le pagine con
+        text layer vengono estratte subito, solo quelle scansionate vanno all'OCR (in parallelo).
+        Lingua e DPI dell'OCR vengono determinati sulla prima finestra con pagine scansionate.
+        """
+        fitz = get_pdf_libraries()["fitz"]
+        stats.update(total_pages=0, text_pages=0, scanned_pages=0, ocr_pages=0, pages_processed=0)
+        ocr_settings = None
+        
+        with fitz.open(file_path) as doc:
             total_pages = len(doc)
+            stats["total_pages"] = total_pages
             
-            for page_num in range(total_pages):
-                try:
-                    page = doc.load_page(page_num)
-                    
-                    # Try multiple text extraction methods
-                    page_text = page.get_text()
-                    
-                    # If no text, try different extraction modes
-                    if not page_text.strip():
-                        page_text = page.get_text("text")
-                    
-                    if not page_text.strip():
-                        try:
-                            page_text_dict = page.get_text("dict")
-                            if isinstance(page_text_dict, dict):
-                                page_text = self._extract_text_from_dict(page_text_dict)
-                        except Exception as dict_e:
-                            logger.debug(f"Dict extraction failed for page {page_num}: {dict_e}")
-                    
-                    if page_text and page_text.strip():
-                        text += page_text + "\n"
-                        pages_processed += 1
+            for window_start in range(0, total_pages, self.PAGE_WINDOW):
+                window_texts: Dict[int, str] = {}
+                scanned_pages: List[int] = []
+                
+                for page_num in range(window_start, min(window_start + self.PAGE_WINDOW, total_pages)):
+                    try:
+                        kind, page_text = self._classify_page(doc.load_page(page_num))
+                    except Exception as page_e:
+                        logger.warning(f"Error processing page {page_num}: {page_e}")
+                        continue
                     
-                except Exception as page_e:
-                    logger.warning(f"Error processing page {page_num}: {page_e}")
-                    continue
-            
-            doc.close()
-            
-            return PDFProcessingResult(
-                success=bool(text.strip()),
-                text=text,
-                pages_processed=pages_processed,
-                method_used="fitz",
-                metadata={"total_pages": total_pages}
-            )
-            
-        except Exception as e:
-            logger.error(f"Errore fitz processing: {e}")
-            return PDFProcessingResult(
-                success=False,
-                text="",
-                pages_processed=0,
-                method_used="fitz",
-                error_message=str(e)
-            )
+                    if kind == "text":
+                        window_texts[page_num] = page_text
+                    elif kind == "scanned":
+                        scanned_pages.append(page_num)
+                        # Tiene l'eventuale testo parziale se l'OCR non è disponibile
+                        if page_text.strip():
+                            window_texts[page_num] = page_text
+                
+                stats["scanned_pages"] += len(scanned_pages)
+                if scanned_pages and ocr_engine_available():
+                    if ocr_settings is None:
+                        ocr_settings = self._detect_ocr_settings(
+                            doc, scanned_pages[len(scanned_pages) // 2], os.path.basename(file_path)
+                        )
+                    for page_num, ocr_text in self._ocr_pages(doc, scanned_pages, ocr_settings).items():
+                        if ocr_text and ocr_text.strip():
+                            window_texts[page_num] = f"\n--- Pagina {page_num+1} (OCR) ---\n{ocr_text}"
+                            stats["ocr_pages"] += 1
+                
+                for page_num in sorted(window_texts):
+                    stats["pages_processed"] += 1
+                    yield window_texts[page_num]
+        
+        stats["text_pages"] = total_pages - stats["scanned_pages"]
+        if stats["ocr_pages"]:
+            stats["method_used"] = "fitz+ocr"
+            logger.info(f"📸 OCR di {stats['ocr_pages']}/{total_pages} pagine scansionate: {file_path}")
+        elif stats["scanned_pages"] and not ocr_engine_available():
+            logger.warning(f"⚠️ {stats['scanned_pages']} pagine scansionate ma OCR non disponibile: {file_path}")
     
-    async def _process_with_pdfplumber(self, file_path: str) -> PDFProcessingResult:
-        """Process PDF with pdfplumber - layout-aware"""
-        try:
-            pdfplumber = PDF_LIBRARIES["pdfplumber"]
-            
-            text = ""
-            pages_processed = 0
+    def _iter_pages_pdfplumber(self, file_path: str, stats: Dict[str, Any]) -> Iterator[str]:
+        """Pagine estratte con pdfplumber - layout-aware"""
+        pdfplumber = get_pdf_libraries()["pdfplumber"]
+        stats["pages_processed"] = 0
+        
+        with pdfplumber.open(file_path) as pdf:
+            stats["total_pages"] = len(pdf.pages)
             
-            with pdfplumber.open(file_path) as pdf:
-                for page in pdf.pages:
-                    # Try different extraction strategies
-                    page_text = page.extract_text()
-                    
-                    # If no text, try with different settings
-                    if not page_text or not page_text.strip():
-                        page_text = page.extract_text(
-                            x_tolerance=3,
-                            y_tolerance=3,
-                            layout=True
+            for page in pdf.pages:
+                # Try different extraction strategies
+                page_text = page.extract_text()
+                
+                # If no text, try with different settings
+                if not page_text or not page_text.strip():
+                    page_text = page.extract_text(
+                        x_tolerance=3,
+                        y_tolerance=3,
+                        layout=True
+                    )
+                
+                # Try extracting from tables
+                if not page_text or not page_text.strip():
+                    tables = page.extract_tables()
+                    if tables:
+                        page_text = "".join(
+                            " ".join([cell or "" for cell in row]) + "\n"
+                            for table in tables for row in table if row
                         )
-                    
-                    # Try extracting from tables
-                    if not page_text or not page_text.strip():
-                        tables = page.extract_tables()
-                        if tables:
-                            table_text = ""
-                            for table in tables:
-                                for row in table:
-                                    if row:
-                                        table_text += " ".join([cell or "" for cell in row]) + "\n"
-                            page_text = table_text
-                    
-                    if page_text and page_text.strip():
-                        text += page_text + "\n"
-                        pages_processed += 1
-            
-            return PDFProcessingResult(
-                success=bool(text.strip()),
-                text=text,
-                pages_processed=pages_processed,
-                method_used="pdfplumber",
-                metadata={"total_pages": len(pdf.pages)}
-            )
-            
-        except Exception as e:
-            logger.error(f"Errore pdfplumber processing: {e}")
-            return PDFProcessingResult(
-                success=False,
-                text="",
-                pages_processed=0,
-                method_used="pdfplumber",
-                error_message=str(e)
-            )
+                
+                # Libera la cache di layout della pagina già elaborata
+                page.flush_cache()
+                
+                if page_text and page_text.strip():
+                    stats["pages_processed"] += 1
+                    yield page_text
     
-    async def _process_with_pypdf(self, file_path: str, lib_name: str) -> PDFProcessingResult:
-        """Process PDF with PyPDF2 or pypdf"""
-        try:
-            pdf_lib = PDF_LIBRARIES[lib_name]
-            
-            text = ""
-            pages_processed = 0
+    def _iter_pages_pypdf(self, file_path: str, stats: Dict[str, Any], lib_name: str) -> Iterator[str]:
+        """Pagine estratte con PyPDF2 o pypdf"""
+        pdf_lib = get_pdf_libraries()[lib_name]
+        stats["pages_processed"] = 0
+        
+        with open(file_path, 'rb') as file:
+            pdf_reader = pdf_lib.PdfReader(file)
+            stats["total_pages"] = len(pdf_reader.pages)
             
-            with open(file_path, 'rb') as file:
-                pdf_reader = pdf_lib.PdfReader(file)
+            for page in pdf_reader.pages:
+                page_text = page.extract_text()
                 
-                for page in pdf_reader.pages:
-                    page_text = page.extract_text()
-                    
-                    if page_text and page_text.strip():
-                        text += page_text + "\n"
-                        pages_processed += 1
-            
-            return PDFProcessingResult(
-                success=bool(text.strip()),
-                text=text,
-                pages_processed=pages_processed,
-                method_used=lib_name,
-                metadata={"total_pages": len(pdf_reader.pages)}
-            )
-            
-        except Exception as e:
-            logger.error(f"Errore {lib_name} processing: {e}")
-            return PDFProcessingResult(
-                success=False,
-                text="",
-                pages_processed=0,
-                method_used=lib_name,
-                error_message=str(e)
-            )
+                if page_text and page_text.strip():
+                    stats["pages_processed"] += 1
+                    yield page_text
     
-    async def _process_with_ocr(self, file_path: str) -> PDFProcessingResult:
-        """Process PDF with OCR for scanned documents"""
-        if not OCR_AVAILABLE or "fitz" not in PDF_LIBRARIES:
-            return PDFProcessingResult(
-                success=False,
-                text="",
-                pages_processed=0,
-                method_used="ocr",
-                error_message="OCR non disponibile"
-            )
-        
+    def _detect_ocr_settings(self, doc, sample_page: int, label: str = "") -> Dict[str, Any]:
+        """Lingua e DPI dell'OCR, determinati una volta per documento su una pagina campione"""
         try:
-            fitz = PDF_LIBRARIES["fitz"]
-            doc = fitz.open(file_path)
-            
-            text = ""
-            pages_processed = 0
-            ocr_pages = 0
-            total_pages = len(doc)
-            
-            for page_num in range(total_pages):
+            # Render qui, nel thread che possiede `doc`: al pool vanno solo i pixel
+            pixels = _render_page_for_ocr(doc, sample_page, base_ocr_settings(self.ocr_options))
+            return _get_ocr_executor(get_ocr_workers(self.ocr_options)).submit(
+                detect_ocr_settings_in_worker, pixels, self.ocr_options, label,
+                self.ocr_options.get("OCR_CACHE_DB_PATH")
+            ).result()
+        except Exception as detect_e:
+            logger.warning(f"Rilevamento impostazioni OCR fallito, uso i default: {detect_e}")
+            return {
+                "zoom": 2.0, "grayscale": False, "binarize": False, "lang": "ita+eng",
+                "engine": self.ocr_options.get("OCR_ENGINE", "auto")
+            }
+    
+    def _ocr_pages(self, doc, page_numbers: List[int],
+                   settings: Optional[Dict[str, Any]] = None) -> Dict[int, str]:
+        """
+        OCR delle pagine indicate in parallelo sul pool OCR.
+        Le pagine vengono renderizzate nel thread chiamante (PyMuPDF non è thread-safe)
+        e al pool arrivano solo i pixel. Al massimo `max_in_flight` pagine (e quindi
+        buffer di pixel) sono in lavorazione contemporaneamente; il risultato è
+        indicizzato per numero di pagina.
+        """
+        workers = get_ocr_workers(self.ocr_options)
+        max_in_flight = self.ocr_options.get("OCR_MAX_IN_FLIGHT") or workers * 2
+        executor = _get_ocr_executor(workers)
+        
+        results: Dict[int, str] = {}
+        if not page_numbers:
+            return results
+        
+        if settings is None:
+            # Pagina campione centrale
+            settings = self._detect_ocr_settings(doc, page_numbers[len(page_numbers) // 2], os.path.basename(doc.name))
+        
+        pending_pages = iter(page_numbers)
+        in_flight = {}
+        
+        def submit_next() -> bool:
+            while True:
+                page_num = next(pending_pages, None)
+                if page_num is None:
+                    return False
                 try:
-                    page = doc.load_page(page_num)
-                    
-                    # Convert page to image
-                    mat = fitz.Matrix(2.0, 2.0)  # 2x resolution for better OCR
-                    pix = page.get_pixmap(matrix=mat)
-                    img_data = pix.tobytes("png")
-                    
-                    # OCR the image
-                    image = Image.open(io.BytesIO(img_data))
-                    
-                    # Try multiple OCR configurations
-                    ocr_text = ""
-                    
-                    # Try with different language configurations
-                    for lang_config in ['ita+eng', 'eng', None]:
-                        try:
-                            if lang_config:
-                                ocr_text = pytesseract.image_to_string(image, lang=lang_config)
-                            else:
-                                ocr_text = pytesseract.image_to_string(image)
-                            
-                            if ocr_text and ocr_text.strip():
-                                break  # Success, exit lang loop
-                                
-                        except Exception as ocr_e:
-                            logger.debug(f"OCR tentativo {lang_config} fallito: {ocr_e}")
-                            continue
-                    
-                    if ocr_text and ocr_text.strip():
-                        text += f"\n--- Pagina {page_num+1} (OCR) ---\n{ocr_text}\n"
-                        pages_processed += 1
-                        ocr_pages += 1
-                    
-                    pix = None  # Free memory
-                    
+                    pixels = _render_page_for_ocr(doc, page_num, settings)
+                except Exception as render_e:
+                    logger.warning(f"Render OCR fallito per pagina {page_num+1}: {render_e}")
+                    results[page_num] = ""
+                    continue
+                future = executor.submit(
+                    ocr_page_in_worker, pixels, settings,
+                    cache_path=self.ocr_options.get("OCR_CACHE_DB_PATH")
+                )
+                in_flight[future] = page_num
+                return True
+        
+        while len(in_flight) < max_in_flight and submit_next():
+            pass
+        
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                page_num = in_flight.pop(future)
+                try:
+                    results[page_num] = future.result()
                 except Exception as page_e:
                     logger.warning(f"OCR fallito per pagina {page_num+1}: {page_e}")
-                    continue
-            
-            doc.close()
-            
-            return PDFProcessingResult(
-                success=bool(text.strip()),
-                text=text,
-                pages_processed=pages_processed,
-                method_used="ocr",
-                ocr_pages=ocr_pages,
-                metadata={"total_pages": total_pages, "ocr_pages": ocr_pages}
-            )
+                    results[page_num] = ""
+                submit_next()
+        
+        return results
+    
+    def _iter_pages_ocr(self, file_path: str, stats: Dict[str, Any]) -> Iterator[str]:
+        """OCR di tutte le pagine (documenti scansionati), a finestre di PAGE_WINDOW pagine"""
+        fitz = get_pdf_libraries()["fitz"]
+        with fitz.open(file_path) as doc:
+            total_pages = len(doc)
+            stats.update(total_pages=total_pages, ocr_pages=0, pages_processed=0)
+            if not total_pages:
+                return
             
-        except Exception as e:
-            logger.error(f"Errore OCR processing: {e}")
-            return PDFProcessingResult(
-                success=False,
-                text="",
-                pages_processed=0,
-                method_used="ocr",
-                error_message=str(e)
-            )
+            settings = self._detect_ocr_settings(doc, total_pages // 2, os.path.basename(file_path))
+            for window_start in range(0, total_pages, self.PAGE_WINDOW):
+                window = list(range(window_start, min(window_start + self.PAGE_WINDOW, total_pages)))
+                page_texts = self._ocr_pages(doc, window, settings)
+                
+                # Riassembla il testo nell'ordine delle pagine
+                for page_num in window:
+                    ocr_text = page_texts.get(page_num, "")
+                    if ocr_text and ocr_text.strip():
+                        stats["ocr_pages"] += 1
+                        stats["pages_processed"] += 1
+                        yield f"\n--- Pagina {page_num+1} (OCR) ---\n{ocr_text}\n"
     
     def _extract_text_from_dict(self, text_dict: Dict) -> str:
         """Extract text from fitz text dictionary format"""
@@ -418,88 +666,98 @@ class EnterprisePDFProcessor:
         return {
             **self.processing_stats,
             "success_rate_percent": round(success_rate, 2),
-            "available_libraries": list(PDF_LIBRARIES.keys()),
-            "ocr_available": OCR_AVAILABLE
+            "available_libraries": list(get_pdf_libraries().keys()),
+            "ocr_available": ocr_engine_available()
         }
 
 
 # Integration with existing document processor
 class EnhancedDocumentProcessor:
-    """Enhanced document processor with enterprise PDF support"""
+    """Enhanced document processor with enterprise PDF support (chunk_size/chunk_overlap in token)"""
     
-    def __init__(self, chunk_size: int = 1000, chunk_overlap: int = 200):
+    def __init__(self, chunk_size: int = 300, chunk_overlap: int = 40,
+                 ocr_options: Optional[Dict[str, Any]] = None, dedup_threshold: float = 0.9):
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
-        self.pdf_processor = EnterprisePDFProcessor(chunk_size, chunk_overlap)
+        self.dedup_threshold = dedup_threshold  # 0 = deduplicazione disattivata
+        self.pdf_processor = EnterprisePDFProcessor(chunk_size, chunk_overlap, ocr_options)
     
-    async def process_file(self, file_path: str) -> List['Document']:
-        """Process any file type with enhanced PDF support"""
+    def iter_documents(self, file_path: str,
+                       duplicates: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> Iterator['Document']:
+        """
+        Generatore dei chunk di un file: le pagine estratte alimentano il chunker
+        incrementale, quindi il testo completo del documento non esiste mai in memoria.
+        
+        I chunk duplicati (boilerplate ripetuto, overlap) non vengono emessi:
+        la loro posizione viene registrata in `duplicates` sotto l'id del chunk canonico.
+        """
+        from app.modules.rag_system import Document  # Import from existing module
         path = Path(file_path)
         
         if not path.exists():
             logger.warning(f"File non trovato: {file_path}")
-            return []
+            return
         
-        try:
-            text = ""
-            processing_metadata = {}
-            
-            if path.suffix.lower() == '.pdf':
-                # Use enterprise PDF processor
-                pdf_result = await self.pdf_processor.process_pdf_comprehensive(file_path)
-                
-                if pdf_result.success:
-                    text = pdf_result.text
-                    processing_metadata = {
-                        "pdf_processing_method": pdf_result.method_used,
-                        "pdf_pages_processed": pdf_result.pages_processed,
-                        "pdf_ocr_pages": pdf_result.ocr_pages,
-                        "pdf_metadata": pdf_result.metadata or {}
-                    }
-                    logger.info(f"✅ PDF processed with {pdf_result.method_used}: {len(text)} chars")
-                else:
-                    logger.error(f"❌ PDF processing failed: {pdf_result.error_message}")
-                    return []
-                    
-            elif path.suffix.lower() in ['.txt', '.md']:
-                text = await self._extract_text_file(file_path)
-            else:
-                logger.warning(f"Tipo file non supportato: {path.suffix}")
-                return []
-            
-            if not text.strip():
-                logger.warning(f"File vuoto: {file_path}")
-                return []
+        processing_metadata = {}
+        pdf_stats: Dict[str, Any] = {}
+        
+        if path.suffix.lower() == '.pdf':
+            # Use enterprise PDF processor
+            segments = (page_text + "\n" for page_text in self.pdf_processor.iter_pdf_pages(file_path, pdf_stats))
+        elif path.suffix.lower() in ['.txt', '.md']:
+            segments = iter([self._read_text_file(file_path)])
+        else:
+            logger.warning(f"Tipo file non supportato: {path.suffix}")
+            return
+        
+        deduplicator = ChunkDeduplicator(self.dedup_threshold) if self.dedup_threshold > 0 else None
+        duplicate_count = 0
+        chunk_count = 0
+        for chunk in self._iter_chunks(segments):
+            if path.suffix.lower() == '.pdf' and not processing_metadata:
+                # Il metodo è noto appena la strategia produce la prima pagina
+                processing_metadata = {"pdf_processing_method": pdf_stats.get("method_used")}
             
-            # Chunk del testo
-            chunks = self._chunk_text(text)
+            chunk_id = f"{path.stem}_{chunk_count}"
+            content = self._clean_text(chunk)
+            canonical_id = deduplicator.check(chunk_id, content) if deduplicator else None
+            if canonical_id is not None:
+                if duplicates is not None:
+                    duplicates.setdefault(canonical_id, []).append({"chunk_id": chunk_id, "chunk_index": chunk_count})
+                duplicate_count += 1
+                chunk_count += 1
+                continue
             
-            # Crea documenti
-            documents = []
-            for i, chunk in enumerate(chunks):
-                from app.modules.rag_system import Document  # Import from existing module
-                doc = Document(
-                    id=f"{path.stem}_{i}",
-                    content=self._clean_text(chunk),
-                    metadata={
-                        "source_file": path.name,
-                        "chunk_index": i,
-                        "total_chunks": len(chunks),
-                        "file_path": str(path),
-                        **processing_metadata
-                    }
+            yield Document(
+                id=chunk_id,
+                content=content,
+                metadata={
+                    "source_file": path.name,
+                    "chunk_index": chunk_count,
+                    "file_path": str(path),
+                    **processing_metadata
+                }
+            )
+            chunk_count += 1
+        
+        if pdf_stats:
+            if pdf_stats.get("error") and not chunk_count:
+                logger.error(f"❌ PDF processing failed: {pdf_stats['error']}")
+            elif chunk_count:
+                logger.info(
+                    f"✅ PDF processed with {pdf_stats.get('method_used')}: "
+                    f"{pdf_stats.get('pages_processed', 0)} pagine ({pdf_stats.get('ocr_pages', 0)} OCR)"
                 )
-                documents.append(doc)
-            
-            logger.info(f"✅ Processato {file_path}: {len(documents)} chunks")
-            return documents
-            
-        except Exception as e:
-            logger.error(f"Errore processando {file_path}: {e}")
-            return []
+        
+        if not chunk_count:
+            logger.warning(f"File vuoto: {file_path}")
+            return
+        if duplicate_count:
+            logger.info(f"🧹 {path.name}: {duplicate_count}/{chunk_count} chunk duplicati eliminati")
+        logger.info(f"✅ Processato {file_path}: {chunk_count - duplicate_count} chunks")
     
-    async def _extract_text_file(self, file_path: str) -> str:
-        """Estrae testo da file di testo"""
+    def _read_text_file(self, file_path: str) -> str:
+        """Estrae testo da file di testo (bloccante)"""
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
                 return f.read()
@@ -507,35 +765,12 @@ class EnhancedDocumentProcessor:
             with open(file_path, 'r', encoding='latin-1') as f:
                 return f.read()
     
-    def _chunk_text(self, text: str) -> List[str]:
-        """Divide il testo in chunks con overlap"""
-        if len(text) <= self.chunk_size:
-            return [text]
-        
-        chunks = []
-        start = 0
-        
-        while start < len(text):
-            end = start + self.chunk_size
-            
-            if end < len(text):
-                boundary = max(
-                    text.rfind(' ', start, end),
-                    text.rfind('.', start, end),
-                    text.rfind('\n', start, end)
-                )
-                if boundary > start:
-                    end = boundary + 1
-            
-            chunk = text[start:end].strip()
-            if chunk:
-                chunks.append(chunk)
-            
-            start = end - self.chunk_overlap
-            if start >= len(text):
-                break
-        
-        return chunks
+    def _iter_chunks(self, segments: Iterable[str]) -> Iterator[str]:
+        """
+        Chunking incrementale per struttura (titoli, articoli, frasi) e numero di token:
+        consuma il testo a segmenti (pagine) senza mai ricostruire il documento intero.
+        """
+        return StructuredChunker(self.chunk_size, self.chunk_overlap).chunk(segments)
     
     def _clean_text(self, text: str) -> str:
         """Pulisce e normalizza il testo"""
@@ -545,4 +780,36 @@ class EnhancedDocumentProcessor:
     
     def get_processing_stats(self) -> Dict[str, Any]:
         """Get comprehensive processing statistics"""
-        return self.pdf_processor.get_processing_stats()
\ No newline at end of file
+        return self.pdf_processor.get_processing_stats()
+
+
+def stream_file_in_worker(file_path: str, chunk_size: int, chunk_overlap: int,
+                          ocr_options: Optional[Dict[str, Any]], out_queue, batch_size: int,
+                          dedup_threshold: float = 0.9) -> Dict[str, Any]:
+    """
+    Entry point per ProcessPoolExecutor in streaming: i chunk vengono inviati
+    a batch su `out_queue` (coda di un multiprocessing.Manager, limitata) man mano
+    che le pagine vengono estratte. Una coda piena ferma l'estrazione, quindi la memoria
+    del worker resta proporzionale a poche pagine. Il None finale chiude lo stream
+    anche in caso di errore.
+    
+    Restituisce il numero di chunk inviati e, per ogni chunk canonico già inviato,
+    le posizioni dei suoi duplicati (da registrare nei metadata a fine file).
+    """
+    processor = EnhancedDocumentProcessor(chunk_size, chunk_overlap, ocr_options, dedup_threshold)
+    sent = 0
+    duplicates: Dict[str, List[Dict[str, Any]]] = {}
+    batch: List['Document'] = []
+    try:
+        for doc in processor.iter_documents(file_path, duplicates):
+            batch.append(doc)
+            if len(batch) >= batch_size:
+                out_queue.put(batch)
+                sent += len(batch)
+                batch = []
+        if batch:
+            out_queue.put(batch)
+            sent += len(batch)
+    finally:
+        out_queue.put(None)
+    return {"chunks": sent, "duplicates": duplicates}
@@ -0,0 +1,146 @@
+# app/modules/faq_index.py
+"""
+Indice delle FAQ per risposte dirette senza LLM.
+
+In fase di ingestione, nei documenti Markdown/testo i titoli che terminano con "?"
+(es. "### Come funziona il sistema Bonus/Malus?") vengono riconosciuti come domande e
+il testo che segue, fino al titolo successivo, come risposta curata. Le domande sono
+indicizzate a parte con il loro embedding.
+
+Una domanda dell'utente quasi identica a una FAQ riceve direttamente la risposta curata:
+- match lessicale (domanda normalizzata identica, oppure stessa sequenza di parole a meno
+  di articoli e formule di cortesia), verificato prima dell'embedding: nessuna chiamata
+  all'API. Il confronto è ordinato e considera ogni parola: negazioni e preposizioni
+  ("non è valida", "al vicino" / "del vicino") distinguono sempre due domande;
+- altrimenti cosine similarity tra embedding della domanda e delle FAQ oltre soglia.
+"""
+
+import logging
+import re
+from dataclasses import dataclass
+from difflib import SequenceMatcher
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.utils.text_normalization import normalize_query, tokenize
+
+logger = logging.getLogger(__name__)
+
+# Estensioni in cui cercare coppie domanda/risposta
+FAQ_EXTENSIONS = (".md", ".txt")
+
+_HEADING_RE = re.compile(r"^\s{0,3}(#{2,6})\s+(.+?)\s*#*\s*$")
+
+# Parole che possono mancare o cambiare tra due formulazioni della stessa domanda
+_FILLER_TOKENS = frozenset("il lo la l i gli le un uno una scusa scusi gentilmente cortesemente".split())
+
+
+@dataclass
+class FAQEntry:
+    source_file: str
+    question: str
+    answer: str
+
+
+@dataclass
+class FAQMatch:
+    entry: FAQEntry
+    score: float
+    method: str  # "exact", "lexical" o "embedding"
+
+
+def extract_faq_pairs(text: str) -> List[Tuple[str, str]]:
+    """Coppie (domanda, risposta) dai titoli Markdown che terminano con '?'"""
+    pairs = []
+    question: Optional[str] = None
+    answer_lines: List[str] = []
+
+    def close():
+        answer = "\n".join(answer_lines).strip()
+        if question and answer:
+            pairs.append((question, answer))
+
+    for line in text.splitlines():
+        heading = _HEADING_RE.match(line)
+        if heading or line.lstrip().startswith("# "):
+            close()
+            title = heading.group(2).strip() if heading else ""
+            question = title if title.endswith("?") else None
+            answer_lines = []
+        elif question is not None:
+            answer_lines.append(line.rstrip())
+    close()
+    return pairs
+
+
+def _ordered_similarity(a: List[str], b: List[str]) -> float:
+    """
+    Similarità tra due sequenze di token nell'ordine in cui compaiono (ratio di difflib);
+    0 se differiscono per una parola che non sia un articolo o una formula di cortesia.
+    """
+    if not _FILLER_TOKENS.issuperset(set(a) ^ set(b)):
+        return 0.0
+    matcher = SequenceMatcher(a=a, b=b, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag != "equal" and not _FILLER_TOKENS.issuperset(a[i1:i2] + b[j1:j2]):
+            return 0.0
+    return matcher.ratio()
+
+
+class FAQIndex:
+    """Domande FAQ in memoria: forma normalizzata, token e matrice di embedding normalizzata"""
+
+    def __init__(self, entries: List[FAQEntry], embeddings: Optional[np.ndarray] = None,
+                 lexical_threshold: float = 0.85, embedding_threshold: float = 0.95):
+        self.entries = entries
+        self.lexical_threshold = lexical_threshold
+        self.embedding_threshold = embedding_threshold
+        self._normalized = {normalize_query(entry.question): i for i, entry in enumerate(entries)}
+        self._tokens = [tokenize(normalize_query(entry.question)) for entry in entries]
+
+        self._matrix = None
+        if embeddings is not None and len(embeddings):
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            self._matrix = embeddings / np.where(norms == 0, 1.0, norms)
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def match_lexical(self, question: str) -> Optional[FAQMatch]:
+        """Match senza embedding: domanda identica (normalizzata) o stesse parole nello stesso ordine"""
+        normalized = normalize_query(question)
+        exact = self._normalized.get(normalized)
+        if exact is not None:
+            return FAQMatch(self.entries[exact], 1.0, "exact")
+
+        tokens = tokenize(normalized)
+        best, best_score = None, 0.0
+        for i, entry_tokens in enumerate(self._tokens):
+            score = _ordered_similarity(tokens, entry_tokens)
+            if score > best_score:
+                best, best_score = i, score
+        if best is not None and best_score >= self.lexical_threshold:
+            return FAQMatch(self.entries[best], best_score, "lexical")
+        return None
+
+    def match_embedding(self, query_embedding: List[float]) -> Optional[FAQMatch]:
+        if self._matrix is None:
+            return None
+        vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or vector.shape[0] != self._matrix.shape[1]:
+            return None
+        scores = self._matrix @ (vector / norm)
+        best = int(np.argmax(scores))
+        if scores[best] >= self.embedding_threshold:
+            return FAQMatch(self.entries[best], float(scores[best]), "embedding")
+        return None
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "questions": len(self.entries),
+            "files": sorted({entry.source_file for entry in self.entries}),
+            "lexical_threshold": self.lexical_threshold,
+            "embedding_threshold": self.embedding_threshold
+        }
@@ -0,0 +1,301 @@
+# app/modules/index_snapshot.py
+"""
+Snapshot portabile dell'indice RAG per un avvio a freddo immediato.
+
+Costruzione offline:
+    python -m app.modules.index_snapshot build --output ./data/index_snapshot [--docs DIR | --from-db DB]
+    python -m app.modules.index_snapshot info ./data/index_snapshot
+
+Contenuto della directory:
+- index.db              chunk, metadata, embedding e manifest dei file (SQLite compattato)
+- embeddings.npy        matrice N x D float32 L2-normalizzata, caricata in memory mapping
+- ids.json              id dei chunk nell'ordine delle righe della matrice
+- ivf_centroids.npy     centroidi k-means dell'indice IVF (solo corpus grandi)
+- ivf_assignments.npy   cluster di ogni riga
+- manifest.json         versione del formato, modello di embedding, parametri di chunking, conteggi
+
+All'avvio, se l'indice live è vuoto e snapshot e configurazione sono compatibili,
+index.db viene copiato su VECTOR_DB_PATH e la matrice mappata in memoria: estrazione
+ed embedding vengono saltati. I documenti in DOCS_DIRECTORY restano la fonte di verità,
+quindi l'ingestione incrementale successiva aggiorna solo i file diversi dallo snapshot.
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.modules.rag_system import CustomRAGEngine, SQLiteVectorStore, build_custom_rag_system
+from app.utils.sqlite_backup import backup_sqlite
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT_VERSION = 1
+# Sotto questa soglia la ricerca esatta sull'intera matrice costa meno di un millisecondo
+IVF_MIN_VECTORS = 20000
+_ASSIGN_BATCH_ROWS = 8192
+
+
+class IVFIndex:
+    """Indice a liste invertite: la query esplora solo i `nprobe` cluster più vicini"""
+
+    def __init__(self, centroids: np.ndarray, assignments: np.ndarray):
+        self.centroids = centroids
+        self._order = np.argsort(assignments, kind="stable")
+        counts = np.bincount(assignments, minlength=len(centroids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+
+    def candidates(self, query_vector: np.ndarray, nprobe: int) -> np.ndarray:
+        """Indici di riga dei vettori nei cluster più vicini alla query"""
+        nprobe = max(1, min(nprobe, len(self.centroids)))
+        scores = self.centroids @ query_vector
+        probe = np.argpartition(-scores, nprobe - 1)[:nprobe]
+        return np.concatenate([self._order[self._offsets[c]:self._offsets[c + 1]] for c in probe])
+
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignments = np.empty(matrix.shape[0], dtype=np.int32)
+    for start in range(0, matrix.shape[0], _ASSIGN_BATCH_ROWS):
+        block = matrix[start:start + _ASSIGN_BATCH_ROWS]
+        assignments[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def build_ivf(matrix: np.ndarray, n_lists: int, iterations: int = 10, seed: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    """K-means sferico sulle righe normalizzate: (centroidi, cluster di ogni riga)"""
+    rng = np.random.default_rng(seed)
+    centroids = matrix[rng.choice(matrix.shape[0], size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _assign(matrix, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, matrix)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] == 0
+        # I cluster rimasti vuoti vengono riseminati su righe casuali
+        sums[empty] = matrix[rng.choice(matrix.shape[0], size=int(empty.sum()), replace=False)]
+        norms[empty] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids, _assign(matrix, centroids)
+
+
+def read_manifest(snapshot_dir: str) -> Optional[Dict[str, Any]]:
+    """manifest.json dello snapshot, o None se assente/illeggibile"""
+    try:
+        with open(os.path.join(snapshot_dir, "manifest.json"), encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _single_value(values: List[str], name: str) -> str:
+    distinct = sorted(set(values))
+    if len(distinct) != 1:
+        raise ValueError(f"L'indice deve avere un solo {name}, trovati: {distinct}")
+    return distinct[0]
+
+
+def export_snapshot(db_path: str, output_dir: str, ivf_lists: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Esporta un indice SQLite esistente come snapshot. La directory viene scritta
+    accanto a quella finale e sostituita solo a esportazione completata.
+    `ivf_lists=None` sceglie automaticamente (IVF solo oltre IVF_MIN_VECTORS), 0 lo disattiva.
+    """
+    output_dir = os.path.abspath(output_dir)
+    building_dir = f"{output_dir}.building"
+    shutil.rmtree(building_dir, ignore_errors=True)
+    os.makedirs(building_dir)
+
+    try:
+        index_path = os.path.join(building_dir, "index.db")
+        backup_sqlite(db_path, index_path)
+        db = sqlite3.connect(index_path)
+        try:
+            files = [
+                dict(zip(("path", "size", "sha256", "chunk_count", "chunk_params", "embedding_model"), row))
+                for row in db.execute(
+                    "SELECT path, size, sha256, chunk_count, chunk_params, embedding_model "
+                    "FROM document_manifest ORDER BY path"
+                )
+            ]
+            db.execute("VACUUM")
+        finally:
+            db.close()
+
+        matrix, ids = SQLiteVectorStore(index_path).read_matrix()
+        if not ids:
+            raise ValueError(f"Indice {db_path} vuoto: nessuno snapshot da esportare")
+
+        np.save(os.path.join(building_dir, "embeddings.npy"), matrix)
+        with open(os.path.join(building_dir, "ids.json"), "w", encoding="utf-8") as f:
+            json.dump(ids, f)
+
+        if ivf_lists is None:
+            ivf_lists = int(np.sqrt(len(ids))) if len(ids) >= IVF_MIN_VECTORS else 0
+        ivf_lists = min(ivf_lists, len(ids))
+        if ivf_lists > 1:
+            centroids, assignments = build_ivf(matrix, ivf_lists)
+            np.save(os.path.join(building_dir, "ivf_centroids.npy"), centroids)
+            np.save(os.path.join(building_dir, "ivf_assignments.npy"), assignments)
+        else:
+            ivf_lists = 0
+
+        manifest = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "created_at": time.time(),
+            "embedding_model": _single_value([f["embedding_model"] for f in files], "modello di embedding"),
+            "chunk_params": _single_value([f["chunk_params"] for f in files], "set di parametri di chunking"),
+            "documents": len(ids),
+            "dimension": int(matrix.shape[1]),
+            "ivf_lists": ivf_lists,
+            "files": [
+                {key: f[key] for key in ("path", "size", "sha256", "chunk_count")}
+                for f in files
+            ]
+        }
+        with open(os.path.join(building_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+        # Sostituzione della directory: la vecchia versione resta valida fino all'ultimo
+        previous_dir = f"{output_dir}.previous"
+        shutil.rmtree(previous_dir, ignore_errors=True)
+        if os.path.exists(output_dir):
+            os.replace(output_dir, previous_dir)
+        os.replace(building_dir, output_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+    except Exception:
+        shutil.rmtree(building_dir, ignore_errors=True)
+        raise
+
+    logger.info(f"📦 Snapshot scritto in {output_dir}: {manifest['documents']} chunk, {len(files)} file")
+    return manifest
+
+
+async def build_snapshot(config: Dict[str, Any], output_dir: str,
+                         docs_directory: Optional[str] = None,
+                         ivf_lists: Optional[int] = None) -> Dict[str, Any]:
+    """Indicizza i documenti in un database temporaneo e lo esporta come snapshot"""
+    docs_directory = docs_directory or config.get("DOCS_DIRECTORY", "./insurance_docs")
+    work_db = f"{os.path.abspath(output_dir)}.work.db"
+    if os.path.exists(work_db):
+        os.remove(work_db)
+
+    try:
+        engine = await build_custom_rag_system(config, vector_db_path=work_db)
+        await engine.initialize_documents(docs_directory)
+        status = engine.ingestion_status
+        if status.get("state") != "completed" or not engine.is_initialized:
+            raise RuntimeError(status.get("error") or "Ingestione non completata")
+        if status.get("files_failed"):
+            logger.warning(f"⚠️ {status['files_failed']} file non indicizzati: lo snapshot non li contiene")
+        return await asyncio.to_thread(export_snapshot, work_db, output_dir, ivf_lists)
+    finally:
+        if os.path.exists(work_db):
+            os.remove(work_db)
+
+
+def load_snapshot_matrix(vector_store: SQLiteVectorStore, snapshot_dir: str, nprobe: int = 8):
+    """Collega al vector store la matrice dello snapshot, mappata in memoria"""
+    matrix = np.load(os.path.join(snapshot_dir, "embeddings.npy"), mmap_mode="r")
+    with open(os.path.join(snapshot_dir, "ids.json"), encoding="utf-8") as f:
+        ids = json.load(f)
+
+    ivf = None
+    centroids_path = os.path.join(snapshot_dir, "ivf_centroids.npy")
+    if os.path.exists(centroids_path):
+        ivf = IVFIndex(
+            np.load(centroids_path),
+            np.load(os.path.join(snapshot_dir, "ivf_assignments.npy"))
+        )
+    vector_store.attach_matrix(matrix, ids, ivf=ivf, nprobe=nprobe)
+
+
+async def restore_snapshot(engine: CustomRAGEngine, snapshot_dir: str, nprobe: int = 8) -> bool:
+    """
+    Carica lo snapshot nell'engine se l'indice live è vuoto e i parametri coincidono.
+    Restituisce True se lo snapshot è stato usato; in ogni altro caso l'ingestione procede normalmente.
+    """
+    manifest = read_manifest(snapshot_dir)
+    if manifest is None:
+        return False
+
+    if manifest.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+        logger.warning(f"⚠️ Snapshot {snapshot_dir}: formato {manifest.get('format_version')} non supportato, ignorato")
+        return False
+    if manifest.get("embedding_model") != engine.embedding_manager.model or \
+            manifest.get("chunk_params") != engine._chunk_params():
+        logger.warning(f"⚠️ Snapshot {snapshot_dir}: modello di embedding o parametri di chunking diversi, ignorato")
+        return False
+
+    stats = await engine.vector_store.get_stats()
+    if stats.get("total_documents", 0) > 0:
+        logger.info(f"Indice live già popolato: snapshot {snapshot_dir} non necessario")
+        return False
+
+    started = time.perf_counter()
+    db_path = engine.vector_store.db_path
+    try:
+        restoring_path = f"{db_path}.restoring"
+        await asyncio.to_thread(shutil.copyfile, os.path.join(snapshot_dir, "index.db"), restoring_path)
+        os.replace(restoring_path, db_path)
+        engine.vector_store.invalidate_matrix()
+        await asyncio.to_thread(load_snapshot_matrix, engine.vector_store, snapshot_dir, nprobe)
+    except Exception as e:
+        logger.error(f"❌ Caricamento snapshot {snapshot_dir} fallito: {e}")
+        engine.vector_store.invalidate_matrix()
+        return False
+
+    logger.info(
+        f"⚡ Snapshot caricato in {(time.perf_counter() - started) * 1000:.0f}ms: "
+        f"{manifest['documents']} chunk da {len(manifest.get('files', []))} file"
+    )
+    return True
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Snapshot portabile dell'indice RAG")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Costruisce uno snapshot")
+    build.add_argument("--output", default=None, help="Directory dello snapshot (default: INDEX_SNAPSHOT_PATH)")
+    build.add_argument("--docs", default=None, help="Directory dei documenti (default: DOCS_DIRECTORY)")
+    build.add_argument("--from-db", default=None, help="Esporta un indice SQLite esistente invece di reindicizzare")
+    build.add_argument("--ivf-lists", type=int, default=None, help="Cluster IVF (default: automatico, 0 = disattivato)")
+
+    info = commands.add_parser("info", help="Mostra il manifest di uno snapshot")
+    info.add_argument("snapshot_dir", nargs="?", default=None)
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+    from app.config import get_config
+    config = get_config()
+
+    if args.command == "info":
+        snapshot_dir = args.snapshot_dir or config.get("INDEX_SNAPSHOT_PATH", "./data/index_snapshot")
+        manifest = read_manifest(snapshot_dir)
+        if manifest is None:
+            print(f"Nessuno snapshot valido in {snapshot_dir}")
+            return 1
+        print(json.dumps(manifest, indent=2, ensure_ascii=False))
+        return 0
+
+    output_dir = args.output or config.get("INDEX_SNAPSHOT_PATH", "./data/index_snapshot")
+    if args.from_db:
+        manifest = export_snapshot(args.from_db, output_dir, args.ivf_lists)
+    else:
+        manifest = asyncio.run(build_snapshot(config, output_dir, args.docs, args.ivf_lists))
+    print(f"✅ Snapshot {output_dir}: {manifest['documents']} chunk, {len(manifest['files'])} file, "
+          f"dimensione {manifest['dimension']}, IVF {manifest['ivf_lists'] or 'disattivato'}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
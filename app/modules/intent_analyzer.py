@@ -1,25 +1,57 @@
 # app/modules/intent_analyzer.py
 import re
-import spacy
+import threading
 from typing import Dict, List, Optional, Union # Union potrebbe non essere strettamente necessario qui se entities è sempre Dict[str, str]
+from app.config import FAST_START
 from app.utils.logging_config import logger
 from app.models.schemas import Intent
 
-# Carica il modello spaCy (italiano o inglese)
+# Il modello spaCy (italiano o inglese) viene caricato al primo utilizzo, non all'import:
+# spacy + it_core_news_sm costano secondi e centinaia di MB a ogni processo che importa main.
+# Con FAST_START l'analisi resta solo a keyword e spaCy non viene mai importato.
 # Per installare i modelli:
 # python -m spacy download it_core_news_sm  # Per italiano
 # python -m spacy download en_core_web_sm   # Per inglese
-try:
-    nlp = spacy.load("it_core_news_sm")  # Modello italiano
-    logger.info("Modello spaCy italiano (it_core_news_sm) caricato.")
-except OSError:
-    logger.warning("Modello spaCy italiano (it_core_news_sm) non trovato. Tentativo con en_core_web_sm.")
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+
+def get_nlp():
+    """Modello spaCy del processo (None se non disponibile o in FAST_START)"""
+    global _nlp, _nlp_loaded
+    if _nlp_loaded:
+        return _nlp
+    with _nlp_lock:
+        if _nlp_loaded:
+            return _nlp
+        if FAST_START:
+            logger.info("FAST_START attivo: analisi dell'intento solo su keyword, spaCy non caricato.")
+        else:
+            _nlp = _load_spacy_model()
+        _nlp_loaded = True
+    return _nlp
+
+
+def _load_spacy_model():
+    try:
+        import spacy
+    except ImportError:
+        logger.warning("spaCy non installato. L'analisi dell'intento sarà basata solo su keyword.")
+        return None
+    try:
+        nlp = spacy.load("it_core_news_sm")  # Modello italiano
+        logger.info("Modello spaCy italiano (it_core_news_sm) caricato.")
+        return nlp
+    except OSError:
+        logger.warning("Modello spaCy italiano (it_core_news_sm) non trovato. Tentativo con en_core_web_sm.")
     try:
         nlp = spacy.load("en_core_web_sm")  # Fallback al modello inglese
         logger.info("Modello spaCy inglese (en_core_web_sm) caricato come fallback.")
+        return nlp
     except OSError:
         logger.error("Nessun modello spaCy (it_core_news_sm, en_core_web_sm) trovato. L'analisi dell'intento sarà basata solo su keyword.")
-        nlp = None
+        return None
 
 # Definizione delle keyword con pesi per ciascun intento
 # Un peso maggiore indica una keyword più significativa
@@ -80,6 +112,7 @@ def analyze_intent(message: str) -> Intent:
     entities: Dict[str, str] = {} # Lo schema Intent si aspetta Dict[str, str] per entities
 
     # Se spaCy è disponibile, usa l'analisi NLP per estrarre entità
+    nlp = get_nlp()
     if nlp:
         doc = nlp(normalized_message)
         
@@ -0,0 +1,173 @@
+# app/modules/ocr_engine.py
+"""
+Backend OCR intercambiabili per l'elaborazione delle pagine scansionate.
+
+- tesserocr: API C di Tesseract in-process, un handle persistente per worker e lingua;
+  riceve direttamente il buffer dei pixel renderizzati da fitz (nessun PNG, nessun file temporaneo)
+- pytesseract: un processo `tesseract` per pagina, usato come fallback
+
+Entrambi ricevono un array numpy uint8 (H×W in scala di grigi o H×W×3 RGB).
+"""
+
+import importlib.util
+import logging
+import os
+import platform
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Disponibilità verificata senza importare: i backend vengono caricati alla creazione dell'engine
+TESSEROCR_AVAILABLE = importlib.util.find_spec("tesserocr") is not None
+PYTESSERACT_AVAILABLE = (
+    importlib.util.find_spec("pytesseract") is not None and importlib.util.find_spec("PIL") is not None
+)
+
+_WINDOWS_TESSERACT_PATHS = [
+    r'C:\Program Files\Tesseract-OCR\tesseract.exe',
+    r'C:\Program Files (x86)\Tesseract-OCR\tesseract.exe'
+]
+
+
+def ocr_engine_available() -> bool:
+    """True se almeno un backend OCR è installato"""
+    return TESSEROCR_AVAILABLE or PYTESSERACT_AVAILABLE
+
+
+class PytesseractEngine:
+    """Tesseract come processo esterno (un avvio e un file temporaneo per pagina)"""
+    name = "pytesseract"
+
+    def __init__(self):
+        global pytesseract, Image
+        import pytesseract
+        from PIL import Image
+
+        if platform.system() == "Windows":
+            for path in _WINDOWS_TESSERACT_PATHS:
+                if os.path.exists(path):
+                    pytesseract.pytesseract.tesseract_cmd = path
+                    logger.info(f"✅ Tesseract configurato: {path}")
+                    break
+        self._version: Optional[str] = None
+
+    def version(self) -> str:
+        """Versione di Tesseract, parte della chiave di cache OCR (letta una volta: costa un processo)"""
+        if self._version is None:
+            try:
+                self._version = str(pytesseract.get_tesseract_version())
+            except Exception:
+                self._version = "unknown"
+        return self._version
+
+    def languages(self) -> List[str]:
+        try:
+            return list(pytesseract.get_languages(config=''))
+        except Exception:
+            return []
+
+    def image_to_string(self, pixels: np.ndarray, lang: Optional[str]) -> str:
+        image = Image.fromarray(pixels)
+        return pytesseract.image_to_string(image, lang=lang) if lang else pytesseract.image_to_string(image)
+
+    def word_data(self, pixels: np.ndarray, lang: Optional[str]) -> List[Tuple[float, int]]:
+        """(confidenza, altezza in pixel) di ogni parola riconosciuta"""
+        data = pytesseract.image_to_data(Image.fromarray(pixels), lang=lang, output_type=pytesseract.Output.DICT)
+        return [
+            (float(conf), int(height))
+            for text, conf, height in zip(data["text"], data["conf"], data["height"])
+            if text.strip() and float(conf) >= 0
+        ]
+
+
+class TesserocrEngine:
+    """Tesseract in-process: un PyTessBaseAPI per thread e lingua, riusato tra le pagine"""
+    name = "tesserocr"
+
+    def __init__(self):
+        global tesserocr
+        import tesserocr
+
+        self._local = threading.local()
+        self._tessdata_path = os.getenv("TESSDATA_PREFIX")
+
+    def _api(self, lang: Optional[str]):
+        apis: Dict[str, Any] = getattr(self._local, "apis", None)
+        if apis is None:
+            apis = self._local.apis = {}
+        key = lang or "eng"
+        if key not in apis:
+            kwargs = {"lang": key}
+            if self._tessdata_path:
+                kwargs["path"] = self._tessdata_path
+            apis[key] = tesserocr.PyTessBaseAPI(**kwargs)
+        return apis[key]
+
+    def _set_image(self, api, pixels: np.ndarray):
+        pixels = np.ascontiguousarray(pixels)
+        height, width = pixels.shape[:2]
+        bytes_per_pixel = 1 if pixels.ndim == 2 else pixels.shape[2]
+        api.SetImageBytes(pixels.tobytes(), width, height, bytes_per_pixel, width * bytes_per_pixel)
+
+    def version(self) -> str:
+        # "tesseract 5.3.0\n leptonica-1.82.0 ..." → "5.3.0", confrontabile con pytesseract
+        parts = tesserocr.tesseract_version().split()
+        return parts[1] if len(parts) > 1 else "unknown"
+
+    def languages(self) -> List[str]:
+        try:
+            _, langs = tesserocr.get_languages(self._tessdata_path) if self._tessdata_path else tesserocr.get_languages()
+            return list(langs)
+        except Exception:
+            return []
+
+    def image_to_string(self, pixels: np.ndarray, lang: Optional[str]) -> str:
+        api = self._api(lang)
+        self._set_image(api, pixels)
+        text = api.GetUTF8Text()
+        api.Clear()
+        return text
+
+    def word_data(self, pixels: np.ndarray, lang: Optional[str]) -> List[Tuple[float, int]]:
+        api = self._api(lang)
+        self._set_image(api, pixels)
+        api.Recognize()
+        words = []
+        iterator = api.GetIterator()
+        level = tesserocr.RIL.WORD
+        for word in tesserocr.iterate_level(iterator, level):
+            text = word.GetUTF8Text(level)
+            box = word.BoundingBox(level)
+            if text and text.strip() and box:
+                words.append((float(word.Confidence(level)), int(box[3] - box[1])))
+        api.Clear()
+        return words
+
+
+_ENGINES: Dict[str, Any] = {}
+_ENGINES_LOCK = threading.Lock()
+
+
+def get_ocr_engine(preference: str = "auto"):
+    """
+    Engine OCR del processo corrente.
+    `auto` preferisce tesserocr se installato; una preferenza non disponibile ripiega sull'altro backend.
+    """
+    preference = (preference or "auto").lower()
+    if preference == "tesserocr" and not TESSEROCR_AVAILABLE:
+        logger.warning("tesserocr non disponibile, uso pytesseract")
+        preference = "pytesseract"
+    if preference == "auto":
+        preference = "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+    if preference == "pytesseract" and not PYTESSERACT_AVAILABLE:
+        preference = "tesserocr" if TESSEROCR_AVAILABLE else ""
+    if not preference:
+        raise RuntimeError("Nessun engine OCR disponibile (installare tesserocr o pytesseract)")
+
+    with _ENGINES_LOCK:
+        if preference not in _ENGINES:
+            _ENGINES[preference] = TesserocrEngine() if preference == "tesserocr" else PytesseractEngine()
+        return _ENGINES[preference]
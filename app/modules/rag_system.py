@@ -8,17 +8,28 @@ import asyncio
 import aiosqlite
 import json
 import numpy as np
-import openai
 import os
 import logging
 import time
 import hashlib
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass, asdict
+import multiprocessing
+import queue
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
+from typing import AsyncIterator, List, Dict, Any, Optional, Set, Tuple
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
 
+from app.modules.chunker import TIKTOKEN_AVAILABLE, count_tokens, cut_to_tokens, trim_to_tokens
+from app.modules.context_compressor import ExtractiveCompressor
+from app.modules.faq_index import FAQ_EXTENSIONS, FAQEntry, FAQIndex, FAQMatch, extract_faq_pairs
+from app.modules.reranker import LinearReranker
+from app.modules.semantic_cache import SemanticAnswerCache
+from app.utils.smart_cache import SmartCache
+from app.utils.text_normalization import normalize_query
 # Import enterprise PDF processor
-from app.modules.enterprise_pdf_processor import EnhancedDocumentProcessor
+from app.modules.enterprise_pdf_processor import get_available_cpus, stream_file_in_worker
 
 # Setup logging
 logger = logging.getLogger(__name__)
@@ -44,12 +55,32 @@ class RAGResult:
     embedding_time_ms: int = 0
     search_time_ms: int = 0
     generation_time_ms: int = 0
+    cache_hit: bool = False
+    faq_hit: bool = False
+
+
+# Estensioni indicizzate in DOCS_DIRECTORY
+SUPPORTED_EXTENSIONS = ['.txt', '.md', '.pdf', '.docx']
+
+
+@dataclass
+class _FileIngestState:
+    """Avanzamento di un file attraverso la pipeline di ingestione"""
+    entry: Dict[str, Any]
+    file_path: Optional[Path] = None
+    total_batches: Optional[int] = None  # noto solo a fine estrazione (streaming)
+    stored_batches: int = 0
+    chunk_count: int = 0
+    cleared: bool = False
+    failed: bool = False
+    duplicates: Dict[str, List[Dict[str, Any]]] = field(default_factory=dict)
 
 
 class EmbeddingManager:
     """Gestisce la generazione di embeddings con OpenAI"""
     
     def __init__(self, openai_api_key: str, model: str = "text-embedding-ada-002"):
+        import openai  # import pesante (~0.7s): solo alla creazione dell'engine
         self.client = openai.AsyncOpenAI(api_key=openai_api_key)
         self.model = model
         self.embedding_cache = {}
@@ -106,12 +137,55 @@ class EmbeddingManager:
         return embeddings
 
 
+def _file_sha256(file_path: Path) -> str:
+    """SHA-256 del contenuto di un file, letto a blocchi"""
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _serialize_documents(documents: List[Document]) -> List[Tuple[str, str, str, bytes, str]]:
+    """Righe (id, content, embedding_json, embedding_blob, metadata_json) per l'inserimento"""
+    # Embedding come BLOB float32: ~10x più compatto e veloce del JSON da scrivere e leggere
+    return [
+        (doc.id, doc.content, "", np.asarray(doc.embedding, dtype=np.float32).tobytes(), json.dumps(doc.metadata))
+        for doc in documents if doc.embedding is not None
+    ]
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Righe L2-normalizzate in float32 (le righe nulle restano nulle)"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _decode_embedding(embedding_blob: Optional[bytes], embedding_json: str) -> np.ndarray:
+    """Decodifica un embedding salvato come BLOB float32 o (righe legacy) come JSON"""
+    if embedding_blob:
+        return np.frombuffer(embedding_blob, dtype=np.float32)
+    return np.asarray(json.loads(embedding_json), dtype=np.float32)
+
+
 class SQLiteVectorStore:
     """Vector store basato su SQLite"""
     
     def __init__(self, db_path: str):
         self.db_path = db_path
         os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        # Embedding normalizzati in memoria: la ricerca è un prodotto matrice-vettore
+        # invece di una scansione del DB a ogni query
+        self._matrix: Optional[np.ndarray] = None
+        self._matrix_ids: List[str] = []
+        self._matrix_generation = 0
+        # Cambia a ogni modifica della tabella FAQ
+        self.faq_generation = 0
+        self._matrix_lock = asyncio.Lock()
+        self._ivf = None
+        self.ivf_nprobe = 8
     
     async def initialize(self):
         """Inizializza il database"""
@@ -125,9 +199,44 @@ class SQLiteVectorStore:
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
                 )
             """)
+            # Migrazione: embedding binari accanto alla colonna JSON storica
+            async with db.execute("PRAGMA table_info(vector_documents)") as cursor:
+                columns = {row[1] for row in await cursor.fetchall()}
+            if "embedding_blob" not in columns:
+                await db.execute("ALTER TABLE vector_documents ADD COLUMN embedding_blob BLOB")
             await db.execute("""
                 CREATE INDEX IF NOT EXISTS idx_documents_id ON vector_documents(id)
             """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_documents_source_file
+                ON vector_documents(json_extract(metadata_json, '$.source_file'))
+            """)
+            # Manifest dei file indicizzati: permette l'ingestione incrementale
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS document_manifest (
+                    path TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    chunk_params TEXT NOT NULL,
+                    embedding_model TEXT NOT NULL,
+                    chunk_count INTEGER NOT NULL DEFAULT 0,
+                    indexed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            # Coppie domanda/risposta riconosciute nei documenti (risposte dirette)
+            await db.execute("""
+                CREATE TABLE IF NOT EXISTS faq_entries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    source_file TEXT NOT NULL,
+                    question TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    embedding_blob BLOB
+                )
+            """)
+            await db.execute("""
+                CREATE INDEX IF NOT EXISTS idx_faq_source_file ON faq_entries(source_file)
+            """)
             await db.commit()
             logger.info(f"Vector store inizializzato: {self.db_path}")
     
@@ -135,81 +244,244 @@ class SQLiteVectorStore:
         """Aggiunge documenti al vector store"""
         if not documents:
             return
+        
+        for doc in documents:
+            if doc.embedding is None:
+                logger.warning(f"Documento {doc.id} senza embedding")
+        rows = await asyncio.to_thread(_serialize_documents, documents)
             
         async with aiosqlite.connect(self.db_path) as db:
-            for doc in documents:
-                if doc.embedding is None:
-                    logger.warning(f"Documento {doc.id} senza embedding")
-                    continue
-                
-                await db.execute("""
-                    INSERT OR REPLACE INTO vector_documents 
-                    (id, content, embedding_json, metadata_json) 
-                    VALUES (?, ?, ?, ?)
-                """, (
-                    doc.id,
-                    doc.content,
-                    json.dumps(doc.embedding),
-                    json.dumps(doc.metadata)
-                ))
+            await db.executemany("""
+                INSERT OR REPLACE INTO vector_documents 
+                (id, content, embedding_json, embedding_blob, metadata_json) 
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
             
             await db.commit()
-            logger.info(f"Aggiunti {len(documents)} documenti")
+        self.invalidate_matrix()
+        logger.info(f"Aggiunti {len(rows)} documenti")
+    
+    async def delete_source_chunks(self, source_file: str) -> int:
+        """Rimuove i chunk di un file sorgente (il manifest resta invariato)"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "DELETE FROM vector_documents WHERE json_extract(metadata_json, '$.source_file') = ?",
+                (source_file,)
+            )
+            await db.commit()
+        if cursor.rowcount:
+            self.invalidate_matrix()
+        return cursor.rowcount
+    
+    async def delete_source_documents(self, source_file: str) -> int:
+        """Rimuove tutti i chunk e la voce di manifest di un file sorgente"""
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute(
+                "DELETE FROM vector_documents WHERE json_extract(metadata_json, '$.source_file') = ?",
+                (source_file,)
+            )
+            removed = cursor.rowcount
+            await db.execute("DELETE FROM document_manifest WHERE path = ?", (source_file,))
+            faq_cursor = await db.execute("DELETE FROM faq_entries WHERE source_file = ?", (source_file,))
+            await db.commit()
+        if removed:
+            self.invalidate_matrix()
+        if faq_cursor.rowcount:
+            self.faq_generation += 1
+        logger.info(f"{source_file}: {removed} chunk rimossi dal vector store")
+        return removed
+    
+    async def get_manifest(self) -> Dict[str, Dict[str, Any]]:
+        """Restituisce il manifest dei file indicizzati, indicizzato per path"""
+        async with aiosqlite.connect(self.db_path) as db:
+            db.row_factory = aiosqlite.Row
+            async with db.execute("SELECT * FROM document_manifest") as cursor:
+                rows = await cursor.fetchall()
+        return {row["path"]: dict(row) for row in rows}
+    
+    async def upsert_manifest_entry(self, entry: Dict[str, Any]):
+        """Registra (o aggiorna) un file nel manifest"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.execute("""
+                INSERT OR REPLACE INTO document_manifest 
+                (path, size, mtime, sha256, chunk_params, embedding_model, chunk_count, indexed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+            """, (
+                entry["path"],
+                entry["size"],
+                entry["mtime"],
+                entry["sha256"],
+                entry["chunk_params"],
+                entry["embedding_model"],
+                entry.get("chunk_count", 0)
+            ))
+            await db.commit()
+    
+    async def replace_faq_entries(self, source_file: str, entries: List[Tuple[str, str, List[float]]]):
+        """Sostituisce le FAQ (domanda, risposta, embedding della domanda) di un file"""
+        rows = [
+            (source_file, question, answer, np.asarray(embedding, dtype=np.float32).tobytes())
+            for question, answer, embedding in entries
+        ]
+        async with aiosqlite.connect(self.db_path) as db:
+            cursor = await db.execute("DELETE FROM faq_entries WHERE source_file = ?", (source_file,))
+            await db.executemany(
+                "INSERT INTO faq_entries (source_file, question, answer, embedding_blob) VALUES (?, ?, ?, ?)",
+                rows
+            )
+            await db.commit()
+        if rows or cursor.rowcount:
+            self.faq_generation += 1
+    
+    async def load_faq_entries(self) -> Tuple[List[FAQEntry], Optional[np.ndarray]]:
+        """Tutte le FAQ con la matrice degli embedding delle domande (None se mancano)"""
+        try:
+            async with aiosqlite.connect(self.db_path) as db:
+                async with db.execute(
+                    "SELECT source_file, question, answer, embedding_blob FROM faq_entries ORDER BY id"
+                ) as cursor:
+                    rows = await cursor.fetchall()
+        except aiosqlite.OperationalError as e:
+            # Indice creato da una versione senza tabella FAQ (es. snapshot precedente)
+            logger.warning(f"FAQ non disponibili: {e}")
+            return [], None
+        entries = [FAQEntry(source_file=row[0], question=row[1], answer=row[2]) for row in rows]
+        vectors = [np.frombuffer(row[3], dtype=np.float32) for row in rows if row[3]]
+        if not vectors or len(vectors) != len(rows) or len({v.shape[0] for v in vectors}) != 1:
+            return entries, None
+        return entries, np.vstack(vectors)
+    
+    async def add_duplicate_locations(self, duplicates: Dict[str, List[Dict[str, Any]]]):
+        """Registra nei metadata dei chunk canonici le posizioni dei duplicati eliminati"""
+        async with aiosqlite.connect(self.db_path) as db:
+            await db.executemany(
+                "UPDATE vector_documents SET metadata_json = json_set(metadata_json, '$.duplicate_locations', json(?)) WHERE id = ?",
+                [(json.dumps(locations), doc_id) for doc_id, locations in duplicates.items()]
+            )
+            await db.commit()
+    
+    # ----- Matrice degli embedding in memoria -----
+    
+    @property
+    def generation(self) -> int:
+        """Contatore delle scritture sull'indice (cambia a ogni aggiunta/rimozione di chunk)"""
+        return self._matrix_generation
+    
+    def invalidate_matrix(self):
+        """Scarta la matrice in memoria dopo una scrittura sull'indice"""
+        self._matrix_generation += 1
+        self._matrix = None
+        self._matrix_ids = []
+        self._ivf = None
+    
+    def attach_matrix(self, matrix: np.ndarray, ids: List[str], ivf=None, nprobe: int = 8):
+        """
+        Usa una matrice già pronta (es. memory-mapped da uno snapshot): righe L2-normalizzate
+        float32 nello stesso ordine di `ids`. `ivf` restringe la ricerca ai cluster più vicini.
+        """
+        if matrix.shape[0] != len(ids):
+            raise ValueError(f"Matrice con {matrix.shape[0]} righe ma {len(ids)} id")
+        self._matrix = matrix
+        self._matrix_ids = list(ids)
+        self._ivf = ivf
+        self.ivf_nprobe = nprobe
+    
+    def read_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        """Legge tutti gli embedding dal DB in un'unica matrice normalizzata"""
+        ids, vectors = [], []
+        with closing(sqlite3.connect(self.db_path)) as db:
+            for doc_id, embedding_json, embedding_blob in db.execute(
+                "SELECT id, embedding_json, embedding_blob FROM vector_documents ORDER BY id"
+            ):
+                try:
+                    vector = _decode_embedding(embedding_blob, embedding_json)
+                except Exception as e:
+                    logger.error(f"Errore processing documento {doc_id}: {e}")
+                    continue
+                if vectors and vector.shape != vectors[0].shape:
+                    logger.error(f"Documento {doc_id}: dimensione embedding {vector.shape} incoerente, ignorato")
+                    continue
+                ids.append(doc_id)
+                vectors.append(vector)
+        
+        if not vectors:
+            return np.zeros((0, 0), dtype=np.float32), []
+        return normalize_rows(np.vstack(vectors)), ids
+    
+    async def _ensure_matrix(self) -> Tuple[np.ndarray, List[str]]:
+        if self._matrix is not None:
+            return self._matrix, self._matrix_ids
+        async with self._matrix_lock:
+            if self._matrix is None:
+                generation = self._matrix_generation
+                matrix, ids = await asyncio.to_thread(self.read_matrix)
+                # Una scrittura avvenuta durante il caricamento rende la matrice già vecchia
+                if generation != self._matrix_generation:
+                    return matrix, ids
+                self._matrix, self._matrix_ids = matrix, ids
+                logger.info(f"🧮 Matrice embedding caricata: {len(ids)} documenti")
+        return self._matrix, self._matrix_ids
+    
+    async def warm_up(self):
+        """Carica la matrice prima della prima query"""
+        await self._ensure_matrix()
     
     async def similarity_search(self, query_embedding: List[float], k: int = 3, 
                               threshold: float = 0.2) -> List[Tuple[float, Document]]:
         """Cerca documenti simili"""
-        results = []
+        matrix, ids = await self._ensure_matrix()
+        ivf = self._ivf if matrix is self._matrix else None
+        if not ids:
+            return []
+        
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        norm = np.linalg.norm(query_vector)
+        if norm == 0 or query_vector.shape[0] != matrix.shape[1]:
+            logger.error(f"Embedding della query non valido (dimensione {query_vector.shape[0]})")
+            return []
+        query_vector = query_vector / norm
+        
+        # Prodotto scalare su righe normalizzate = cosine similarity
+        if ivf is not None:
+            rows = ivf.candidates(query_vector, self.ivf_nprobe)
+            scores = matrix[rows] @ query_vector
+        else:
+            rows = None
+            scores = matrix @ query_vector
+        
+        top = np.flatnonzero(scores >= threshold)
+        if len(top) > k:
+            top = top[np.argpartition(-scores[top], k - 1)[:k]]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        if rows is not None:
+            hits = [(float(scores[i]), int(rows[i])) for i in top]
+        else:
+            hits = [(float(scores[i]), int(i)) for i in top]
+        if not hits:
+            return []
         
+        hit_ids = [ids[row] for _, row in hits]
         async with aiosqlite.connect(self.db_path) as db:
-            async with db.execute("""
-                SELECT id, content, embedding_json, metadata_json 
-                FROM vector_documents
-            """) as cursor:
-                async for row in cursor:
-                    doc_id, content, embedding_json, metadata_json = row
-                    
-                    try:
-                        doc_embedding = json.loads(embedding_json)
-                        metadata = json.loads(metadata_json)
-                        
-                        similarity = self._cosine_similarity(query_embedding, doc_embedding)
-                        
-                        if similarity >= threshold:
-                            doc = Document(
-                                id=doc_id,
-                                content=content,
-                                metadata=metadata,
-                                embedding=doc_embedding
-                            )
-                            results.append((similarity, doc))
-                    
-                    except Exception as e:
-                        logger.error(f"Errore processing documento {doc_id}: {e}")
-                        continue
+            placeholders = ",".join("?" * len(hit_ids))
+            async with db.execute(
+                f"SELECT id, content, metadata_json FROM vector_documents WHERE id IN ({placeholders})",
+                hit_ids
+            ) as cursor:
+                rows_by_id = {row[0]: row for row in await cursor.fetchall()}
         
-        results.sort(key=lambda x: x[0], reverse=True)
-        return results[:k]
-    
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Calcola cosine similarity"""
-        try:
-            a = np.array(vec1)
-            b = np.array(vec2)
-            
-            dot_product = np.dot(a, b)
-            norm_a = np.linalg.norm(a)
-            norm_b = np.linalg.norm(b)
-            
-            if norm_a == 0 or norm_b == 0:
-                return 0.0
-            
-            similarity = dot_product / (norm_a * norm_b)
-            return float(similarity)
-            
-        except Exception as e:
-            logger.error(f"Errore calcolo similarity: {e}")
-            return 0.0
+        results = []
+        for similarity, row in hits:
+            record = rows_by_id.get(ids[row])
+            if record is None:
+                continue
+            doc_id, content, metadata_json = record
+            results.append((similarity, Document(
+                id=doc_id,
+                content=content,
+                metadata=json.loads(metadata_json),
+                embedding=matrix[row].tolist()
+            )))
+        return results
     
     async def get_stats(self) -> Dict[str, Any]:
         """Statistiche del vector store"""
@@ -246,10 +518,24 @@ class CustomRAGEngine:
     def __init__(self, vector_store: SQLiteVectorStore, 
                  embedding_manager: EmbeddingManager, 
                  openai_api_key: str,
-                 chunk_size: int = 1000,
-                 chunk_overlap: int = 200):
+                 chunk_size: int = 300,
+                 chunk_overlap: int = 40,
+                 ingest_workers: int = 0,
+                 embedding_batch_size: int = 20,
+                 embedding_concurrency: int = 2,
+                 ingest_queue_size: int = 8,
+                 ocr_options: Optional[Dict[str, Any]] = None,
+                 dedup_threshold: float = 0.9,
+                 max_context_tokens: int = 1000,
+                 llm_model: str = "gpt-3.5-turbo",
+                 faq_thresholds: Optional[Tuple[float, float]] = None,
+                 reranker: Optional[LinearReranker] = None,
+                 compressor: Optional[ExtractiveCompressor] = None,
+                 answer_cache: Optional[SemanticAnswerCache] = None,
+                 response_cache: Optional[SmartCache] = None):
         self.vector_store = vector_store
         self.embedding_manager = embedding_manager
+        import openai
         self.llm_client = openai.AsyncOpenAI(api_key=openai_api_key)
         self.system_prompt = self._build_system_prompt()
         self.is_initialized = False
@@ -257,6 +543,33 @@ class CustomRAGEngine:
         # FIX: Aggiungi parametri chunk per il processore
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        # Processi per estrazione/chunking (0 = CPU disponibili nel container)
+        self.ingest_workers = ingest_workers or get_available_cpus()
+        # Pipeline di ingestione: batch di embedding, richieste concorrenti, profondità code
+        self.embedding_batch_size = embedding_batch_size
+        self.embedding_concurrency = embedding_concurrency
+        self.ingest_queue_size = ingest_queue_size
+        self.ingestion_status: Dict[str, Any] = {"state": "idle"}
+        # Il numero di worker di ingestione serve a dividere le CPU tra i pool OCR dei worker
+        self.ocr_options = {**(ocr_options or {}), "INGEST_WORKERS": self.ingest_workers}
+        # Similarità di Jaccard oltre la quale un chunk è un duplicato (0 = disattivato)
+        self.dedup_threshold = dedup_threshold
+        # Budget di token del contesto passato al modello
+        self.max_context_tokens = max_context_tokens
+        self.llm_model = llm_model
+        # Risposte dirette dalle FAQ: (soglia lessicale, soglia embedding); None = disattivate
+        self.faq_thresholds = faq_thresholds
+        self._faq_index: Optional[Tuple[int, FAQIndex]] = None
+        self.faq_hits = 0
+        # Secondo stadio: pool ampio dal vector store, riordinato e ridotto a pochi chunk
+        self.reranker = reranker
+        # Compressione estrattiva: solo le frasi pertinenti dei chunk arrivano al LLM
+        self.compressor = compressor
+        # Cache semantica delle risposte (None = disattivata)
+        self.answer_cache = answer_cache
+        # Cache esatta (domanda normalizzata) memoria + SQLite davanti a get_response_async
+        self.response_cache = response_cache
+        self._index_fingerprint: Optional[Tuple[int, str]] = None
     
     def _build_system_prompt(self) -> str:
         """Prompt di sistema per il chatbot assicurativo"""
@@ -280,95 +593,289 @@ SPECIALIZZAZIONI:
 
 Mantieni sempre tono professionale ma cordiale, tipico del settore assicurativo italiano."""
     
-    async def query(self, question: str, max_context_length: int = 4000) -> RAGResult:
+    # Risposta quando il retrieval non trova nulla sopra la soglia
+    NO_RESULTS_ANSWER = "Non ho trovato informazioni rilevanti per la tua domanda. Puoi riformularla o chiedere qualcosa di più specifico sulle assicurazioni auto o casa?"
+    QUERY_ERROR_ANSWER = "Mi dispiace, si è verificato un errore nel processamento della tua richiesta. Riprova più tardi."
+    GENERATION_ERROR_ANSWER = "Mi dispiace, non sono riuscito a generare una risposta adeguata. Riprova con una domanda più specifica."
+    
+    async def _retrieve(self, question: str, query_embedding: List[float], max_context_tokens: int) -> Dict[str, Any]:
+        """Ricerca e costruzione del contesto"""
+        # 2. Cerca documenti (pool di candidati più ampio se c'è il reranker)
+        search_start = time.time()
+        similar_docs = await self.vector_store.similarity_search(
+            query_embedding, k=self.reranker.candidate_pool if self.reranker else 5, threshold=0.2
+        )
+        if self.reranker:
+            similar_docs = self.reranker.rerank(question, similar_docs)
+        search_time = int((time.time() - search_start) * 1000)
+        
+        retrieval = {
+            "similar_docs": similar_docs,
+            "context": "",
+            "sources": [],
+            "confidence": 0.0,
+            "search_time_ms": search_time
+        }
+        if similar_docs:
+            # 3. Costruisci contesto (fonti e confidence restano quelle dei chunk interi)
+            context_docs = similar_docs
+            if self.compressor:
+                context_docs = self.compressor.compress(question, similar_docs)
+            retrieval["context"] = self._build_context(context_docs, max_context_tokens)
+            retrieval["sources"] = [
+                {
+                    "source": doc.metadata.get("source_file", "unknown"),
+                    "content": doc.content[:200] + "..." if len(doc.content) > 200 else doc.content
+                }
+                for _, doc in similar_docs
+            ]
+            # 4. Calcola confidence
+            avg_similarity = sum(score for score, _ in similar_docs) / len(similar_docs)
+            retrieval["confidence"] = min(avg_similarity * 1.2, 1.0)
+        return retrieval
+    
+    async def _match_faq(self, question: str, query_embedding: Optional[List[float]] = None) -> Optional[FAQMatch]:
+        """FAQ quasi identica alla domanda: lessicale senza embedding, altrimenti per embedding"""
+        if self.faq_thresholds is None:
+            return None
+        generation = self.vector_store.faq_generation
+        if self._faq_index is None or self._faq_index[0] != generation:
+            entries, embeddings = await self.vector_store.load_faq_entries()
+            lexical_threshold, embedding_threshold = self.faq_thresholds
+            self._faq_index = (generation, FAQIndex(entries, embeddings, lexical_threshold, embedding_threshold))
+        faq_index = self._faq_index[1]
+        if not len(faq_index):
+            return None
+        
+        match = faq_index.match_lexical(question) if query_embedding is None else faq_index.match_embedding(query_embedding)
+        if match is not None:
+            self.faq_hits += 1
+            logger.info(f"❓ Risposta diretta da FAQ ({match.method}, {match.score:.3f}): '{match.entry.question[:60]}'")
+        return match
+    
+    @staticmethod
+    def _faq_sources(match: FAQMatch) -> List[Dict[str, str]]:
+        return [{"source": match.entry.source_file, "content": match.entry.question}]
+    
+    def _cached_answer(self, query_embedding: List[float]):
+        if self.answer_cache is None:
+            return None
+        return self.answer_cache.lookup(query_embedding, self.vector_store.generation)
+    
+    def _cache_answer(self, question: str, query_embedding: List[float], generation: int,
+                      answer: str, retrieval: Dict[str, Any]):
+        """Memorizza solo risposte generate sull'indice ancora corrente"""
+        if self.answer_cache is None or not retrieval["similar_docs"] or answer == self.GENERATION_ERROR_ANSWER:
+            return
+        if generation != self.vector_store.generation:
+            return
+        self.answer_cache.store(question, query_embedding, answer, retrieval["sources"],
+                                retrieval["confidence"], generation)
+    
+    async def query(self, question: str, max_context_tokens: Optional[int] = None) -> RAGResult:
         """Esegue una query RAG completa"""
         start_time = time.time()
         
         try:
-            # 1. Genera embedding
-            embedding_start = time.time()
-            query_embedding = await self.embedding_manager.get_embedding(question)
-            embedding_time = int((time.time() - embedding_start) * 1000)
+            # 0. Domanda FAQ (quasi) identica: risposta curata, nessuna chiamata all'API
+            faq_match = await self._match_faq(question)
+            embedding_time = 0
+            if faq_match is None:
+                # 1. Genera embedding
+                embedding_start = time.time()
+                query_embedding = await self.embedding_manager.get_embedding(question)
+                embedding_time = int((time.time() - embedding_start) * 1000)
+                faq_match = await self._match_faq(question, query_embedding)
+            if faq_match is not None:
+                return RAGResult(
+                    answer=faq_match.entry.answer,
+                    sources=self._faq_sources(faq_match),
+                    confidence=faq_match.score,
+                    query_time_ms=int((time.time() - start_time) * 1000),
+                    embedding_time_ms=embedding_time,
+                    faq_hit=True
+                )
             
-            # 2. Cerca documenti
-            search_start = time.time()
-            similar_docs = await self.vector_store.similarity_search(
-                query_embedding, k=5, threshold=0.2
-            )
-            search_time = int((time.time() - search_start) * 1000)
+            # Domanda equivalente già risposta sullo stesso indice: nessun retrieval né LLM
+            cached = self._cached_answer(query_embedding)
+            if cached is not None:
+                return RAGResult(
+                    answer=cached.answer,
+                    sources=cached.sources,
+                    confidence=cached.confidence,
+                    query_time_ms=int((time.time() - start_time) * 1000),
+                    embedding_time_ms=embedding_time,
+                    cache_hit=True
+                )
             
-            if not similar_docs:
+            generation = self.vector_store.generation
+            retrieval = await self._retrieve(question, query_embedding, max_context_tokens or self.max_context_tokens)
+            
+            if not retrieval["similar_docs"]:
                 return RAGResult(
-                    answer="Non ho trovato informazioni rilevanti per la tua domanda. Puoi riformularla o chiedere qualcosa di più specifico sulle assicurazioni auto o casa?",
+                    answer=self.NO_RESULTS_ANSWER,
                     sources=[],
                     confidence=0.0,
                     query_time_ms=int((time.time() - start_time) * 1000),
                     embedding_time_ms=embedding_time,
-                    search_time_ms=search_time
+                    search_time_ms=retrieval["search_time_ms"]
                 )
             
-            # 3. Costruisci contesto
-            context = self._build_context(similar_docs, max_context_length)
-            sources = [
-                {
-                    "source": doc.metadata.get("source_file", "unknown"),
-                    "content": doc.content[:200] + "..." if len(doc.content) > 200 else doc.content
-                }
-                for _, doc in similar_docs
-            ]
-            
-            # 4. Genera risposta
+            # 5. Genera risposta
             generation_start = time.time()
-            answer = await self._generate_answer(question, context)
+            answer = await self._generate_answer(question, retrieval["context"])
             generation_time = int((time.time() - generation_start) * 1000)
-            
-            # 5. Calcola confidence
-            avg_similarity = sum(score for score, _ in similar_docs) / len(similar_docs)
-            confidence = min(avg_similarity * 1.2, 1.0)
+            self._cache_answer(question, query_embedding, generation, answer, retrieval)
             
             return RAGResult(
                 answer=answer,
-                sources=sources,
-                confidence=confidence,
+                sources=retrieval["sources"],
+                confidence=retrieval["confidence"],
                 query_time_ms=int((time.time() - start_time) * 1000),
                 embedding_time_ms=embedding_time,
-                search_time_ms=search_time,
+                search_time_ms=retrieval["search_time_ms"],
                 generation_time_ms=generation_time
             )
             
         except Exception as e:
             logger.error(f"Errore RAG query: {e}")
             return RAGResult(
-                answer="Mi dispiace, si è verificato un errore nel processamento della tua richiesta. Riprova più tardi.",
+                answer=self.QUERY_ERROR_ANSWER,
                 sources=[],
                 confidence=0.0,
                 query_time_ms=int((time.time() - start_time) * 1000)
             )
     
-    def _build_context(self, similar_docs: List[Tuple[float, Document]], 
-                      max_length: int) -> str:
-        """Costruisce il contesto per la generazione"""
-        context_parts = []
-        current_length = 0
-        
-        for score, doc in similar_docs:
-            source = doc.metadata.get("source_file", "documento")
-            doc_text = f"[Fonte: {source}]\n{doc.content}\n"
+    async def query_stream(self, question: str, max_context_tokens: Optional[int] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Query RAG in streaming. Eventi prodotti, in ordine:
+        - {"type": "sources", ...} appena il retrieval è concluso
+        - {"type": "token", "content": ...} per ogni frammento generato dal modello
+        - {"type": "done", "answer": ..., tempi} a generazione completata
+        """
+        start_time = time.time()
+        answer_parts: List[str] = []
+        retrieval: Dict[str, Any] = {"sources": [], "confidence": 0.0}
+        first_token_ms: Optional[int] = None
+        
+        try:
+            faq_match = await self._match_faq(question)
+            embedding_time = 0
+            if faq_match is None:
+                embedding_start = time.time()
+                query_embedding = await self.embedding_manager.get_embedding(question)
+                embedding_time = int((time.time() - embedding_start) * 1000)
+                faq_match = await self._match_faq(question, query_embedding)
             
-            if current_length + len(doc_text) > max_length:
-                break
+            # Risposta già pronta (FAQ o cache semantica): un solo frammento, nessun LLM
+            direct_answer = None
+            if faq_match is not None:
+                direct_answer = faq_match.entry.answer
+                retrieval = {"sources": self._faq_sources(faq_match), "confidence": faq_match.score,
+                             "embedding_time_ms": embedding_time, "faq_hit": True}
+            else:
+                cached = self._cached_answer(query_embedding)
+                if cached is not None:
+                    direct_answer = cached.answer
+                    retrieval = {"sources": cached.sources, "confidence": cached.confidence,
+                                 "embedding_time_ms": embedding_time, "cache_hit": True}
             
-            context_parts.append(doc_text)
-            current_length += len(doc_text)
+            if direct_answer is not None:
+                yield {
+                    "type": "sources",
+                    "sources": retrieval["sources"],
+                    "confidence": retrieval["confidence"],
+                    "retrieval_time_ms": int((time.time() - start_time) * 1000)
+                }
+                first_token_ms = int((time.time() - start_time) * 1000)
+                answer_parts.append(direct_answer)
+                yield {"type": "token", "content": direct_answer}
+            else:
+                generation = self.vector_store.generation
+                retrieval = await self._retrieve(question, query_embedding, max_context_tokens or self.max_context_tokens)
+                retrieval["embedding_time_ms"] = embedding_time
+                yield {
+                    "type": "sources",
+                    "sources": retrieval["sources"],
+                    "confidence": retrieval["confidence"],
+                    "retrieval_time_ms": int((time.time() - start_time) * 1000)
+                }
+                
+                if not retrieval["similar_docs"]:
+                    answer_parts.append(self.NO_RESULTS_ANSWER)
+                    yield {"type": "token", "content": self.NO_RESULTS_ANSWER}
+                else:
+                    generation_start = time.time()
+                    async for delta in self._generate_answer_stream(question, retrieval["context"]):
+                        if first_token_ms is None:
+                            first_token_ms = int((time.time() - start_time) * 1000)
+                        answer_parts.append(delta)
+                        yield {"type": "token", "content": delta}
+                    retrieval["generation_time_ms"] = int((time.time() - generation_start) * 1000)
+                    self._cache_answer(question, query_embedding, generation, "".join(answer_parts).strip(), retrieval)
+        
+        except Exception as e:
+            logger.error(f"Errore RAG query in streaming: {e}")
+            # Testo già inviato resta valido: il messaggio d'errore lo completa
+            error_text = self.QUERY_ERROR_ANSWER if not answer_parts else "\n\n" + self.QUERY_ERROR_ANSWER
+            answer_parts.append(error_text)
+            yield {"type": "token", "content": error_text}
         
-        return "\n---\n".join(context_parts)
+        yield {
+            "type": "done",
+            "answer": "".join(answer_parts).strip(),
+            "sources": retrieval["sources"],
+            "confidence": retrieval["confidence"],
+            "query_time_ms": int((time.time() - start_time) * 1000),
+            "time_to_first_token_ms": first_token_ms,
+            "embedding_time_ms": retrieval.get("embedding_time_ms", 0),
+            "search_time_ms": retrieval.get("search_time_ms", 0),
+            "generation_time_ms": retrieval.get("generation_time_ms", 0),
+            "cache_hit": retrieval.get("cache_hit", False),
+            "faq_hit": retrieval.get("faq_hit", False)
+        }
     
-    async def _generate_answer(self, question: str, context: str) -> str:
-        """Genera risposta con OpenAI"""
-        try:
-            messages = [
-                {"role": "system", "content": self.system_prompt},
-                {"role": "user", "content": f"""
+    # Sotto questo budget residuo un chunk troncato non aggiunge informazione utile
+    MIN_TRIMMED_CHUNK_TOKENS = 40
+    CONTEXT_SEPARATOR = "\n---\n"
+    
+    def _build_context(self, similar_docs: List[Tuple[float, Document]], 
+                      max_tokens: int) -> str:
+        """
+        Costruisce il contesto entro un budget di token: i chunk entrano per rilevanza
+        per token (score / token), quelli che non entrano interi vengono troncati a
+        fine frase, o all'ultima parola se nessuna frase intera entra nel budget.
+        Nel prompt restano ordinati per score.
+        """
+        separator_tokens = count_tokens(self.CONTEXT_SEPARATOR)
+        candidates = []
+        for rank, (score, doc) in enumerate(similar_docs):
+            header = f"[Fonte: {doc.metadata.get('source_file', 'documento')}]\n"
+            header_tokens = count_tokens(header) + separator_tokens
+            content_tokens = count_tokens(doc.content)
+            candidates.append((score / (header_tokens + content_tokens), rank, header, header_tokens, doc.content, content_tokens))
+        
+        selected = []
+        budget = max_tokens
+        for _, rank, header, header_tokens, content, content_tokens in sorted(candidates, reverse=True):
+            if header_tokens + content_tokens > budget:
+                if budget - header_tokens < self.MIN_TRIMMED_CHUNK_TOKENS:
+                    continue
+                available = budget - header_tokens
+                content = trim_to_tokens(content, available) or cut_to_tokens(content, available)
+                if not content:
+                    continue
+                content_tokens = count_tokens(content)
+            selected.append((rank, f"{header}{content}\n"))
+            budget -= header_tokens + content_tokens
+        
+        return self.CONTEXT_SEPARATOR.join(text for _, text in sorted(selected))
+    
+    def _build_messages(self, question: str, context: str) -> List[Dict[str, str]]:
+        """Messaggi per il modello: prompt di sistema, contesto e domanda"""
+        return [
+            {"role": "system", "content": self.system_prompt},
+            {"role": "user", "content": f"""
 CONTESTO DOCUMENTI:
 {context}
 
@@ -377,11 +884,14 @@ DOMANDA DELL'UTENTE:
 
 Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non sono sufficienti, dillo chiaramente.
 """}
-            ]
-            
+        ]
+    
+    async def _generate_answer(self, question: str, context: str) -> str:
+        """Genera risposta con OpenAI"""
+        try:
             response = await self.llm_client.chat.completions.create(
-                model="gpt-3.5-turbo",
-                messages=messages,
+                model=self.llm_model,
+                messages=self._build_messages(question, context),
                 max_tokens=800,
                 temperature=0.1
             )
@@ -390,20 +900,296 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
             
         except Exception as e:
             logger.error(f"Errore generazione risposta: {e}")
-            return "Mi dispiace, non sono riuscito a generare una risposta adeguata. Riprova con una domanda più specifica."
+            return self.GENERATION_ERROR_ANSWER
     
-    async def initialize_documents(self, docs_directory: str):
-        """Inizializza il sistema con i documenti - VERSIONE CORRETTA"""
-        
+    async def _generate_answer_stream(self, question: str, context: str) -> AsyncIterator[str]:
+        """Genera la risposta con OpenAI in streaming, un frammento di testo alla volta"""
+        stream = await self.llm_client.chat.completions.create(
+            model=self.llm_model,
+            messages=self._build_messages(question, context),
+            max_tokens=800,
+            temperature=0.1,
+            stream=True
+        )
         try:
-            # Import del processore enterprise corretto
-            from app.modules.enterprise_pdf_processor import EnhancedDocumentProcessor
+            async for chunk in stream:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            # Client disconnesso o errore: chiude la connessione HTTP verso OpenAI
+            close = getattr(stream, "close", None)
+            if close is not None:
+                await close()
+    
+    def _chunk_params(self) -> str:
+        """Parametri di chunking registrati nel manifest (JSON canonico)"""
+        return json.dumps({
+            "chunker": "structured-tokens",
+            "faq_index": 1,
+            "chunk_size_tokens": self.chunk_size,
+            "chunk_overlap_tokens": self.chunk_overlap,
+            "dedup_threshold": self.dedup_threshold
+        }, sort_keys=True)
+    
+    async def _plan_ingestion(self, docs_path: Path,
+                              manifest: Dict[str, Dict[str, Any]],
+                              only_files: Optional[Set[str]] = None) -> Tuple[List[Tuple[Path, Dict[str, Any]]], List[str]]:
+        """
+        Confronta i file su disco con il manifest: restituisce (da processare, rimossi).
+        Con `only_files` vengono considerati solo i file indicati (aggiornamenti dal watcher).
+        """
+        chunk_params = self._chunk_params()
+        embedding_model = self.embedding_manager.model
+        
+        to_process: List[Tuple[Path, Dict[str, Any]]] = []
+        current_files = set()
+        
+        for file_path in sorted(docs_path.glob("*")):
+            if file_path.suffix.lower() not in SUPPORTED_EXTENSIONS or not file_path.is_file():
+                continue
             
-            processor = EnhancedDocumentProcessor(
-                chunk_size=self.chunk_size,
-                chunk_overlap=self.chunk_overlap
-            )
+            rel_path = file_path.name
+            if only_files is not None and rel_path not in only_files:
+                continue
+            current_files.add(rel_path)
+            stat = file_path.stat()
+            previous = manifest.get(rel_path)
+            same_params = bool(previous) and \
+                previous["chunk_params"] == chunk_params and \
+                previous["embedding_model"] == embedding_model
+            
+            # Fast path: dimensione e mtime invariati, nessun hash necessario
+            if same_params and previous["size"] == stat.st_size and previous["mtime"] == stat.st_mtime:
+                continue
+            
+            sha256 = await asyncio.to_thread(_file_sha256, file_path)
+            entry = {
+                "path": rel_path,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "sha256": sha256,
+                "chunk_params": chunk_params,
+                "embedding_model": embedding_model,
+                "chunk_count": previous["chunk_count"] if previous else 0
+            }
+            
+            # File "toccato" ma contenuto identico: aggiorna solo il manifest
+            if same_params and previous["sha256"] == sha256:
+                await self.vector_store.upsert_manifest_entry(entry)
+                logger.debug(f"{rel_path}: contenuto invariato, mtime aggiornato")
+                continue
             
+            to_process.append((file_path, entry))
+        
+        removed = [
+            path for path in manifest
+            if path not in current_files and (only_files is None or path in only_files)
+        ]
+        return to_process, removed
+    
+    async def _run_ingestion_pipeline(self, to_process: List[Tuple[Path, Dict[str, Any]]]):
+        """
+        Pipeline a stadi collegati da code limitate:
+        estrazione/chunking (process pool) → embedding (batch concorrenti) → scrittura.
+        Una coda piena blocca lo stadio a monte, quindi la memoria resta limitata
+        a pochi file/batch in volo e i chunk diventano ricercabili man mano.
+        """
+        status = self.ingestion_status
+        loop = asyncio.get_running_loop()
+        
+        pending_files: asyncio.Queue = asyncio.Queue()
+        for item in to_process:
+            pending_files.put_nowait(item)
+        embed_queue: asyncio.Queue = asyncio.Queue(maxsize=self.ingest_queue_size)
+        store_queue: asyncio.Queue = asyncio.Queue(maxsize=self.ingest_queue_size)
+        
+        async def extract_stage(pool: ProcessPoolExecutor):
+            while True:
+                try:
+                    file_path, entry = pending_files.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                logger.info(f"📝 Processando: {file_path.name}")
+                state = _FileIngestState(entry=entry, file_path=file_path)
+                batches = 0
+                
+                # I chunk arrivano a batch mentre il worker estrae le pagine:
+                # la coda limitata rallenta il worker se embedding/scrittura sono indietro
+                chunk_queue = await asyncio.to_thread(manager.Queue, self.ingest_queue_size)
+                future = loop.run_in_executor(
+                    pool, stream_file_in_worker,
+                    str(file_path), self.chunk_size, self.chunk_overlap, self.ocr_options,
+                    chunk_queue, self.embedding_batch_size, self.dedup_threshold
+                )
+                
+                while True:
+                    try:
+                        batch = await asyncio.to_thread(chunk_queue.get, True, 1.0)
+                    except queue.Empty:
+                        if future.done():
+                            # Worker terminato senza chiudere lo stream (processo morto)
+                            break
+                        continue
+                    if batch is None:
+                        break
+                    batches += 1
+                    status["chunks_extracted"] += len(batch)
+                    await embed_queue.put((state, batch))
+                
+                try:
+                    summary = await future
+                    state.duplicates = summary["duplicates"]
+                    status["chunks_deduplicated"] += sum(len(locations) for locations in state.duplicates.values())
+                except Exception as e:
+                    logger.error(f"❌ Errore processando {file_path.name}: {e}")
+                    # I batch già inviati vengono scritti, ma il file non entra nel manifest
+                    state.failed = True
+                    if not batches:
+                        status["files_failed"] += 1
+                        continue
+                
+                if not batches:
+                    logger.warning(f"⚠️ {file_path.name}: Nessun chunk estratto")
+                    # Il contenuto precedente non è più valido
+                    await self.vector_store.delete_source_documents(entry["path"])
+                    status["files_failed"] += 1
+                    continue
+                
+                logger.info(f"✅ {file_path.name}: estrazione completata ({batches} batch)")
+                state.total_batches = batches
+                if state.stored_batches == state.total_batches:
+                    # La scrittura ha già smaltito tutti i batch del file
+                    await self._complete_file_ingestion(state)
+        
+        async def embed_stage():
+            while True:
+                item = await embed_queue.get()
+                if item is None:
+                    return
+                state, batch = item
+                
+                try:
+                    embeddings = await self.embedding_manager.get_embeddings_batch(
+                        [doc.content for doc in batch], batch_size=len(batch)
+                    )
+                    for doc, embedding in zip(batch, embeddings):
+                        doc.embedding = embedding
+                    # Embedding falliti (vettori nulli): il file verrà riprocessato al prossimo avvio
+                    if any(not any(embedding) for embedding in embeddings):
+                        state.failed = True
+                except Exception as e:
+                    logger.error(f"❌ Errore embedding {state.entry['path']}: {e}")
+                    state.failed = True
+                
+                await store_queue.put((state, batch))
+        
+        async def store_stage():
+            while True:
+                item = await store_queue.get()
+                if item is None:
+                    return
+                state, batch = item
+                
+                # Chunk senza embedding (batch fallito o vettori nulli) non vengono scritti:
+                # il file è già marcato come fallito e verrà riprocessato al prossimo avvio
+                valid = [doc for doc in batch if doc.embedding is not None and any(doc.embedding)]
+                if len(valid) < len(batch):
+                    logger.warning(f"⚠️ {state.entry['path']}: {len(batch) - len(valid)} chunk senza embedding non indicizzati")
+                
+                try:
+                    if valid:
+                        # Al primo batch scritto rimuove i chunk della versione precedente del file,
+                        # compresi quelli in eccesso se il file si è accorciato
+                        if not state.cleared:
+                            await self.vector_store.delete_source_chunks(state.entry["path"])
+                            state.cleared = True
+                        await self.vector_store.add_documents(valid)
+                        state.chunk_count += len(valid)
+                        status["chunks_indexed"] += len(valid)
+                except Exception as e:
+                    logger.error(f"❌ Errore scrittura {state.entry['path']}: {e}")
+                    state.failed = True
+                
+                state.stored_batches += 1
+                if state.total_batches is not None and state.stored_batches == state.total_batches:
+                    await self._complete_file_ingestion(state)
+        
+        workers = min(self.ingest_workers, len(to_process))
+        logger.info(
+            f"⚙️ Pipeline: {len(to_process)} file, {workers} processi di estrazione, "
+            f"{self.embedding_concurrency} richieste embedding concorrenti"
+        )
+        
+        pool = ProcessPoolExecutor(max_workers=workers)
+        manager = await asyncio.to_thread(multiprocessing.Manager)
+        extractors = [asyncio.create_task(extract_stage(pool)) for _ in range(workers)]
+        embedders = [asyncio.create_task(embed_stage()) for _ in range(self.embedding_concurrency)]
+        storer = asyncio.create_task(store_stage())
+        
+        try:
+            await asyncio.gather(*extractors)
+            for _ in embedders:
+                await embed_queue.put(None)
+            await asyncio.gather(*embedders)
+            await store_queue.put(None)
+            await storer
+        finally:
+            for task in (*extractors, *embedders, storer):
+                task.cancel()
+            pool.shutdown(wait=False, cancel_futures=True)
+            await asyncio.to_thread(manager.shutdown)
+    
+    async def _complete_file_ingestion(self, state: _FileIngestState):
+        """Registra nel manifest un file interamente indicizzato"""
+        status = self.ingestion_status
+        if state.failed:
+            logger.warning(f"⚠️ {state.entry['path']}: indicizzazione incompleta, manifest non aggiornato")
+            status["files_failed"] += 1
+            return
+        
+        if state.duplicates:
+            # Back-reference dei duplicati eliminati sul chunk canonico
+            await self.vector_store.add_duplicate_locations(state.duplicates)
+        
+        if state.file_path is not None and state.file_path.suffix.lower() in FAQ_EXTENSIONS:
+            await self._index_faq(state.file_path, state.entry["path"])
+        
+        state.entry["chunk_count"] = state.chunk_count
+        await self.vector_store.upsert_manifest_entry(state.entry)
+        status["files_processed"] += 1
+        logger.info(f"💾 {state.entry['path']}: {state.chunk_count} chunks indicizzati")
+        if not self.is_initialized and state.chunk_count:
+            # Primo file completo: le query possono usare l'indice parziale
+            self.is_initialized = True
+            logger.info("⚡ Indice parziale interrogabile, ingestione in corso")
+    
+    async def _index_faq(self, file_path: Path, source_file: str):
+        """Riconosce le coppie domanda/risposta del file e ne indicizza le domande"""
+        try:
+            text = await asyncio.to_thread(file_path.read_text, encoding="utf-8", errors="replace")
+            pairs = extract_faq_pairs(text)
+            embeddings = []
+            if pairs:
+                embeddings = await self.embedding_manager.get_embeddings_batch(
+                    [question for question, _ in pairs], batch_size=self.embedding_batch_size
+                )
+            await self.vector_store.replace_faq_entries(
+                source_file, [(question, answer, embedding) for (question, answer), embedding in zip(pairs, embeddings)]
+            )
+            if pairs:
+                logger.info(f"❓ {source_file}: {len(pairs)} FAQ indicizzate per risposte dirette")
+        except Exception as e:
+            # Le FAQ sono un'ottimizzazione: il file resta comunque indicizzato
+            logger.warning(f"⚠️ {source_file}: indicizzazione FAQ fallita: {e}")
+    
+    async def initialize_documents(self, docs_directory: str, only_files: Optional[Set[str]] = None):
+        """
+        Inizializza il sistema con i documenti - ingestione incrementale basata sul manifest.
+        `only_files` limita l'aggiornamento ai file indicati (nomi in docs_directory).
+        """
+        
+        try:
             docs_path = Path(docs_directory)
             
             if not docs_path.exists():
@@ -411,60 +1197,44 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
                 self.is_initialized = False
                 return
             
-            all_documents = []
-            supported_extensions = ['.txt', '.md', '.pdf', '.docx']
-            processed_files = 0
-            failed_files = 0
-            
             logger.info(f"🔍 Inizializzazione documenti da: {docs_path}")
+            self.ingestion_status = {
+                "state": "running",
+                "files_total": 0,
+                "files_processed": 0,
+                "files_failed": 0,
+                "files_removed": 0,
+                "chunks_extracted": 0,
+                "chunks_deduplicated": 0,
+                "chunks_indexed": 0,
+                "started_at": time.time(),
+                "finished_at": None
+            }
             
-            # Processa tutti i file supportati
-            for file_path in docs_path.glob("*"):
-                if file_path.suffix.lower() in supported_extensions and file_path.is_file():
-                    logger.info(f"📝 Processando: {file_path.name}")
-                    
-                    try:
-                        docs = await processor.process_file(str(file_path))
-                        
-                        if docs:
-                            all_documents.extend(docs)
-                            processed_files += 1
-                            logger.info(f"✅ {file_path.name}: {len(docs)} chunks estratti")
-                        else:
-                            logger.warning(f"⚠️ {file_path.name}: Nessun chunk estratto")
-                            failed_files += 1
-                            
-                    except Exception as e:
-                        logger.error(f"❌ Errore processando {file_path.name}: {e}")
-                        failed_files += 1
-
-            if not all_documents:
-                logger.warning("❌ Nessun documento processato con successo")
-                self.is_initialized = False
-                return
-
-            logger.info(f"📚 Risultati processamento:")
-            logger.info(f"   ✅ File processati con successo: {processed_files}")
-            logger.info(f"   ❌ File falliti: {failed_files}")
-            logger.info(f"   📄 Totale chunks generati: {len(all_documents)}")
-
-            # Genera embeddings in batch
-            logger.info("🧮 Generazione embeddings in corso...")
-            texts = [doc.content for doc in all_documents]
+            manifest = await self.vector_store.get_manifest()
+            to_process, removed = await self._plan_ingestion(docs_path, manifest, only_files)
             
-            embeddings = await self.embedding_manager.get_embeddings_batch(texts, batch_size=20)
+            # Rimuove i chunk dei file cancellati
+            for rel_path in removed:
+                await self.vector_store.delete_source_documents(rel_path)
+                logger.info(f"🗑️ {rel_path}: file rimosso, chunk eliminati")
+            
+            if not to_process:
+                logger.info(f"⚡ Nessun documento nuovo o modificato ({len(manifest) - len(removed)} file già indicizzati)")
+            
+            self.ingestion_status.update(files_total=len(to_process), files_removed=len(removed))
+            
+            if to_process:
+                await self._run_ingestion_pipeline(to_process)
+                
+                logger.info(f"📚 Risultati processamento:")
+                logger.info(f"   ✅ File processati con successo: {self.ingestion_status['files_processed']}")
+                logger.info(f"   ❌ File falliti: {self.ingestion_status['files_failed']}")
+                logger.info(f"   📄 Totale chunks indicizzati: {self.ingestion_status['chunks_indexed']}")
+            
+            self.ingestion_status["state"] = "completed"
+            self.ingestion_status["finished_at"] = time.time()
             
-            # Assegna embeddings ai documenti
-            for doc, embedding in zip(all_documents, embeddings):
-                doc.embedding = embedding
-
-            logger.info(f"✅ Embeddings generati: {len(embeddings)}")
-
-            # Salva nel vector store
-            logger.info("💾 Indicizzazione nel vector store...")
-            await self.vector_store.add_documents(all_documents)
-            logger.info("✅ Documenti indicizzati nel vector store")
-
             # Verifica finale e statistiche
             stats = await self.vector_store.get_stats()
             total_docs = stats.get('total_documents', 0)
@@ -485,12 +1255,13 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
                 logger.error("❌ Vector store vuoto dopo l'inizializzazione")
                 self.is_initialized = False
                 
-        except ImportError as e:
-            logger.error(f"❌ Errore import EnhancedDocumentProcessor: {e}")
-            self.is_initialized = False
         except Exception as e:
             logger.error(f"❌ Errore durante inizializzazione documenti: {e}")
-            self.is_initialized = False
+            self.ingestion_status["state"] = "failed"
+            self.ingestion_status["error"] = str(e)
+            if only_files is None:
+                # Un aggiornamento parziale fallito non invalida l'indice esistente
+                self.is_initialized = False
     
     async def get_system_stats(self) -> Dict[str, Any]:
         """Statistiche del sistema"""
@@ -504,7 +1275,13 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
                     "mode": "Custom RAG Engine",
                     "vector_store": vector_stats,
                     "chunk_size": self.chunk_size,
-                    "chunk_overlap": self.chunk_overlap
+                    "chunk_overlap": self.chunk_overlap,
+                    "ingestion": self.ingestion_status,
+                    "faq_direct_answers": (
+                        {**self._faq_index[1].get_stats(), "hits": self.faq_hits} if self._faq_index else None
+                    ),
+                    "reranker": self.reranker.get_stats() if self.reranker else None,
+                    "context_compression": self.compressor.get_stats() if self.compressor else None
                 },
                 "performance": {
                     "rag_get_response": {
@@ -513,12 +1290,13 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
                     }
                 },
                 "cache": {
-                    "memory_cache_stats": {
-                        "hits": len(self.embedding_manager.embedding_cache),
-                        "misses": 0,
-                        "hit_rate_percent": 85.0
-                    },
-                    "memory_cache_entry_count": len(self.embedding_manager.embedding_cache)
+                    "memory_cache_stats": (
+                        self.response_cache.get_hit_stats() if self.response_cache
+                        else {"hits": 0, "misses": 0, "hit_rate_percent": 0.0}
+                    ),
+                    "memory_cache_entry_count": len(self.response_cache.memory_cache) if self.response_cache else 0,
+                    "embedding_cache_entry_count": len(self.embedding_manager.embedding_cache),
+                    "semantic_answer_cache": self.answer_cache.get_stats() if self.answer_cache else None
                 }
             }
         }
@@ -526,50 +1304,184 @@ Rispondi basandoti esclusivamente sui documenti forniti. Se le informazioni non
     async def force_clear_all_cache(self):
         """Pulisci cache"""
         self.embedding_manager.embedding_cache.clear()
+        if self.answer_cache is not None:
+            self.answer_cache.invalidate()
         logger.info("Cache Custom RAG pulita")
         return True
 
+    def _generation_settings(self) -> Dict[str, Any]:
+        """Impostazioni che cambiano la risposta a parità di indice: modello, reranker, compressione, budget"""
+        return {
+            "llm_model": self.llm_model,
+            "max_context_tokens": self.max_context_tokens,
+            "reranker": {
+                "candidate_pool": self.reranker.candidate_pool,
+                "top_n": self.reranker.top_n,
+                "weights": self.reranker.weights
+            } if self.reranker else None,
+            "compression": {
+                "sentences_per_chunk": self.compressor.sentences_per_chunk,
+                "min_chunk_tokens": self.compressor.min_chunk_tokens,
+                "min_keep_ratio": self.compressor.min_keep_ratio
+            } if self.compressor else None
+        }
+    
+    async def _response_cache_context(self) -> Optional[Dict[str, str]]:
+        """
+        Contesto della chiave di cache: impronta del manifest, del prompt e delle
+        impostazioni di generazione, così una risposta persistita non sopravvive a modifiche
+        dei documenti, a un riavvio con un indice diverso o a un cambio di modello/pipeline.
+        None (cache non usata) durante un'ingestione in corso.
+        """
+        if self.response_cache is None or self.ingestion_status.get("state") == "running":
+            return None
+        generation = self.vector_store.generation
+        if self._index_fingerprint is None or self._index_fingerprint[0] != generation:
+            manifest = await self.vector_store.get_manifest()
+            digest = hashlib.sha256(self.system_prompt.encode("utf-8"))
+            digest.update(json.dumps(self._generation_settings(), sort_keys=True).encode("utf-8"))
+            for path in sorted(manifest):
+                entry = manifest[path]
+                digest.update(f"{path}|{entry['sha256']}|{entry['chunk_params']}|{entry['embedding_model']}".encode("utf-8"))
+            self._index_fingerprint = (generation, digest.hexdigest()[:16])
+        return {"kind": "rag_response", "index": self._index_fingerprint[1]}
+    
     # Compatibility methods per interfaccia esistente
     async def get_response_async(self, query: str, **kwargs) -> Dict[str, Any]:
-        """Compatibilità con API esistente"""
+        """Compatibilità con API esistente (domande identiche servite dalla response cache)"""
+        cache_key = normalize_query(query)
+        cache_context = await self._response_cache_context()
+        if cache_context is not None:
+            cached = await self.response_cache.get(cache_key, cache_context)
+            if cached is not None:
+                return {**cached, "cached": True}
+        
         result = await self.query(query)
-        return {
+        response = {
             "response": result.answer,
             "sources": [
                 {"source": src["source"], "content": src["content"]}
                 for src in result.sources
             ]
         }
+        
+        # Solo risposte fondate su documenti, e solo se l'indice non è cambiato nel frattempo
+        cacheable = result.sources and not result.faq_hit and result.answer not in (self.GENERATION_ERROR_ANSWER, self.QUERY_ERROR_ANSWER)
+        if cache_context is not None and cacheable and cache_context == await self._response_cache_context():
+            await self.response_cache.set(cache_key, response, cache_context)
+        return {**response, "cached": result.cache_hit, "faq": result.faq_hit}
 
 
 # Factory function
-async def create_custom_rag_system(config: Dict[str, Any]) -> CustomRAGEngine:
-    """Crea sistema RAG custom - VERSIONE CORRETTA"""
+async def build_custom_rag_system(config: Dict[str, Any],
+                                  vector_db_path: Optional[str] = None,
+                                  embedding_manager: Optional[EmbeddingManager] = None) -> CustomRAGEngine:
+    """
+    Crea l'engine RAG senza indicizzare i documenti.
+    `vector_db_path` permette di costruire un indice accanto a quello live (reindex),
+    `embedding_manager` di riusare quello esistente con la sua cache.
+    """
     openai_api_key = config.get("OPENAI_API_KEY")
     if not openai_api_key:
         raise ValueError("OPENAI_API_KEY richiesta per Custom RAG System")
     
-    vector_db_path = config.get("VECTOR_DB_PATH", "./data/custom_vector_store.db")
-    chunk_size = config.get("CHUNK_SIZE", 1000)
-    chunk_overlap = config.get("CHUNK_OVERLAP", 200)
+    vector_db_path = vector_db_path or config.get("VECTOR_DB_PATH", "./data/custom_vector_store.db")
+    chunk_size = config.get("CHUNK_SIZE_TOKENS", 300)
+    chunk_overlap = config.get("CHUNK_OVERLAP_TOKENS", 40)
+    embeddings_model = config.get("EMBEDDINGS_MODEL_NAME", "text-embedding-ada-002")
+    ingest_workers = config.get("INGEST_WORKERS", 0)
+    
+    if not TIKTOKEN_AVAILABLE:
+        logger.warning("⚠️ tiktoken non installato: token stimati dai caratteri (~4 per token), "
+                       "dimensione dei chunk e budget del contesto approssimati")
     
     # Inizializza componenti
     vector_store = SQLiteVectorStore(vector_db_path)
     await vector_store.initialize()
     
-    embedding_manager = EmbeddingManager(openai_api_key)
+    # Import di openai e creazione dei client (contesto SSL) richiedono circa un secondo:
+    # avvengono in un thread, così l'event loop continua a servire /api/health
+    if embedding_manager is None:
+        embedding_manager = await asyncio.to_thread(EmbeddingManager, openai_api_key, model=embeddings_model)
+    
+    answer_cache = None
+    if config.get("SEMANTIC_CACHE_ENABLED", True):
+        answer_cache = SemanticAnswerCache(
+            threshold=config.get("SEMANTIC_CACHE_THRESHOLD", 0.95),
+            ttl_seconds=config.get("SEMANTIC_CACHE_TTL_SECONDS", 3600),
+            max_entries=config.get("SEMANTIC_CACHE_MAX_ENTRIES", 2000)
+        )
     
-    rag_engine = CustomRAGEngine(
+    response_cache = None
+    if config.get("RESPONSE_CACHE_ENABLED", True):
+        from app.utils.smart_cache import smart_cache
+        response_cache = smart_cache
+    
+    faq_thresholds = None
+    if config.get("FAQ_DIRECT_ANSWERS_ENABLED", True):
+        faq_thresholds = (config.get("FAQ_LEXICAL_THRESHOLD", 0.85), config.get("FAQ_EMBEDDING_THRESHOLD", 0.95))
+    reranker = LinearReranker.from_config(config) if config.get("RERANKER_ENABLED", False) else None
+    compressor = None
+    if config.get("CONTEXT_COMPRESSION_ENABLED", False):
+        compressor = ExtractiveCompressor(
+            sentences_per_chunk=config.get("COMPRESSION_SENTENCES_PER_CHUNK", 3),
+            min_chunk_tokens=config.get("COMPRESSION_MIN_CHUNK_TOKENS", 80),
+            min_keep_ratio=config.get("COMPRESSION_MIN_KEEP_RATIO", 0.3)
+        )
+    
+    return await asyncio.to_thread(
+        CustomRAGEngine,
         vector_store=vector_store,
         embedding_manager=embedding_manager,
         openai_api_key=openai_api_key,
         chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap
+        chunk_overlap=chunk_overlap,
+        ingest_workers=ingest_workers,
+        embedding_batch_size=config.get("BATCH_SIZE_EMBEDDINGS", 20),
+        embedding_concurrency=config.get("EMBEDDING_CONCURRENCY", 2),
+        ingest_queue_size=config.get("INGEST_QUEUE_SIZE", 8),
+        ocr_options=config.get("OCR_CONFIG", {}),
+        dedup_threshold=config.get("DEDUP_THRESHOLD", 0.9),
+        max_context_tokens=config.get("MAX_CONTEXT_TOKENS", 1000),
+        llm_model=config.get("LLM_MODEL_NAME", "gpt-3.5-turbo"),
+        faq_thresholds=faq_thresholds,
+        reranker=reranker,
+        compressor=compressor,
+        answer_cache=answer_cache,
+        response_cache=response_cache
     )
+
+
+async def prepare_custom_rag_system(config: Dict[str, Any]) -> CustomRAGEngine:
+    """
+    Crea l'engine e lo rende subito interrogabile sull'indice già presente
+    (DB persistente o snapshot), senza attendere l'ingestione dei documenti.
+    """
+    rag_engine = await build_custom_rag_system(config)
+    
+    # Snapshot prebuilt: con indice vuoto evita estrazione ed embedding all'avvio
+    snapshot_path = config.get("INDEX_SNAPSHOT_PATH")
+    if snapshot_path:
+        from app.modules.index_snapshot import restore_snapshot
+        await restore_snapshot(rag_engine, snapshot_path, nprobe=config.get("INDEX_IVF_NPROBE", 8))
+    
+    stats = await rag_engine.vector_store.get_stats()
+    if stats.get("total_documents", 0) > 0:
+        rag_engine.is_initialized = True
+        await rag_engine.vector_store.warm_up()
+        logger.info(f"⚡ Indice esistente utilizzabile subito: {stats['total_documents']} chunk")
+    return rag_engine
+
+
+async def create_custom_rag_system(config: Dict[str, Any]) -> CustomRAGEngine:
+    """Crea sistema RAG custom e indicizza i documenti"""
+    rag_engine = await prepare_custom_rag_system(config)
     
     # Inizializza documenti
     docs_directory = config.get("DOCS_DIRECTORY", "./insurance_docs")
     await rag_engine.initialize_documents(docs_directory)
+    if rag_engine.is_initialized:
+        await rag_engine.vector_store.warm_up()
     
     logger.info("Custom RAG System creato e configurato")
     return rag_engine
@@ -578,13 +1490,9 @@ async def create_custom_rag_system(config: Dict[str, Any]) -> CustomRAGEngine:
 # Initialization function per compatibilità
 async def init_rag_system() -> CustomRAGEngine:
     """Inizializza Custom RAG System"""
-    from app.config import OPENAI_API_KEY, DOCS_DIRECTORY
+    from app.config import get_config
     
-    config = {
-        "OPENAI_API_KEY": OPENAI_API_KEY,
-        "DOCS_DIRECTORY": DOCS_DIRECTORY,
-        "VECTOR_DB_PATH": "./data/custom_vector_store.db"
-    }
+    config = get_config()
     
     return await create_custom_rag_system(config)
 
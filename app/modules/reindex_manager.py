@@ -0,0 +1,129 @@
+# app/modules/reindex_manager.py
+"""
+Reindicizzazione in background con swap atomico dell'indice.
+
+Il nuovo indice viene costruito in un file accanto a quello live (copia consistente
+via backup SQLite in modalità incrementale, file vuoto in modalità completa);
+a ingestione completata il file sostituisce quello live con os.replace e il nuovo
+engine prende il posto del vecchio in `app.state.rag_system`. Le query in corso
+continuano sull'engine precedente, quelle nuove usano subito il nuovo indice.
+"""
+
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+from app.modules.rag_system import CustomRAGEngine, build_custom_rag_system
+from app.utils.sqlite_backup import backup_sqlite
+
+logger = logging.getLogger(__name__)
+
+
+class ReindexManager:
+    """Un job di reindicizzazione alla volta; stato interrogabile via API"""
+
+    def __init__(self, config: Dict[str, Any]):
+        self.config = config
+        self.live_db_path = config.get("VECTOR_DB_PATH", "./data/custom_vector_store.db")
+        self.docs_directory = config.get("DOCS_DIRECTORY", "./insurance_docs")
+        # Serializza ogni scrittura sull'indice (reindex, aggiornamenti incrementali)
+        self.ingest_lock = asyncio.Lock()
+        self.job: Dict[str, Any] = {"state": "idle"}
+        self._task: Optional[asyncio.Task] = None
+        self._building: Optional[CustomRAGEngine] = None
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, app_state, full: bool = False) -> Dict[str, Any]:
+        """Accoda un job di reindicizzazione; se uno è già in corso restituisce quello"""
+        if self.is_running():
+            return self.get_status()
+
+        self.job = {
+            "job_id": uuid.uuid4().hex[:12],
+            "state": "queued",
+            "mode": "full" if full else "incremental",
+            "queued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None
+        }
+        self._task = asyncio.get_running_loop().create_task(self._run(app_state, full))
+        logger.info(f"🔄 Reindex {self.job['job_id']} accodato ({self.job['mode']})")
+        return self.get_status()
+
+    def get_status(self) -> Dict[str, Any]:
+        status = dict(self.job)
+        if self._building is not None:
+            status["ingestion"] = dict(self._building.ingestion_status)
+        return status
+
+    async def stop(self):
+        if self.is_running():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def _run(self, app_state, full: bool):
+        staging_path = f"{self.live_db_path}.staging"
+        async with self.ingest_lock:
+            self.job["state"] = "running"
+            self.job["started_at"] = time.time()
+            try:
+                # 1. Base del nuovo indice: copia dell'indice live (solo i file cambiati
+                #    verranno riprocessati grazie al manifest) oppure indice vuoto
+                if not full and os.path.exists(self.live_db_path):
+                    await asyncio.to_thread(backup_sqlite, self.live_db_path, staging_path)
+                elif os.path.exists(staging_path):
+                    os.remove(staging_path)
+
+                # 2. Ingestione sul file di staging, riusando la cache degli embedding live
+                live_engine = getattr(app_state, "rag_system", None)
+                embedding_manager = getattr(live_engine, "embedding_manager", None)
+                new_engine = await build_custom_rag_system(
+                    self.config, vector_db_path=staging_path, embedding_manager=embedding_manager
+                )
+                self._building = new_engine
+                await new_engine.initialize_documents(self.docs_directory)
+
+                ingestion = new_engine.ingestion_status
+                if ingestion.get("state") != "completed":
+                    raise RuntimeError(ingestion.get("error") or "Ingestione non completata")
+                if not new_engine.is_initialized:
+                    raise RuntimeError("Nuovo indice vuoto: swap annullato")
+
+                # 3. Swap atomico: il file rimpiazza quello live e l'engine quello in uso.
+                #    Le connessioni del vector store sono per operazione, quindi le query
+                #    in corso terminano sul vecchio file e le successive aprono il nuovo.
+                os.replace(staging_path, self.live_db_path)
+                new_engine.vector_store.db_path = self.live_db_path
+                app_state.rag_system = new_engine
+
+                self.job["state"] = "completed"
+                logger.info(
+                    f"✅ Reindex {self.job['job_id']} completato: "
+                    f"{ingestion.get('files_processed', 0)} file aggiornati, indice sostituito"
+                )
+            except asyncio.CancelledError:
+                self.job["state"] = "cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"❌ Reindex {self.job['job_id']} fallito: {e}", exc_info=True)
+                self.job["state"] = "failed"
+                self.job["error"] = str(e)
+            finally:
+                self.job["finished_at"] = time.time()
+                if self._building is not None:
+                    self.job["ingestion"] = dict(self._building.ingestion_status)
+                self._building = None
+                if self.job["state"] != "completed" and os.path.exists(staging_path):
+                    try:
+                        os.remove(staging_path)
+                    except OSError:
+                        pass
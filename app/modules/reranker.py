@@ -0,0 +1,183 @@
+# app/modules/reranker.py
+"""
+Reranker CPU di secondo stadio.
+
+Il retrieval vettoriale restituisce un pool ampio di candidati (es. 30); il reranker
+calcola per ognuno poche feature lessicali e le combina con lo score di embedding in
+un modello lineare:
+
+- bm25: BM25 dei termini della domanda (IDF calcolato sul pool), normalizzato sul massimo
+- coverage: frazione dei termini distinti della domanda presenti nel chunk
+- proximity: quanto sono vicini i termini della domanda nel testo (finestra minima)
+- embedding: cosine similarity del retrieval
+
+BM25 e coverage sono calcolati in blocco con numpy sulla matrice candidati × termini.
+Il rerank ha un budget di tempo per query, controllato tra un candidato e l'altro:
+appena viene superato il calcolo si interrompe e si torna all'ordine dell'embedding.
+I pesi di default sono impostati a mano; pesi appresi offline possono essere caricati
+da un file JSON con le stesse chiavi.
+"""
+
+import json
+import logging
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.utils.text_normalization import query_terms, tokenize
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_WEIGHTS = {
+    "bias": 0.0,
+    "embedding": 1.0,
+    "bm25": 0.35,
+    "coverage": 0.25,
+    "proximity": 0.15
+}
+FEATURES = ("embedding", "bm25", "coverage", "proximity")
+
+
+class RerankBudgetExceeded(Exception):
+    """Budget di tempo del rerank esaurito"""
+
+
+def _proximity(tokens: List[str], term_index: Dict[str, int]) -> float:
+    """1 se i termini trovati sono adiacenti, verso 0 quanto più sono sparsi"""
+    last_seen: Dict[int, int] = {}
+    best_span = None
+    for position, token in enumerate(tokens):
+        term = term_index.get(token)
+        if term is None:
+            continue
+        last_seen[term] = position
+        if len(last_seen) >= 2:
+            span = position - min(last_seen.values()) + 1
+            extra = span - len(last_seen)
+            if best_span is None or extra < best_span:
+                best_span = extra
+    return 0.0 if best_span is None else 1.0 / (1.0 + best_span)
+
+
+class LinearReranker:
+    """Reranker lineare su feature lessicali + score di embedding"""
+
+    def __init__(self, candidate_pool: int = 30, top_n: int = 3, time_budget_ms: float = 20.0,
+                 weights: Optional[Dict[str, float]] = None, k1: float = 1.2, b: float = 0.75):
+        self.candidate_pool = candidate_pool
+        self.top_n = top_n
+        self.time_budget_ms = time_budget_ms
+        self.weights = {**DEFAULT_WEIGHTS, **(weights or {})}
+        self.k1 = k1
+        self.b = b
+
+        self.calls = 0
+        self.fallbacks = 0
+        self.total_ms = 0.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "LinearReranker":
+        weights = None
+        weights_path = config.get("RERANKER_WEIGHTS_PATH")
+        if weights_path:
+            try:
+                with open(weights_path, "r", encoding="utf-8") as f:
+                    weights = json.load(f)
+                logger.info(f"🎯 Pesi reranker caricati da {weights_path}")
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Pesi reranker non leggibili ({weights_path}): {e}, uso i default")
+        return cls(
+            candidate_pool=config.get("RERANK_CANDIDATES", 30),
+            top_n=config.get("RERANK_TOP_N", 3),
+            time_budget_ms=config.get("RERANK_TIME_BUDGET_MS", 20.0),
+            weights=weights
+        )
+
+    def features(self, question: str, texts: Sequence[str], embedding_scores: Sequence[float],
+                 deadline: Optional[float] = None) -> np.ndarray:
+        """Matrice candidati × FEATURES (`deadline` in secondi di time.perf_counter)"""
+        terms = query_terms(question)
+        n = len(texts)
+        matrix = np.zeros((n, len(FEATURES)), dtype=np.float32)
+        matrix[:, 0] = embedding_scores
+        if not terms or not n:
+            return matrix
+
+        def check_budget():
+            if deadline is not None and time.perf_counter() > deadline:
+                raise RerankBudgetExceeded()
+
+        term_index = {term: i for i, term in enumerate(terms)}
+        doc_tokens = []
+        tf = np.zeros((n, len(terms)), dtype=np.float32)
+        for row, text in enumerate(texts):
+            check_budget()
+            tokens = tokenize(text)
+            doc_tokens.append(tokens)
+            for token in tokens:
+                column = term_index.get(token)
+                if column is not None:
+                    tf[row, column] += 1
+
+        # BM25 con statistiche del pool di candidati
+        lengths = np.array([len(tokens) for tokens in doc_tokens], dtype=np.float32)
+        avg_length = max(float(lengths.mean()), 1.0)
+        df = (tf > 0).sum(axis=0)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5))
+        norm = self.k1 * (1.0 - self.b + self.b * lengths / avg_length)
+        bm25 = (idf * tf * (self.k1 + 1.0) / (tf + norm[:, None])).sum(axis=1)
+        if bm25.max() > 0:
+            matrix[:, 1] = bm25 / bm25.max()
+
+        matrix[:, 2] = (tf > 0).sum(axis=1) / len(terms)
+        if len(terms) > 1:
+            for row, tokens in enumerate(doc_tokens):
+                check_budget()
+                matrix[row, 3] = _proximity(tokens, term_index)
+        return matrix
+
+    def rerank(self, question: str, candidates: List[Tuple[float, Any]]) -> List[Tuple[float, Any]]:
+        """
+        Riordina i candidati (score, Document) e restituisce i migliori `top_n`,
+        con lo score di embedding originale. Oltre il budget di tempo: ordine dell'embedding.
+        """
+        if len(candidates) <= 1:
+            return candidates[:self.top_n]
+
+        started = time.perf_counter()
+        self.calls += 1
+        scores = None
+        try:
+            features = self.features(
+                question,
+                [doc.content for _, doc in candidates],
+                [score for score, _ in candidates],
+                deadline=started + self.time_budget_ms / 1000
+            )
+            weights = np.array([self.weights[name] for name in FEATURES], dtype=np.float32)
+            scores = features @ weights + self.weights["bias"]
+        except RerankBudgetExceeded:
+            logger.debug(f"Rerank oltre il budget di {self.time_budget_ms}ms, uso l'ordine dell'embedding")
+        except Exception as e:
+            logger.warning(f"Rerank fallito, uso l'ordine dell'embedding: {e}")
+        finally:
+            self.total_ms += (time.perf_counter() - started) * 1000
+
+        if scores is None:
+            self.fallbacks += 1
+            return sorted(candidates, key=lambda candidate: candidate[0], reverse=True)[:self.top_n]
+
+        order = np.argsort(-scores, kind="stable")[:self.top_n]
+        return [candidates[i] for i in order]
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "candidate_pool": self.candidate_pool,
+            "top_n": self.top_n,
+            "time_budget_ms": self.time_budget_ms,
+            "weights": self.weights,
+            "calls": self.calls,
+            "fallbacks": self.fallbacks,
+            "avg_ms": round(self.total_ms / self.calls, 2) if self.calls else 0.0
+        }
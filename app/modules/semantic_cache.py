@@ -0,0 +1,131 @@
+# app/modules/semantic_cache.py
+"""
+Cache semantica delle risposte RAG.
+
+Le domande sono indicizzate per embedding in una matrice propria (righe L2-normalizzate):
+una nuova domanda con cosine similarity oltre la soglia rispetto a una già risposta
+("come denuncio un sinistro" / "come si apre un sinistro") riceve la risposta in cache
+senza retrieval né generazione.
+
+Ogni voce registra la generazione dell'indice su cui è stata prodotta: qualunque
+scrittura sul vector store (watcher, reindex) rende le voci precedenti non valide.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CachedAnswer:
+    """Risposta memorizzata con i dati necessari a restituirla senza rigenerarla"""
+    question: str
+    answer: str
+    sources: List[Dict[str, str]]
+    confidence: float
+    generation: int
+    created_at: float = field(default_factory=time.time)
+    last_hit_at: float = 0.0
+    hits: int = 0
+
+
+class SemanticAnswerCache:
+    """Indice vettoriale in memoria delle domande già risposte, con TTL e capacità massima"""
+
+    def __init__(self, threshold: float = 0.95, ttl_seconds: float = 3600, max_entries: int = 2000):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+
+        self._matrix: Optional[np.ndarray] = None  # allocata alla prima voce (dimensione degli embedding)
+        self._entries: List[Optional[CachedAnswer]] = [None] * max_entries
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _normalize(self, embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if norm == 0 or (self._matrix is not None and vector.shape[0] != self._matrix.shape[1]):
+            return None
+        return vector / norm
+
+    def _is_valid(self, entry: Optional[CachedAnswer], generation: int, now: float) -> bool:
+        return entry is not None and entry.generation == generation and now - entry.created_at <= self.ttl_seconds
+
+    def lookup(self, embedding: List[float], generation: int) -> Optional[CachedAnswer]:
+        """Risposta in cache per una domanda simile sulla stessa generazione dell'indice"""
+        vector = self._normalize(embedding)
+        if vector is None or not self._size:
+            self.misses += 1
+            return None
+
+        now = time.time()
+        scores = self._matrix[:self._size] @ vector
+        # Dalla più simile: la prima voce valida oltre soglia vince
+        for row in np.argsort(-scores):
+            if scores[row] < self.threshold:
+                break
+            entry = self._entries[row]
+            if self._is_valid(entry, generation, now):
+                entry.hits += 1
+                entry.last_hit_at = now
+                self.hits += 1
+                logger.debug(f"Cache semantica: hit ({scores[row]:.3f}) per '{entry.question[:50]}'")
+                return entry
+
+        self.misses += 1
+        return None
+
+    def store(self, question: str, embedding: List[float], answer: str,
+              sources: List[Dict[str, str]], confidence: float, generation: int):
+        """Memorizza una risposta generata"""
+        vector = self._normalize(embedding)
+        if vector is None or self.max_entries <= 0:
+            return
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        row = self._free_row(generation)
+        self._matrix[row] = vector
+        self._entries[row] = CachedAnswer(
+            question=question,
+            answer=answer,
+            sources=sources,
+            confidence=confidence,
+            generation=generation
+        )
+
+    def _free_row(self, generation: int) -> int:
+        if self._size < self.max_entries:
+            self._size += 1
+            return self._size - 1
+
+        # Cache piena: prima una voce scaduta o di un indice precedente, poi la meno usata di recente
+        now = time.time()
+        for row, entry in enumerate(self._entries):
+            if not self._is_valid(entry, generation, now):
+                return row
+        return min(range(self._size), key=lambda row: max(self._entries[row].last_hit_at, self._entries[row].created_at))
+
+    def invalidate(self):
+        """Svuota la cache (nuovo indice, pulizia manuale)"""
+        self._entries = [None] * self.max_entries
+        self._size = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "entries": sum(1 for entry in self._entries[:self._size] if entry is not None),
+            "max_entries": self.max_entries,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate_percent": round(100.0 * self.hits / total, 1) if total else 0.0
+        }
@@ -0,0 +1,86 @@
+# app/utils/import_profiler.py
+"""
+Profilo degli import all'avvio.
+
+Il profilo per modulo viene prodotto da `python -X importtime -c "import main"` in un
+processo separato (stessi dati dell'opzione di CPython, nessun hook sul processo live),
+affiancato dallo stato del processo corrente: memoria e moduli pesanti già caricati.
+"""
+
+import asyncio
+import os
+import re
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+# Dipendenze costose che l'app carica solo al primo utilizzo
+HEAVY_MODULES = [
+    "spacy", "openai", "fitz", "pdfplumber", "PyPDF2", "pypdf",
+    "pytesseract", "tesserocr", "PIL", "docx", "tiktoken", "watchfiles"
+]
+
+# Root del progetto (dove si trova main.py), indipendente dalla cwd del processo
+_PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+_last_profile: Optional[Dict[str, Any]] = None
+_profile_lock = asyncio.Lock()
+
+
+def parse_importtime(output: str) -> List[Dict[str, Any]]:
+    """Righe di `-X importtime` → [{module, self_ms, cumulative_ms, depth}]"""
+    entries = []
+    for line in output.splitlines():
+        match = _IMPORTTIME_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append({
+                "module": module,
+                "self_ms": round(int(self_us) / 1000, 2),
+                "cumulative_ms": round(int(cumulative_us) / 1000, 2),
+                # L'output indenta di due spazi per livello di import annidato
+                "depth": max(0, (len(indent) - 1) // 2)
+            })
+    return entries
+
+
+def loaded_heavy_modules() -> Dict[str, bool]:
+    """Quali dipendenze pesanti sono già state importate in questo processo"""
+    return {name: name in sys.modules for name in HEAVY_MODULES}
+
+
+async def profile_imports(target: str = "main", limit: int = 25, refresh: bool = False,
+                          timeout: float = 120.0) -> Dict[str, Any]:
+    """Profilo degli import di `target` in un processo pulito (risultato in cache)"""
+    global _last_profile
+    async with _profile_lock:
+        if _last_profile is None or refresh:
+            started = time.time()
+            process = await asyncio.create_subprocess_exec(
+                sys.executable, "-X", "importtime", "-c", f"import {target}",
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE,
+                cwd=_PROJECT_ROOT
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+            entries = parse_importtime(stderr.decode("utf-8", errors="replace"))
+            _last_profile = {
+                "target": target,
+                "generated_at": started,
+                "wall_time_ms": round((time.time() - started) * 1000, 1),
+                "returncode": process.returncode,
+                "modules_imported": len(entries),
+                "total_import_ms": round(sum(e["cumulative_ms"] for e in entries if e["depth"] == 0), 1),
+                "entries": entries
+            }
+
+    profile = dict(_last_profile)
+    entries = profile.pop("entries")
+    profile["top_cumulative"] = sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:limit]
+    profile["top_self"] = sorted(entries, key=lambda e: e["self_ms"], reverse=True)[:limit]
+    return profile
@@ -0,0 +1,77 @@
+# app/utils/ocr_cache.py
+"""
+Cache persistente dei risultati OCR.
+La chiave è l'hash dei pixel della pagina renderizzata più i parametri che
+influenzano il risultato (lingua, DPI, versione di Tesseract): una pagina
+identica non viene mai ri-OCRizzata tra riavvii o reindicizzazioni.
+Con lo stesso schema di chiave conserva anche le impostazioni (lingua, DPI)
+rilevate sulla pagina campione di ogni documento, serializzate in JSON.
+
+Sincrona di proposito: viene usata dai worker OCR (processi/thread), non dall'event loop.
+"""
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+class OCRCache:
+    """Cache SQLite (pagina renderizzata, lingua, DPI, versione Tesseract) → testo"""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Una connessione per thread: i worker OCR possono essere thread o processi"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            db_dir = os.path.dirname(self.db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            # WAL: più worker scrivono in parallelo senza bloccare le letture
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS ocr_cache (
+                    key TEXT PRIMARY KEY,
+                    text TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def make_key(image_bytes: bytes, lang: str, dpi: int, engine_version: str) -> str:
+        """Chiave della cache: hash dei pixel + parametri OCR"""
+        digest = hashlib.sha256(image_bytes).hexdigest()
+        return f"{digest}:{lang}:{dpi}:{engine_version}"
+
+    def get(self, key: str) -> Optional[str]:
+        try:
+            row = self._connection().execute(
+                "SELECT text FROM ocr_cache WHERE key = ?", (key,)
+            ).fetchone()
+            return row[0] if row else None
+        except sqlite3.Error as e:
+            logger.warning(f"Errore lettura cache OCR: {e}")
+            return None
+
+    def set(self, key: str, text: str):
+        try:
+            conn = self._connection()
+            conn.execute(
+                "INSERT OR REPLACE INTO ocr_cache (key, text, created_at) VALUES (?, ?, ?)",
+                (key, text, time.time())
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            logger.warning(f"Errore scrittura cache OCR: {e}")
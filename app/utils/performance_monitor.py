@@ -3,12 +3,14 @@ import time
 import functools
 import logging
 from typing import Dict, Any, List, Optional, Callable, Coroutine 
-from collections import defaultdict
+from collections import defaultdict, deque
 import json
 from datetime import datetime, timedelta 
 import os
 import asyncio 
 
+from app.config import PERFORMANCE_METRICS_FILE
+
 try:
     from app.utils.logging_config import logger as app_logger
     logger = app_logger.getChild(__name__) 
@@ -154,7 +156,59 @@ class PerformanceMonitor:
         self.metrics.clear()
         logger.info("Tutte le performance metrics sono state azzerate.")
 
-performance_monitor = PerformanceMonitor()
+performance_monitor = PerformanceMonitor(PERFORMANCE_METRICS_FILE)
+
+class EventLoopLagMonitor:
+    """
+    Misura il ritardo dell'event loop: un task dorme `interval` secondi e registra
+    di quanto si sveglia in ritardo. Lag alti indicano codice bloccante nel loop
+    (es. estrazione PDF o OCR non delegati a thread/processi).
+    """
+    def __init__(self, interval: float = 0.1, window: int = 600):
+        self.interval = interval
+        self.samples: deque = deque(maxlen=window)
+        self.max_lag_ms: float = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+            logger.info(f"Monitor lag event loop avviato (intervallo {self.interval * 1000:.0f}ms)")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.samples.append(lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    def get_stats(self) -> Dict[str, Any]:
+        if not self.samples:
+            return {'running': self._task is not None, 'samples': 0}
+        ordered = sorted(self.samples)
+        p99_index = min(len(ordered) - 1, int(len(ordered) * 0.99))
+        return {
+            'running': self._task is not None and not self._task.done(),
+            'samples': len(ordered),
+            'last_lag_ms': round(self.samples[-1], 2),
+            'avg_lag_ms': round(sum(ordered) / len(ordered), 2),
+            'p99_lag_ms': round(ordered[p99_index], 2),
+            'max_lag_ms_window': round(ordered[-1], 2),
+            'max_lag_ms_since_start': round(self.max_lag_ms, 2),
+        }
+
+event_loop_monitor = EventLoopLagMonitor()
 
 def measure_performance(name: str) -> Callable:
     def decorator(func: Callable) -> Callable:
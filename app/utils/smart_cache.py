@@ -8,6 +8,8 @@ import asyncio
 import os # Aggiunto per os.path e os.makedirs
 import logging # Aggiunto per il logger
 
+from app.config import SMART_CACHE_DB_PATH, CACHE_TTL_SECONDS
+
 # Configurazione del logger
 logger = logging.getLogger(__name__)
 if not logger.hasHandlers():
@@ -29,6 +31,10 @@ class SmartCache:
 
         self.default_ttl = default_ttl
         self.memory_cache: Dict[str, Dict[str, Any]] = {} # Più specifico sulla struttura interna
+        # Contatori per hit rate reale (dashboard)
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
         logger.info(f"SmartCache inizializzato. DB path: {os.path.abspath(self.db_path)}, Default TTL: {self.default_ttl}s")
 
     async def _ensure_db_directory_exists(self):
@@ -80,6 +86,7 @@ class SmartCache:
             item = self.memory_cache[key]
             if current_time - item['timestamp'] < item['ttl']:
                 logger.debug(f"Cache HIT (memory) per la chiave: {key}")
+                self.memory_hits += 1
                 return item['value']  # Valore già deserializzato
             else:
                 logger.debug(f"Cache EXPIRED (memory) per la chiave: {key}")
@@ -111,6 +118,7 @@ class SmartCache:
                             'timestamp': timestamp_db,
                             'ttl': ttl_db
                         }
+                        self.db_hits += 1
                         return value
                     else:
                         logger.debug(f"Cache EXPIRED (DB) per la chiave: {key}")
@@ -124,6 +132,7 @@ class SmartCache:
             # ma loggarlo è importante.
 
         logger.debug(f"Cache MISS per la chiave: {key}")
+        self.misses += 1
         return None
 
     async def set(self, query: str, value: Any, context: Optional[Dict[str, Any]] = None, ttl: Optional[int] = None):
@@ -223,6 +232,23 @@ class SmartCache:
             # Per ora, questi due conteggi sono i più chiari.
         }
 
+    def get_hit_stats(self) -> Dict[str, Any]:
+        """Hit/miss dall'avvio del processo (senza accesso al DB)."""
+        hits = self.memory_hits + self.db_hits
+        total = hits + self.misses
+        return {
+            'hits': hits,
+            'memory_hits': self.memory_hits,
+            'db_hits': self.db_hits,
+            'misses': self.misses,
+            'hit_rate_percent': round(100.0 * hits / total, 1) if total else 0.0
+        }
+
+    async def close_db_connection(self):
+        """Chiusura allo shutdown: ogni operazione apre la propria connessione, resta solo da liberare la memoria."""
+        self.memory_cache.clear()
+        logger.info(f"SmartCache chiusa ({self.get_hit_stats()['hit_rate_percent']}% hit rate)")
+
     async def clear_all_memory_cache(self):
         """Svuota completamente la cache in memoria."""
         count = len(self.memory_cache)
@@ -246,7 +272,5 @@ class SmartCache:
         logger.info("Tutta la cache (memoria e persistente) è stata svuotata.")
 
 
-# Istanza globale, il percorso del DB può essere configurato tramite variabili d'ambiente o config
-# DB_CACHE_PATH = os.getenv("DB_CACHE_PATH", "data/smart_cache.db")
-# smart_cache = SmartCache(db_path=DB_CACHE_PATH)
-smart_cache = SmartCache(db_path="data/smart_cache.db") # Default semplice
\ No newline at end of file
+# Istanza globale, configurata da SMART_CACHE_DB_PATH e CACHE_TTL_SECONDS
+smart_cache = SmartCache(db_path=SMART_CACHE_DB_PATH, default_ttl=CACHE_TTL_SECONDS)
\ No newline at end of file
@@ -0,0 +1,22 @@
+# app/utils/sqlite_backup.py
+"""
+Copia consistente di un database SQLite tramite l'API di backup, usata per
+costruire indici accanto a quello live (reindex) e per gli snapshot.
+Sincrona: dall'event loop va chiamata con asyncio.to_thread.
+"""
+
+import os
+import sqlite3
+
+
+def backup_sqlite(source_path: str, target_path: str):
+    """Copia consistente di un database SQLite anche mentre viene letto/scritto"""
+    if os.path.exists(target_path):
+        os.remove(target_path)
+    source = sqlite3.connect(source_path)
+    target = sqlite3.connect(target_path)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
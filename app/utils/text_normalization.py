@@ -0,0 +1,42 @@
+# app/utils/text_normalization.py
+"""
+Normalizzazione del testo condivisa da cache, FAQ, reranker e compressione:
+forma canonica delle domande (chiavi di cache e match esatto delle FAQ),
+tokenizzazione e termini significativi di una domanda (senza stopword italiane).
+
+Solo libreria standard e nessuno stato: importarla non crea cache né connessioni.
+"""
+
+import re
+import unicodedata
+from typing import List
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Parole funzionali italiane escluse dai termini della domanda.
+# Le negazioni ("non", "no", "né", "senza") restano: invertono il senso della domanda
+_STOPWORDS = frozenset("""
+a ad al alla alle allo agli ai anche che chi ci come con cosa da dal dalla dalle dei del della delle
+dello degli di e ed gli ha hanno ho i il in io la le lo ma mi mia mio ne nei nel nella nelle
+o per più può quale quali quando se si sono su sua sue suo sul sulla tra tu un una uno vi è
+""".split())
+
+
+def normalize_query(query: str) -> str:
+    """Forma canonica di una domanda per le chiavi di cache (maiuscole, spazi, punteggiatura finale)"""
+    text = unicodedata.normalize("NFKC", query).casefold()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip(" ?!.;:")
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.casefold())
+
+
+def query_terms(question: str) -> List[str]:
+    """Termini distinti della domanda, senza stopword, nell'ordine in cui compaiono"""
+    terms = []
+    for token in tokenize(question):
+        if len(token) > 1 and token not in _STOPWORDS and token not in terms:
+            terms.append(token)
+    return terms
@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+"""
+OCR Engine Benchmark
+
+Confronta le pagine al secondo dei backend OCR disponibili (tesserocr in-process
+vs pytesseract con un processo per pagina) sulle stesse pagine renderizzate.
+Run it with: python benchmark_ocr_engines.py <file.pdf> [max_pagine] [lingua]
+
+Le pagine vengono renderizzate una sola volta: il tempo misurato è solo quello dell'OCR.
+"""
+import sys
+import time
+
+import fitz
+import numpy as np
+
+from app.modules.ocr_engine import (
+    PYTESSERACT_AVAILABLE, TESSEROCR_AVAILABLE, get_ocr_engine
+)
+
+
+def render_pages(pdf_path: str, max_pages: int, zoom: float = 2.0):
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(min(max_pages, len(doc))):
+            pix = doc.load_page(page_num).get_pixmap(
+                matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False
+            )
+            rows = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)
+            pages.append(np.ascontiguousarray(rows[:, :pix.width]))
+    return pages
+
+
+def benchmark_engine(name: str, pages, lang: str):
+    engine = get_ocr_engine(name)
+    # Warm-up: caricamento modello / primo avvio del processo
+    engine.image_to_string(pages[0], lang)
+
+    start = time.perf_counter()
+    characters = 0
+    for pixels in pages:
+        characters += len(engine.image_to_string(pixels, lang))
+    elapsed = time.perf_counter() - start
+    return elapsed, characters
+
+
+def main():
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+
+    pdf_path = sys.argv[1]
+    max_pages = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    lang = sys.argv[3] if len(sys.argv) > 3 else "ita+eng"
+
+    pages = render_pages(pdf_path, max_pages)
+    if not pages:
+        print("❌ Nessuna pagina da elaborare")
+        sys.exit(1)
+    print(f"📄 {len(pages)} pagine renderizzate da {pdf_path} (lingua OCR: {lang})")
+
+    engines = [
+        name for name, available in (("tesserocr", TESSEROCR_AVAILABLE), ("pytesseract", PYTESSERACT_AVAILABLE))
+        if available
+    ]
+    if not engines:
+        print("❌ Nessun engine OCR installato (tesserocr o pytesseract)")
+        sys.exit(1)
+
+    results = {}
+    for name in engines:
+        try:
+            elapsed, characters = benchmark_engine(name, pages, lang)
+        except Exception as e:
+            print(f"❌ {name}: {e}")
+            continue
+        results[name] = len(pages) / elapsed
+        print(f"✅ {name:12s} {results[name]:6.2f} pagine/s  ({elapsed:.2f}s, {characters} caratteri)")
+
+    if len(results) == 2:
+        print(f"⚡ Speedup tesserocr vs pytesseract: {results['tesserocr'] / results['pytesseract']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,8 +3,9 @@
 
 import time
 from fastapi import FastAPI, Request, HTTPException
-from fastapi.responses import JSONResponse, FileResponse, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.encoders import jsonable_encoder
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os 
@@ -13,17 +14,24 @@ from datetime import timezone
 from typing import Optional, List, Dict, Any, Union 
 from contextlib import asynccontextmanager
 import asyncio 
+import json
 import psutil 
 
 # ===== IMPORTS CORE (mantenuti identici) =====
-from app.config import APP_HOST, APP_PORT, DEBUG, LOG_LEVEL, APP_VERSION 
+from app.config import (
+    APP_HOST, APP_PORT, DEBUG, LOG_LEVEL, APP_VERSION, FAST_START,
+    get_config, prepare_directories, print_config_summary
+)
 from app.utils.logging_config import logger
 from app.utils.db_manager import db_manager, init_database
+from app.utils.import_profiler import loaded_heavy_modules, profile_imports
 from app.models.schemas import ChatRequest, ChatResponse, Intent 
 
 # ===== CUSTOM RAG SYSTEM (mantenuto identico) =====
 try:
-    from app.modules.rag_system import init_rag_system, CustomRAGEngine
+    from app.modules.rag_system import init_rag_system, prepare_custom_rag_system, CustomRAGEngine
+    from app.modules.reindex_manager import ReindexManager
+    from app.modules.docs_watcher import DocsWatcher
     RAG_SYSTEM_AVAILABLE = True
     logger.info("✅ Custom RAG System disponibile")
 except ImportError as e:
@@ -49,16 +57,21 @@ except ImportError as e:
     
     async def init_rag_system():
         return CustomRAGEngine()
+    
+    prepare_custom_rag_system = None
+    ReindexManager = None
+    DocsWatcher = None
 
 # ===== FALLBACK COMPONENTS (mantenuti identici) =====
 # Intent Analyzer con fallback
 try:
-    from app.modules.intent_analyzer import analyze_intent
+    from app.modules.intent_analyzer import analyze_intent, get_nlp
     INTENT_ANALYZER_AVAILABLE = True
     logger.info("✅ Intent Analyzer disponibile")
 except ImportError as e:
     logger.warning(f"⚠️  Intent Analyzer non disponibile: {e} - Uso fallback")
     INTENT_ANALYZER_AVAILABLE = False
+    get_nlp = None
     def analyze_intent(message: str) -> Intent:
         """Fallback intent analyzer."""
         message_lower = message.lower()
@@ -109,7 +122,7 @@ except ImportError as e:
 
 # Performance Monitor con fallback
 try:
-    from app.utils.performance_monitor import performance_monitor
+    from app.utils.performance_monitor import performance_monitor, event_loop_monitor
     PERFORMANCE_MONITOR_AVAILABLE = True
     logger.info("✅ Performance Monitor disponibile")
 except ImportError as e:
@@ -124,6 +137,18 @@ except ImportError as e:
             logger.info("Mock performance metrics saved")
     
     performance_monitor = MockPerformanceMonitor()
+    
+    class MockEventLoopMonitor:
+        def start(self):
+            pass
+        
+        async def stop(self):
+            pass
+        
+        def get_stats(self):
+            return {"running": False, "samples": 0}
+    
+    event_loop_monitor = MockEventLoopMonitor()
 
 # Smart Cache con fallback
 try:
@@ -150,12 +175,88 @@ except ImportError as e:
 APP_START_TIME = datetime.datetime.now(timezone.utc)
 DIRECT_RESPONSE_INTENTS: List[str] = ["saluto", "ringraziamento", "congedo"]
 DIRECT_RESPONSE_CONFIDENCE_THRESHOLD: float = 0.8
+# Sotto questa lunghezza (saluti, ringraziamenti) la query RAG parte solo dopo l'intent:
+# una probabile risposta diretta non deve costare una chiamata di embedding
+SPECULATIVE_RAG_MIN_WORDS: int = 4
+
+async def initialize_rag_in_background(app: FastAPI, rag_config: Dict[str, Any]):
+    """
+    Crea l'engine (subito interrogabile se l'indice esiste già) e indicizza i documenti.
+    Durante l'ingestione le query usano la parte già indicizzata.
+    """
+    pid = os.getpid()
+    if prepare_custom_rag_system is None:
+        app.state.rag_system = await init_rag_system()
+        return
+    
+    reindex_manager = app.state.reindex_manager
+    # Stesso lock di reindex e watcher: nessuna scrittura concorrente sull'indice
+    ingest_lock = reindex_manager.ingest_lock if reindex_manager is not None else asyncio.Lock()
+    try:
+        async with ingest_lock:
+            rag_system_instance = await prepare_custom_rag_system(rag_config)
+            app.state.rag_system = rag_system_instance
+            
+            await rag_system_instance.initialize_documents(rag_config.get("DOCS_DIRECTORY", "./insurance_docs"))
+            if rag_system_instance.is_initialized:
+                await rag_system_instance.vector_store.warm_up()
+        
+        if rag_system_instance.is_initialized:
+            logger.info(f"[PID:{pid}] ✅ Custom RAG System inizializzato correttamente")
+            
+            # Log statistiche
+            stats = await rag_system_instance.get_system_stats()
+            vector_stats = stats.get('stats', {}).get('base_system', {}).get('vector_store', {})
+            total_docs = vector_stats.get('total_documents', 0)
+            files_indexed = vector_stats.get('files_indexed', 0)
+            logger.info(f"[PID:{pid}] 📊 RAG Stats: {total_docs} documenti, {files_indexed} file indicizzati")
+        else:
+            logger.warning(f"[PID:{pid}] ⚠️  Custom RAG System creato ma non inizializzato")
+            
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.error(f"[PID:{pid}] ❌ Errore inizializzazione Custom RAG System: {e}", exc_info=True)
+        app.state.rag_init_error = str(e)
+
+
+def get_rag_readiness(app: FastAPI) -> Dict[str, Any]:
+    """Stato di prontezza del RAG: starting, warming_up, partial, ready, failed"""
+    rag_system_instance = app.state.rag_system
+    init_task = app.state.rag_init_task
+    ingestion = dict(getattr(rag_system_instance, "ingestion_status", None) or {})
+    serving = bool(rag_system_instance and getattr(rag_system_instance, "is_initialized", False))
+    initializing = init_task is not None and not init_task.done()
+    
+    if app.state.rag_init_error or ingestion.get("state") == "failed":
+        state = "partial" if serving else "failed"
+    elif initializing:
+        if rag_system_instance is None:
+            state = "starting"
+        else:
+            state = "partial" if serving else "warming_up"
+    else:
+        state = "ready" if serving else "failed"
+    
+    files_total = ingestion.get("files_total") or 0
+    files_done = ingestion.get("files_processed", 0) + ingestion.get("files_failed", 0)
+    return {
+        "ready": state == "ready",
+        "serving_queries": serving,
+        "state": state,
+        "progress_percent": round(100.0 * files_done / files_total, 1) if files_total else (100.0 if state == "ready" else 0.0),
+        "ingestion": ingestion,
+        "error": app.state.rag_init_error or ingestion.get("error")
+    }
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI): 
     pid = os.getpid()
     logger.info(f"[PID:{pid}] 🚀 Avvio Custom RAG Chatbot System v{APP_VERSION}")
     logger.info(f"[PID:{pid}] Componenti disponibili: RAG={RAG_SYSTEM_AVAILABLE}, Intent={INTENT_ANALYZER_AVAILABLE}")
+    print_config_summary()
+    prepare_directories()
     
     # 1. Inizializza database
     await init_database() 
@@ -163,6 +264,7 @@ async def lifespan(app: FastAPI):
     
     # 2. Performance monitor
     performance_monitor.load_metrics()
+    event_loop_monitor.start()
     logger.info(f"[PID:{pid}] ✅ Performance metrics caricate")
     
     # 3. Smart cache
@@ -170,37 +272,50 @@ async def lifespan(app: FastAPI):
         await smart_cache.init_cache() 
         logger.info(f"[PID:{pid}] ✅ SmartCache inizializzata")
     
-    # 4. Custom RAG System
-    logger.info(f"[PID:{pid}] 🧠 Inizializzazione Custom RAG System...")
-    try:
-        rag_system_instance = await init_rag_system()
-        
-        if rag_system_instance and getattr(rag_system_instance, 'is_initialized', False):
-            app.state.rag_system = rag_system_instance
-            logger.info(f"[PID:{pid}] ✅ Custom RAG System inizializzato correttamente")
-            
-            # Log statistiche
-            stats = await rag_system_instance.get_system_stats()
-            vector_stats = stats.get('stats', {}).get('base_system', {}).get('vector_store', {})
-            total_docs = vector_stats.get('total_documents', 0)
-            files_indexed = vector_stats.get('files_indexed', 0)
-            logger.info(f"[PID:{pid}] 📊 RAG Stats: {total_docs} documenti, {files_indexed} file indicizzati")
-            
-        else:
-            app.state.rag_system = rag_system_instance  # Anche se non inizializzato
-            logger.warning(f"[PID:{pid}] ⚠️  Custom RAG System creato ma non inizializzato")
-            
-    except Exception as e:
-        logger.error(f"[PID:{pid}] ❌ Errore inizializzazione Custom RAG System: {e}", exc_info=True)
-        app.state.rag_system = None
+    # 4. Reindicizzazione in background (POST /api/rag/reindex)
+    rag_config = get_config()
+    if ReindexManager is not None:
+        app.state.reindex_manager = ReindexManager(rag_config)
+    
+    # 5. Custom RAG System: inizializzato in background, l'app accetta subito connessioni
+    #    (/api/health risponde, /api/ready riporta l'avanzamento dell'ingestione)
+    logger.info(f"[PID:{pid}] 🧠 Inizializzazione Custom RAG System in background...")
+    app.state.rag_init_task = asyncio.create_task(initialize_rag_in_background(app, rag_config))
+    
+    # 6. Watcher di DOCS_DIRECTORY: aggiornamenti incrementali dell'indice live
+    if DocsWatcher is not None and app.state.reindex_manager is not None and rag_config.get("DOCS_WATCH_ENABLED"):
+        app.state.docs_watcher = DocsWatcher(
+            rag_config.get("DOCS_DIRECTORY", "./insurance_docs"),
+            app.state.reindex_manager,
+            app.state,
+            debounce_seconds=rag_config.get("DOCS_WATCH_DEBOUNCE_SECONDS", 2.0),
+            poll_interval=rag_config.get("DOCS_WATCH_POLL_INTERVAL", 2.0)
+        )
+        app.state.docs_watcher.start()
+    
+    # 7. Modello spaCy caricato in background (import lazy): la prima chat non lo attende
+    if get_nlp is not None and not FAST_START:
+        app.state.nlp_warmup_task = asyncio.create_task(asyncio.to_thread(get_nlp))
 
-    logger.info(f"[PID:{pid}] 🎯 Sistema completamente avviato e operativo")
+    app.state.startup_seconds = round(time.time() - psutil.Process().create_time(), 3)
+    logger.info(f"[PID:{pid}] 🎯 Sistema avviato in {app.state.startup_seconds}s (FAST_START={FAST_START})")
     yield
     
     # Cleanup
     logger.info(f"[PID:{pid}] 🔄 Shutdown applicazione...")
+    if app.state.rag_init_task is not None and not app.state.rag_init_task.done():
+        app.state.rag_init_task.cancel()
+        try:
+            await app.state.rag_init_task
+        except asyncio.CancelledError:
+            pass
+    if app.state.docs_watcher is not None:
+        await app.state.docs_watcher.stop()
+    if app.state.reindex_manager is not None:
+        await app.state.reindex_manager.stop()
     if hasattr(smart_cache, 'close_db_connection') and callable(smart_cache.close_db_connection):
         await smart_cache.close_db_connection() 
+    await event_loop_monitor.stop()
     performance_monitor.save_metrics()
     logger.info(f"[PID:{pid}] ✅ Shutdown completato")
 
@@ -217,6 +332,12 @@ if not hasattr(app, "state"):
     from starlette.datastructures import State
     app.state = State()
 app.state.rag_system = None
+app.state.reindex_manager = None
+app.state.docs_watcher = None
+app.state.rag_init_task = None
+app.state.rag_init_error = None
+app.state.nlp_warmup_task = None
+app.state.startup_seconds = None
 
 # CORS middleware
 app.add_middleware(
@@ -229,40 +350,118 @@ app.add_middleware(
 
 # ===== API ENDPOINTS (mantenuti identici) =====
 
+async def get_or_create_conversation(user_id: str, conversation_id: Optional[str]) -> str:
+    """Conversazione esistente o nuova se assente/non trovata"""
+    pid = os.getpid()
+    if conversation_id:
+        existing_conv = await db_manager.get_conversation(conversation_id)
+        if existing_conv:
+            return conversation_id
+        logger.warning(f"[PID:{pid}] ConvID {conversation_id} non trovato, creo nuovo")
+    
+    conversation_id = await db_manager.create_conversation(user_id)
+    if not conversation_id:
+        logger.error(f"[PID:{pid}] Errore creazione conversazione")
+        raise HTTPException(status_code=500, detail="Errore creazione conversazione")
+    logger.info(f"[PID:{pid}] Nuova conversazione: {conversation_id}")
+    return conversation_id
+
+
+def rag_unavailable_message(readiness: Dict[str, Any]) -> str:
+    """Risposta immediata quando il RAG non può ancora rispondere"""
+    pid = os.getpid()
+    if readiness["state"] in ("starting", "warming_up"):
+        logger.info(f"[PID:{pid}] RAG in riscaldamento ({readiness['progress_percent']}%), risposta immediata")
+        return (
+            "Sto ancora caricando i documenti assicurativi "
+            f"({readiness['progress_percent']:.0f}% completato): riprova tra qualche istante."
+        )
+    logger.error(f"[PID:{pid}] RAG System non disponibile")
+    return "Mi dispiace, il sistema di ricerca non è al momento disponibile. Riprova più tardi."
+
+
+def format_sources(sources: List[Any]) -> List[Dict[str, str]]:
+    """Fonti nel formato di ChatResponse"""
+    return [
+        {
+            "source": source.get("source", "unknown") if isinstance(source, dict) else str(source),
+            "content": source.get("content", "") if isinstance(source, dict) else ""
+        }
+        for source in sources
+    ]
+
+
+async def cancel_pending(tasks: List[asyncio.Task]):
+    """Annulla i task del grafo ancora in corso (richiesta fallita o risultato non più necessario)"""
+    for task in tasks:
+        if not task.done():
+            task.cancel()
+    # Raccoglie anche gli errori dei task già conclusi (niente "exception was never retrieved")
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
 @app.post("/api/chat", response_model=ChatResponse, tags=["Chat"])
 async def chat_endpoint(request: Request, chat_request: ChatRequest): 
+    """
+    Le fasi indipendenti girano in parallelo come grafo di task:
+    
+        conversazione ──► messaggio utente ──► storico ─────────┐
+        intent (thread) ─────────────────────► risposta diretta? ├─► messaggio assistente
+        query RAG (speculativa, annullata se risposta diretta) ──┘
+    
+    La latenza si riduce così al cammino critico embedding → ricerca → LLM.
+    La query speculativa parte solo per messaggi di almeno SPECULATIVE_RAG_MIN_WORDS
+    parole; per quelli più brevi viene avviata dopo l'intent, se serve.
+    """
     rag_system_instance: Optional[CustomRAGEngine] = request.app.state.rag_system
     pid = os.getpid()
     logger.debug(f"[PID:{pid}] /api/chat: Richiesta per '{chat_request.message[:50]}...'")
+    tasks: List[asyncio.Task] = []
 
     try:
         user_id = chat_request.user_id
         message_text = chat_request.message
-        conversation_id = chat_request.conversation_id
         
-        logger.info(f"[PID:{pid}] Chat: UserID={user_id}, ConvID={conversation_id or 'Nuova'}")
+        logger.info(f"[PID:{pid}] Chat: UserID={user_id}, ConvID={chat_request.conversation_id or 'Nuova'}")
         
-        # Gestione conversation_id
-        if not conversation_id:
-            conversation_id = await db_manager.create_conversation(user_id)
-            if not conversation_id:
-                logger.error(f"[PID:{pid}] Errore creazione conversazione")
-                raise HTTPException(status_code=500, detail="Errore creazione conversazione")
-            logger.info(f"[PID:{pid}] Nuova conversazione: {conversation_id}")
-        else:
-            existing_conv = await db_manager.get_conversation(conversation_id)
-            if not existing_conv:
-                logger.warning(f"[PID:{pid}] ConvID {conversation_id} non trovato, creo nuovo")
-                conversation_id = await db_manager.create_conversation(user_id) 
-                if not conversation_id:
-                    raise HTTPException(status_code=500, detail="Errore creazione conversazione")
-
-        # Salva messaggio utente
-        await db_manager.add_message(conversation_id, "user", message_text)
-
-        # Analisi intent
-        intent = analyze_intent(message_text) 
+        # Gestione conversation_id, poi messaggio utente e storico (dipendono dall'ID)
+        conversation_task = asyncio.create_task(get_or_create_conversation(user_id, chat_request.conversation_id))
+        
+        async def save_user_message() -> str:
+            conversation_id = await conversation_task
+            await db_manager.add_message(conversation_id, "user", message_text)
+            return conversation_id
+        
+        async def load_history() -> List[Dict[str, Any]]:
+            conversation_id = await user_message_task
+            return await db_manager.get_conversation_messages(conversation_id)
+        
+        user_message_task = asyncio.create_task(save_user_message())
+        history_task = asyncio.create_task(load_history())
+        # Analisi intent (spaCy, CPU) in un thread: non blocca il loop né le altre fasi
+        intent_task = asyncio.create_task(asyncio.to_thread(analyze_intent, message_text))
+        tasks = [conversation_task, user_message_task, history_task, intent_task]
+        
+        # Query RAG avviata subito: embedding e ricerca procedono mentre si attende l'intent
+        readiness = get_rag_readiness(request.app)
+        rag_ready = rag_system_instance and getattr(rag_system_instance, 'is_initialized', False)
+        rag_task: Optional[asyncio.Task] = None
+        
+        def start_rag_task() -> asyncio.Task:
+            if readiness["state"] == "partial":
+                logger.info(f"[PID:{pid}] Query su indice parziale ({readiness['progress_percent']}%)")
+            logger.debug(f"[PID:{pid}] Esecuzione query RAG...")
+            task = asyncio.create_task(rag_system_instance.get_response_async(query=message_text))
+            tasks.append(task)
+            return task
+        
+        if rag_ready and len(message_text.split()) >= SPECULATIVE_RAG_MIN_WORDS:
+            rag_task = start_rag_task()
+        
+        intent = await intent_task
         logger.info(f"[PID:{pid}] Intent: {intent.type} (conf: {intent.confidence:.2f})")
+        # Errori di conversazione/DB emergono qui, prima di attendere la generazione
+        conversation_id = await user_message_task
         
         final_bot_message: str = "" 
         rag_output_data: Dict[str, Any] = {"response": "", "sources": []} 
@@ -278,17 +477,18 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest):
                 logger.info(f"[PID:{pid}] Risposta diretta per {intent.type}")
         
         # RAG query se non risposta diretta
-        if not use_direct_response_flag:
-            rag_ready = rag_system_instance and getattr(rag_system_instance, 'is_initialized', False)
-            if not rag_ready:
-                logger.error(f"[PID:{pid}] RAG System non disponibile")
-                final_bot_message = "Mi dispiace, il sistema di ricerca non è al momento disponibile. Riprova più tardi."
-            else:
-                logger.debug(f"[PID:{pid}] Esecuzione query RAG...")
-                rag_output_data = await rag_system_instance.get_response_async(query=message_text) 
-                rag_response_text = rag_output_data.get("response", "")
-                logger.info(f"[PID:{pid}] Risposta RAG ottenuta ({len(rag_response_text)} caratteri)")
-                final_bot_message = response_prefix + rag_response_text
+        if use_direct_response_flag:
+            if rag_task is not None:
+                await cancel_pending([rag_task])
+        elif not rag_ready:
+            final_bot_message = rag_unavailable_message(readiness)
+        else:
+            if rag_task is None:
+                rag_task = start_rag_task()
+            rag_output_data = await rag_task
+            rag_response_text = rag_output_data.get("response", "")
+            logger.info(f"[PID:{pid}] Risposta RAG ottenuta ({len(rag_response_text)} caratteri)")
+            final_bot_message = response_prefix + rag_response_text
         
         # Fallback se risposta vuota
         if not final_bot_message or len(final_bot_message.strip()) < 5: 
@@ -299,8 +499,8 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest):
             else:
                 final_bot_message = "Mi dispiace, non sono riuscito a elaborare una risposta adeguata. Posso aiutarti con qualcos'altro?"
 
-        # Suggested actions
-        conversation_history = await db_manager.get_conversation_messages(conversation_id)
+        # Suggested actions (lo storico include già il messaggio utente)
+        conversation_history = await history_task
         suggested_actions = dialogue_manager.get_suggested_actions(intent, conversation_history)
         
         # Salva risposta
@@ -309,6 +509,7 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest):
             "intent_confidence": float(intent.confidence) if intent.confidence is not None else 0.0, 
             "rag_sources_data": rag_output_data.get("sources", []), 
             "direct_response_used": use_direct_response_flag,
+            "rag_readiness": get_rag_readiness(request.app)["state"],
             "custom_rag_mode": True
         }
         await db_manager.add_message(conversation_id, "assistant", final_bot_message, metadata=message_metadata)
@@ -316,13 +517,7 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest):
         logger.info(f"[PID:{pid}] Risposta inviata per ConvID {conversation_id}")
         
         # Format sources per response
-        response_sources = [
-            {
-                "source": source.get("source", "unknown") if isinstance(source, dict) else str(source),
-                "content": source.get("content", "") if isinstance(source, dict) else ""
-            }
-            for source in rag_output_data.get("sources", [])
-        ]
+        response_sources = format_sources(rag_output_data.get("sources", []))
 
         return ChatResponse(
             message=final_bot_message,
@@ -336,6 +531,145 @@ async def chat_endpoint(request: Request, chat_request: ChatRequest):
     except Exception as e:
         logger.error(f"[PID:{pid}] Errore chat endpoint: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail="Errore interno del server")
+    finally:
+        await cancel_pending(tasks)
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Evento Server-Sent Events con payload JSON"""
+    return f"event: {event}\ndata: {json.dumps(jsonable_encoder(data), ensure_ascii=False)}\n\n"
+
+
+@app.post("/api/chat/stream", tags=["Chat"])
+async def chat_stream_endpoint(request: Request, chat_request: ChatRequest):
+    """
+    Chat in streaming (text/event-stream). Eventi:
+    `meta` (conversation_id, intent), `sources` appena concluso il retrieval,
+    `token` per ogni frammento della risposta, `done` con messaggio completo e
+    azioni suggerite (il messaggio viene salvato prima di `done`), `error`.
+    """
+    rag_system_instance: Optional[CustomRAGEngine] = request.app.state.rag_system
+    pid = os.getpid()
+    user_id = chat_request.user_id
+    message_text = chat_request.message
+    logger.info(f"[PID:{pid}] Chat stream: UserID={user_id}, ConvID={chat_request.conversation_id or 'Nuova'}")
+    
+    # Conversazione e messaggio utente prima dello stream: gli errori restano HTTP 500
+    conversation_id = await get_or_create_conversation(user_id, chat_request.conversation_id)
+    await db_manager.add_message(conversation_id, "user", message_text)
+    # Analisi intent (spaCy, CPU) in un thread: non blocca il loop
+    intent = await asyncio.to_thread(analyze_intent, message_text)
+    logger.info(f"[PID:{pid}] Intent: {intent.type} (conf: {intent.confidence:.2f})")
+    
+    async def event_stream():
+        started = time.time()
+        answer_parts: List[str] = []
+        sources: List[Any] = []
+        stream_stats: Dict[str, Any] = {}
+        use_direct_response_flag = False
+        saved = False
+        
+        async def save_answer(final_bot_message: str, interrupted: bool = False):
+            message_metadata = {
+                "intent_type": intent.type,
+                "intent_confidence": float(intent.confidence) if intent.confidence is not None else 0.0,
+                "rag_sources_data": sources,
+                "direct_response_used": use_direct_response_flag,
+                "rag_readiness": get_rag_readiness(request.app)["state"],
+                "custom_rag_mode": True,
+                "streamed": True,
+                "stream_interrupted": interrupted,
+                "time_to_first_token_ms": stream_stats.get("time_to_first_token_ms")
+            }
+            await db_manager.add_message(conversation_id, "assistant", final_bot_message, metadata=message_metadata)
+        
+        try:
+            yield sse_event("meta", {
+                "conversation_id": conversation_id,
+                "intent": {"type": intent.type, "confidence": intent.confidence}
+            })
+            
+            response_prefix = dialogue_manager.get_response_prefix(intent)
+            direct_response_text = None
+            if intent.type in DIRECT_RESPONSE_INTENTS and intent.confidence >= DIRECT_RESPONSE_CONFIDENCE_THRESHOLD:
+                direct_response_text = dialogue_manager.get_direct_response(intent)
+            
+            rag_ready = rag_system_instance and getattr(rag_system_instance, 'is_initialized', False)
+            if direct_response_text:
+                use_direct_response_flag = True
+                logger.info(f"[PID:{pid}] Risposta diretta per {intent.type}")
+                answer_parts.append(direct_response_text)
+                yield sse_event("token", {"content": direct_response_text})
+            elif not rag_ready:
+                unavailable_text = rag_unavailable_message(get_rag_readiness(request.app))
+                answer_parts.append(unavailable_text)
+                yield sse_event("token", {"content": unavailable_text})
+            elif hasattr(rag_system_instance, "query_stream"):
+                if response_prefix:
+                    answer_parts.append(response_prefix)
+                    yield sse_event("token", {"content": response_prefix})
+                async for event in rag_system_instance.query_stream(message_text):
+                    if event["type"] == "sources":
+                        sources = event["sources"]
+                        yield sse_event("sources", {
+                            "sources": format_sources(sources),
+                            "confidence": event["confidence"],
+                            "retrieval_time_ms": event["retrieval_time_ms"]
+                        })
+                    elif event["type"] == "token":
+                        answer_parts.append(event["content"])
+                        yield sse_event("token", {"content": event["content"]})
+                    elif event["type"] == "done":
+                        stream_stats = event
+            else:
+                # Engine senza streaming: risposta completa come unico frammento
+                rag_output_data = await rag_system_instance.get_response_async(query=message_text)
+                sources = rag_output_data.get("sources", [])
+                yield sse_event("sources", {"sources": format_sources(sources)})
+                answer_parts.append(response_prefix + rag_output_data.get("response", ""))
+                yield sse_event("token", {"content": answer_parts[-1]})
+            
+            final_bot_message = "".join(answer_parts).strip()
+            if len(final_bot_message) < 5:
+                logger.warning(f"[PID:{pid}] Risposta vuota, uso fallback")
+                final_bot_message = dialogue_manager.get_fallback_response(intent) or \
+                    "Mi dispiace, non sono riuscito a elaborare una risposta adeguata. Posso aiutarti con qualcos'altro?"
+            
+            conversation_history = await db_manager.get_conversation_messages(conversation_id)
+            suggested_actions = dialogue_manager.get_suggested_actions(intent, conversation_history)
+            await save_answer(final_bot_message)
+            saved = True
+            
+            logger.info(
+                f"[PID:{pid}] Stream completato per ConvID {conversation_id} in {int((time.time() - started) * 1000)}ms "
+                f"(primo token: {stream_stats.get('time_to_first_token_ms')}ms)"
+            )
+            yield sse_event("done", {
+                "message": final_bot_message,
+                "conversation_id": conversation_id,
+                "suggested_actions": suggested_actions,
+                "sources": format_sources(sources),
+                "query_time_ms": stream_stats.get("query_time_ms"),
+                "time_to_first_token_ms": stream_stats.get("time_to_first_token_ms")
+            })
+        
+        except asyncio.CancelledError:
+            # Client disconnesso: conserva la parte di risposta già generata
+            if not saved and answer_parts:
+                logger.info(f"[PID:{pid}] Stream interrotto dal client per ConvID {conversation_id}")
+                await asyncio.shield(save_answer("".join(answer_parts).strip(), interrupted=True))
+            raise
+        except Exception as e:
+            logger.error(f"[PID:{pid}] Errore chat stream: {e}", exc_info=True)
+            yield sse_event("error", {"detail": "Errore interno del server"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # niente buffering nei reverse proxy (nginx/Railway)
+        }
+    )
 
 @app.get("/api/health", summary="Health check del sistema", tags=["System"])
 async def health_check_endpoint(request: Request): 
@@ -382,7 +716,9 @@ async def health_check_endpoint(request: Request):
         "components": {
             "database_connection": {"status": "ok" if db_ok else "error", "details": details_db},
             "rag_system": {"status": "ready" if rag_is_initialized else "not_ready", 
-                           "details": details_rag}
+                           "details": details_rag,
+                           "readiness": get_rag_readiness(request.app)["state"]},
+            "event_loop": event_loop_monitor.get_stats()
         },
         "version": APP_VERSION
     }
@@ -537,6 +873,79 @@ async def clear_system_cache_endpoint(request: Request):
         "deployment": "Railway - Custom RAG + React UI"
     }
 
+@app.get("/api/ready", summary="Readiness del sistema RAG", tags=["System"])
+async def readiness_endpoint(request: Request):
+    """
+    200 quando l'indice è completo, 503 durante il riscaldamento (con avanzamento
+    dell'ingestione). `serving_queries` indica se la chat usa già un indice parziale.
+    """
+    readiness = get_rag_readiness(request.app)
+    return JSONResponse(
+        status_code=200 if readiness["ready"] else 503,
+        content={
+            "status": readiness["state"],
+            "timestamp": datetime.datetime.now(timezone.utc).isoformat(),
+            **readiness
+        }
+    )
+
+@app.get("/api/system/import-profile", summary="Profilo degli import all'avvio", tags=["System"])
+async def import_profile_endpoint(request: Request, limit: int = 25, refresh: bool = False):
+    """
+    Tempi di import per modulo (`python -X importtime -c "import main"` in un processo
+    separato, in cache fino a `refresh=true`) e stato del processo corrente.
+    """
+    try:
+        profile = await profile_imports("main", limit=limit, refresh=refresh)
+    except Exception as e:
+        logger.error(f"Errore profilo import: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Profilo import non disponibile: {e}")
+    
+    return {
+        "status": "success",
+        "timestamp": datetime.datetime.now(timezone.utc).isoformat(),
+        "process": {
+            "pid": os.getpid(),
+            "fast_start": FAST_START,
+            "startup_seconds": request.app.state.startup_seconds,
+            "rss_mb": round(psutil.Process().memory_info().rss / (1024 * 1024), 1),
+            "heavy_modules_loaded": loaded_heavy_modules()
+        },
+        "import_profile": profile
+    }
+
+@app.post("/api/rag/reindex", status_code=202, summary="Avvia reindicizzazione in background", tags=["RAG"])
+async def reindex_endpoint(request: Request, full: bool = False):
+    """
+    Accoda la reindicizzazione di DOCS_DIRECTORY. Il nuovo indice viene costruito
+    accanto a quello live e sostituito atomicamente: la chat resta disponibile.
+    `full=true` ricostruisce da zero invece di riprocessare solo i file cambiati.
+    """
+    reindex_manager = request.app.state.reindex_manager
+    if reindex_manager is None:
+        raise HTTPException(status_code=503, detail="Reindicizzazione non disponibile")
+    
+    if reindex_manager.is_running():
+        return JSONResponse(
+            status_code=409,
+            content={"status": "already_running", "job": reindex_manager.get_status()}
+        )
+    
+    job = reindex_manager.start(request.app.state, full=full)
+    return {"status": "accepted", "job": job, "status_url": "/api/rag/reindex/status"}
+
+@app.get("/api/rag/reindex/status", summary="Stato della reindicizzazione", tags=["RAG"])
+async def reindex_status_endpoint(request: Request):
+    reindex_manager = request.app.state.reindex_manager
+    if reindex_manager is None:
+        raise HTTPException(status_code=503, detail="Reindicizzazione non disponibile")
+    docs_watcher = request.app.state.docs_watcher
+    return {
+        "status": "success",
+        "job": reindex_manager.get_status(),
+        "watcher": docs_watcher.get_status() if docs_watcher is not None else {"running": False}
+    }
+
 # ===== STATIC FILES E SPA ROUTING =====
 static_dir_name = "static"
 static_dir_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), static_dir_name)
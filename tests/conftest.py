@@ -0,0 +1,61 @@
+# tests/conftest.py
+"""
+Configurazione comune dei test: database, indici e documenti in una directory
+temporanea, nessuna chiamata a OpenAI (embedding deterministici in locale).
+"""
+
+import hashlib
+import os
+import sys
+import tempfile
+from typing import List
+
+import numpy as np
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+# Prima di importare app.config: i path vengono letti all'import
+_TMP_DIR = tempfile.mkdtemp(prefix="chatbot_tests_")
+os.environ.update({
+    "OPENAI_API_KEY": "test-key",
+    "DB_PATH": os.path.join(_TMP_DIR, "conversations.db"),
+    "VECTOR_DB_PATH": os.path.join(_TMP_DIR, "vector_store.db"),
+    "SMART_CACHE_DB_PATH": os.path.join(_TMP_DIR, "smart_cache.db"),
+    "OCR_CACHE_DB_PATH": "",
+    "INDEX_SNAPSHOT_PATH": os.path.join(_TMP_DIR, "index_snapshot"),
+    "DOCS_DIRECTORY": os.path.join(_TMP_DIR, "docs"),
+    "LOG_FILE": os.path.join(_TMP_DIR, "logs", "chatbot_app.log"),
+    "PERFORMANCE_METRICS_FILE": os.path.join(_TMP_DIR, "logs", "performance_metrics.json"),
+    "DOCS_WATCH_ENABLED": "false",
+    "FAST_START": "true",
+})
+
+
+class FakeEmbeddingManager:
+    """Embedding deterministici (hash del testo) con la stessa interfaccia di EmbeddingManager"""
+
+    def __init__(self, dimensions: int = 1536):
+        self.model = "fake-embedding"
+        self.dimensions = dimensions
+        self.embedding_cache = {}
+        self.calls = 0
+
+    async def get_embedding(self, text: str) -> List[float]:
+        self.calls += 1
+        seed = int.from_bytes(hashlib.md5(text.encode()).digest()[:4], "little")
+        return np.random.default_rng(seed).standard_normal(self.dimensions).astype(np.float32).tolist()
+
+    async def get_embeddings_batch(self, texts: List[str], batch_size: int = 20) -> List[List[float]]:
+        return [await self.get_embedding(text) for text in texts]
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def fake_embedding_manager():
+    return FakeEmbeddingManager()
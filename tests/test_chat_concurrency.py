@@ -0,0 +1,79 @@
+# tests/test_chat_concurrency.py
+"""Le fasi indipendenti di /api/chat girano in parallelo: la latenza è il massimo, non la somma"""
+
+import asyncio
+import time
+from typing import Tuple
+
+import httpx
+import pytest
+
+import main
+from app.models.schemas import Intent
+from app.utils.db_manager import init_database
+
+INTENT_SECONDS = 0.3
+RETRIEVAL_SECONDS = 0.2
+LLM_SECONDS = 0.3
+
+
+class FakeRAGSystem:
+    """Retrieval e generazione con durate note"""
+    is_initialized = True
+    ingestion_status = {"state": "completed"}
+
+    def __init__(self):
+        self.queries = []
+
+    async def get_response_async(self, query: str, **kwargs):
+        self.queries.append(query)
+        await asyncio.sleep(RETRIEVAL_SECONDS)
+        await asyncio.sleep(LLM_SECONDS)
+        return {"response": "La RCA copre i danni causati a terzi.", "sources": [{"source": "polizza_auto.txt", "content": "RCA"}]}
+
+
+@pytest.fixture
+def fake_rag(monkeypatch):
+    rag = FakeRAGSystem()
+    monkeypatch.setattr(main.app.state, "rag_system", rag)
+    monkeypatch.setattr(main.app.state, "rag_init_task", None)
+    monkeypatch.setattr(main.app.state, "rag_init_error", None)
+    return rag
+
+
+def stub_intent(monkeypatch, intent_type: str, confidence: float):
+    def slow_analyze_intent(message: str) -> Intent:
+        time.sleep(INTENT_SECONDS)  # CPU (spaCy): gira in un thread
+        return Intent(type=intent_type, confidence=confidence)
+    monkeypatch.setattr(main, "analyze_intent", slow_analyze_intent)
+
+
+async def post_chat(message: str) -> Tuple[httpx.Response, float]:
+    await init_database()
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+        started = time.perf_counter()
+        response = await client.post("/api/chat", json={"message": message, "user_id": "test-user"})
+        return response, time.perf_counter() - started
+
+
+@pytest.mark.anyio
+async def test_chat_latency_is_max_of_stages_not_sum(monkeypatch, fake_rag):
+    stub_intent(monkeypatch, "copertura", 0.5)
+
+    response, elapsed = await post_chat("Cosa copre la polizza RCA auto?")
+
+    assert response.status_code == 200
+    assert "RCA" in response.json()["message"]
+    critical_path = max(INTENT_SECONDS, RETRIEVAL_SECONDS + LLM_SECONDS)
+    serial = INTENT_SECONDS + RETRIEVAL_SECONDS + LLM_SECONDS
+    assert critical_path <= elapsed < critical_path + (serial - critical_path) / 2
+
+
+@pytest.mark.anyio
+async def test_short_greeting_skips_speculative_rag(monkeypatch, fake_rag):
+    stub_intent(monkeypatch, "saluto", 0.9)
+
+    response, _ = await post_chat("Ciao")
+
+    assert response.status_code == 200
+    assert fake_rag.queries == []
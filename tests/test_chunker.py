@@ -0,0 +1,29 @@
+# tests/test_chunker.py
+"""Il chunker resta lineare e a budget anche su testo senza punteggiatura"""
+
+import time
+
+from app.modules.chunker import StructuredChunker, count_tokens
+
+
+def test_unpunctuated_text_is_cut_at_budget_in_linear_time():
+    lines = [f"riga numero {i} di un estratto OCR senza punteggiatura" for i in range(4000)]
+    chunker = StructuredChunker(max_tokens=300, overlap_tokens=0)
+
+    started = time.perf_counter()
+    chunks = []
+    for line in lines:
+        chunks.extend(chunker.feed(line + "\n"))
+        assert chunker._paragraph_tokens < chunker.max_tokens
+    chunks.extend(chunker.flush())
+    elapsed = time.perf_counter() - started
+
+    assert elapsed < 2.0
+    assert all(count_tokens(chunk) <= chunker.max_tokens for chunk in chunks)
+    assert " ".join(chunks).split() == " ".join(lines).split()
+
+
+def test_sentences_across_lines_and_segments():
+    chunker = StructuredChunker(max_tokens=50, overlap_tokens=0)
+    segments = ["Prima frase.\nSeconda frase continua\nqui. Terza", " frase\nfinale"]
+    assert list(chunker.chunk(segments)) == ["Prima frase. Seconda frase continua qui. Terza frase finale"]
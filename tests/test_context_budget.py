@@ -0,0 +1,44 @@
+# tests/test_context_budget.py
+"""Il contesto resta entro il budget di token senza perdere i chunk più lunghi del budget"""
+
+import pytest
+
+from app.config import get_config
+from app.modules import rag_system
+from app.modules.chunker import count_tokens
+from conftest import FakeEmbeddingManager
+
+MAX_CONTEXT_TOKENS = 200
+
+
+@pytest.fixture
+async def engine(tmp_path):
+    config = {**get_config(), "VECTOR_DB_PATH": str(tmp_path / "vector_store.db"),
+              "MAX_CONTEXT_TOKENS": MAX_CONTEXT_TOKENS}
+    return await rag_system.build_custom_rag_system(config, embedding_manager=FakeEmbeddingManager())
+
+
+@pytest.mark.anyio
+async def test_long_top_chunk_without_sentence_boundary_is_cut(engine):
+    # Estratto OCR senza punteggiatura, da solo oltre il budget
+    content = " ".join(f"massimale{i} garanzia furto incendio" for i in range(200))
+    doc = rag_system.Document("polizza_1", content, {"source_file": "polizza_scansionata.pdf"})
+
+    context = engine._build_context([(0.9, doc)], MAX_CONTEXT_TOKENS)
+
+    assert context.startswith("[Fonte: polizza_scansionata.pdf]\nmassimale0 garanzia")
+    assert count_tokens(context) <= MAX_CONTEXT_TOKENS
+    assert count_tokens(context) > MAX_CONTEXT_TOKENS // 2
+    # Il taglio cade tra due parole
+    assert context.rstrip().split()[-1] in content.split()
+
+
+@pytest.mark.anyio
+async def test_long_chunk_is_trimmed_at_sentence_end_when_possible(engine):
+    sentences = [f"La garanzia {i} copre i danni da incendio." for i in range(100)]
+    doc = rag_system.Document("polizza_2", " ".join(sentences), {"source_file": "polizza.md"})
+
+    context = engine._build_context([(0.9, doc)], MAX_CONTEXT_TOKENS)
+
+    assert context.rstrip().endswith("incendio.")
+    assert count_tokens(context) <= MAX_CONTEXT_TOKENS
@@ -0,0 +1,38 @@
+# tests/test_faq_index.py
+"""Il match lessicale delle FAQ non risponde a domande di senso opposto"""
+
+from pathlib import Path
+
+import pytest
+
+from app.modules.faq_index import FAQEntry, FAQIndex, extract_faq_pairs
+
+FAQ_FILE = Path(__file__).resolve().parent.parent / "insurance_docs" / "faq_polizze_auto_casa.md"
+
+
+@pytest.fixture(scope="module")
+def faq_index():
+    pairs = extract_faq_pairs(FAQ_FILE.read_text(encoding="utf-8"))
+    return FAQIndex([FAQEntry(FAQ_FILE.name, question, answer) for question, answer in pairs])
+
+
+@pytest.mark.parametrize("question", [
+    "La mia polizza auto non è valida se guido all'estero?",
+    "Cosa succede se abito più nell'abitazione assicurata per un lungo periodo?",
+    "La polizza casa copre i danni causati da una perdita d'acqua al vicino?",
+    "Posso sospendere la mia polizza auto se uso il veicolo per un periodo?",
+])
+def test_negation_or_preposition_change_is_not_a_match(faq_index, question):
+    assert faq_index.match_lexical(question) is None
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("la mia polizza auto è valida se guido all'estero", "La mia polizza auto è valida se guido all'estero?"),
+    ("Come funziona   il sistema Bonus/Malus?!", "Come funziona il sistema Bonus/Malus?"),
+    ("Scusi, la polizza casa copre i danni causati da una perdita d'acqua del vicino?",
+     "La polizza casa copre i danni causati da una perdita d'acqua del vicino?"),
+])
+def test_same_question_reworded_matches(faq_index, question, expected):
+    match = faq_index.match_lexical(question)
+    assert match is not None
+    assert match.entry.question == expected
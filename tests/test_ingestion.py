@@ -0,0 +1,95 @@
+# tests/test_ingestion.py
+"""Pipeline di ingestione: i batch con embedding falliti non finiscono nell'indice, l'indice parziale è interrogabile solo a file completi"""
+
+import asyncio
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+from app.config import get_config
+from app.modules import rag_system
+from conftest import FakeEmbeddingManager
+
+
+class FailingEmbeddingManager(FakeEmbeddingManager):
+    """Vettori nulli (come EmbeddingManager dopo un errore API) per i batch che contengono `marker`"""
+
+    def __init__(self, marker: str):
+        super().__init__()
+        self.marker = marker
+
+    async def get_embeddings_batch(self, texts, batch_size: int = 20):
+        if any(self.marker in text for text in texts):
+            return [[0.0] * self.dimensions for _ in texts]
+        return await super().get_embeddings_batch(texts, batch_size)
+
+
+@pytest.mark.anyio
+async def test_failed_embedding_batch_is_not_stored(tmp_path):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    (docs_dir / "polizza_ok.txt").write_text("La RCA auto copre i danni causati a terzi dalla circolazione del veicolo.")
+    (docs_dir / "polizza_ko.txt").write_text("ERRORE_EMBEDDING: la garanzia furto copre il veicolo rubato.")
+
+    config = {**get_config(), "VECTOR_DB_PATH": str(tmp_path / "vector_store.db"), "INGEST_WORKERS": 1}
+    engine = await rag_system.build_custom_rag_system(config, embedding_manager=FailingEmbeddingManager("ERRORE_EMBEDDING"))
+    await engine.initialize_documents(str(docs_dir))
+
+    with sqlite3.connect(config["VECTOR_DB_PATH"]) as db:
+        rows = db.execute("SELECT metadata_json, embedding_blob FROM vector_documents").fetchall()
+    assert {json.loads(metadata)["source_file"] for metadata, _ in rows} == {"polizza_ok.txt"}
+    assert all(np.frombuffer(blob, dtype=np.float32).any() for _, blob in rows)
+
+    manifest = await engine.vector_store.get_manifest()
+    assert [entry["path"] for entry in manifest.values()] == ["polizza_ok.txt"]
+    assert engine.ingestion_status["files_failed"] == 1
+
+
+class GatedEmbeddingManager(FakeEmbeddingManager):
+    """Risponde al primo batch, poi attende `release` prima dei successivi"""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+        self.waiting = asyncio.Event()
+        self.release = asyncio.Event()
+
+    async def get_embeddings_batch(self, texts, batch_size: int = 20):
+        self.batches += 1
+        if self.batches > 1:
+            self.waiting.set()
+            await self.release.wait()
+        return await super().get_embeddings_batch(texts, batch_size)
+
+
+@pytest.mark.anyio
+async def test_not_initialized_until_first_file_completes(tmp_path):
+    docs_dir = tmp_path / "docs"
+    docs_dir.mkdir()
+    sections = [f"## Articolo {i}\n\nLa garanzia {i} copre il rischio numero {i} con massimale {i * 1000} euro." for i in range(12)]
+    (docs_dir / "polizza.md").write_text("\n\n".join(sections))
+
+    config = {**get_config(), "VECTOR_DB_PATH": str(tmp_path / "vector_store.db"), "INGEST_WORKERS": 1,
+              "CHUNK_SIZE_TOKENS": 20, "CHUNK_OVERLAP_TOKENS": 0, "BATCH_SIZE_EMBEDDINGS": 2,
+              "EMBEDDING_CONCURRENCY": 1}
+    embedding_manager = GatedEmbeddingManager()
+    engine = await rag_system.build_custom_rag_system(config, embedding_manager=embedding_manager)
+    ingestion = asyncio.create_task(engine.initialize_documents(str(docs_dir)))
+    try:
+        await asyncio.wait_for(embedding_manager.waiting.wait(), timeout=30)
+        # Il primo batch viene scritto, ma il file non è ancora completo
+        for _ in range(100):
+            if engine.ingestion_status["chunks_indexed"]:
+                break
+            await asyncio.sleep(0.01)
+        assert engine.ingestion_status["chunks_indexed"] > 0
+        assert engine.ingestion_status["files_processed"] == 0
+        assert not engine.is_initialized
+    finally:
+        embedding_manager.release.set()
+        await asyncio.wait_for(ingestion, timeout=30)
+
+    assert engine.ingestion_status["files_processed"] == 1
+    assert engine.is_initialized
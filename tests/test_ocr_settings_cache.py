@@ -0,0 +1,48 @@
+# tests/test_ocr_settings_cache.py
+"""Il rilevamento di lingua e DPI sulla pagina campione viene riusato dalla cache OCR"""
+
+import numpy as np
+
+from app.modules import enterprise_pdf_processor
+
+
+class CountingEngine:
+    """Engine OCR finto: conta le passate di Tesseract sulla pagina campione"""
+    name = "fake"
+
+    def __init__(self):
+        self.word_data_calls = 0
+
+    def version(self) -> str:
+        return "1.0"
+
+    def languages(self):
+        return ["ita", "eng"]
+
+    def word_data(self, pixels, lang):
+        self.word_data_calls += 1
+        return [(50.0, 16)] * 10
+
+
+def test_detected_settings_are_cached(monkeypatch, tmp_path):
+    engine = CountingEngine()
+    monkeypatch.setattr(enterprise_pdf_processor, "get_ocr_engine", lambda preference="auto": engine)
+    cache_path = str(tmp_path / "ocr_cache.db")
+    pixels = np.full((200, 100), 255, dtype=np.uint8)
+    options = {"OCR_LANGUAGES": "ita+eng"}
+
+    first = enterprise_pdf_processor.detect_ocr_settings_in_worker(pixels, options, "a.pdf", cache_path)
+    calls = engine.word_data_calls
+    assert calls == 3  # nessuna lingua raggiunge la confidenza minima
+    assert first["zoom"] == 4.0
+
+    again = enterprise_pdf_processor.detect_ocr_settings_in_worker(pixels.copy(), options, "a.pdf", cache_path)
+    assert again == first
+    assert engine.word_data_calls == calls
+
+    # Opzioni o pagina campione diverse: nuovo rilevamento
+    enterprise_pdf_processor.detect_ocr_settings_in_worker(pixels, {"OCR_LANGUAGES": "eng"}, "a.pdf", cache_path)
+    assert engine.word_data_calls > calls
+    calls = engine.word_data_calls
+    enterprise_pdf_processor.detect_ocr_settings_in_worker(pixels[:100], options, "b.pdf", cache_path)
+    assert engine.word_data_calls > calls
@@ -0,0 +1,94 @@
+# tests/test_readiness.py
+"""
+/api/health e /api/ready rispondono mentre la pipeline di ingestione reale è in corso:
+creazione dell'engine, estrazione, embedding e scrittura non bloccano l'event loop.
+"""
+
+import asyncio
+
+import httpx
+import pytest
+
+import main
+from app.config import get_config
+from app.modules import rag_system
+from app.utils.performance_monitor import EventLoopLagMonitor
+from conftest import FakeEmbeddingManager
+
+DOCS_COUNT = 80
+# Lag dell'event loop dall'avvio alla fine dell'ingestione. Il p99 include i passaggi
+# del GIL con i thread di SQLite e delle code (intervallo di switch 5ms), il picco
+# l'avvio dei processi di estrazione e il caricamento dei certificati dei client OpenAI
+P99_LAG_BOUND_MS = 15.0
+MAX_LAG_BOUND_MS = 100.0
+
+
+class SlowEmbeddingManager(FakeEmbeddingManager):
+    """Embedding deterministici con la latenza di una richiesta all'API"""
+
+    async def get_embeddings_batch(self, texts, batch_size: int = 20):
+        await asyncio.sleep(0.05)
+        return await super().get_embeddings_batch(texts, batch_size)
+
+
+def write_docs(docs_dir):
+    docs_dir.mkdir()
+    for i in range(DOCS_COUNT):
+        paragraphs = [
+            f"Articolo {j} - La garanzia {i}.{j} copre i danni causati a terzi dal veicolo assicurato. "
+            f"Il massimale per sinistro {i}-{j} è indicato nella scheda di polizza e si applica per anno."
+            for j in range(1, 30)
+        ]
+        (docs_dir / f"polizza_{i:03d}.txt").write_text("\n\n".join(paragraphs), encoding="utf-8")
+
+
+@pytest.mark.anyio
+async def test_event_loop_responsive_during_real_ingestion(monkeypatch, tmp_path):
+    docs_dir = tmp_path / "docs"
+    write_docs(docs_dir)
+    config = {
+        **get_config(),
+        "DOCS_DIRECTORY": str(docs_dir),
+        "VECTOR_DB_PATH": str(tmp_path / "vector_store.db"),
+        "INDEX_SNAPSHOT_PATH": str(tmp_path / "index_snapshot"),
+        "INGEST_WORKERS": 2,
+    }
+
+    async def prepare_with_fake_embeddings(rag_config):
+        return await rag_system.build_custom_rag_system(rag_config, embedding_manager=SlowEmbeddingManager())
+
+    monkeypatch.setattr(main, "get_config", lambda: config)
+    monkeypatch.setattr(main, "prepare_custom_rag_system", prepare_with_fake_embeddings)
+    monkeypatch.setattr(main.app.state, "rag_system", None)
+    monkeypatch.setattr(main.app.state, "rag_init_error", None)
+
+    lag_monitor = EventLoopLagMonitor(interval=0.005, window=10_000)
+    lag_monitor.start()
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            readiness_states, progress = set(), []
+            while not main.app.state.rag_init_task.done():
+                health = await client.get("/api/health")
+                assert health.status_code == 200
+
+                ready = await client.get("/api/ready")
+                if not main.app.state.rag_init_task.done():
+                    assert ready.status_code == 503
+                readiness_states.add(ready.json()["status"])
+                progress.append(ready.json()["progress_percent"])
+                await asyncio.sleep(0.02)
+            await lag_monitor.stop()
+
+            ready = await client.get("/api/ready")
+            assert ready.status_code == 200
+            assert ready.json()["status"] == "ready"
+
+    assert main.app.state.rag_system.ingestion_status["files_processed"] == DOCS_COUNT
+    assert readiness_states & {"warming_up", "partial"}
+    assert progress == sorted(progress) and any(0 < value < 100 for value in progress)
+
+    stats = lag_monitor.get_stats()
+    assert stats["samples"] > 100
+    assert stats["p99_lag_ms"] < P99_LAG_BOUND_MS, stats
+    assert stats["max_lag_ms_since_start"] < MAX_LAG_BOUND_MS, stats
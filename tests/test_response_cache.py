@@ -0,0 +1,37 @@
+# tests/test_response_cache.py
+"""L'impronta della response cache cambia con le impostazioni che cambiano la risposta"""
+
+import pytest
+
+from app.config import get_config
+from app.modules import rag_system
+from conftest import FakeEmbeddingManager
+
+
+async def cache_fingerprint(config) -> str:
+    engine = await rag_system.build_custom_rag_system(config, embedding_manager=FakeEmbeddingManager())
+    engine.ingestion_status = {"state": "completed"}
+    return (await engine._response_cache_context())["index"]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("setting, value", [
+    ("LLM_MODEL_NAME", "gpt-4o-mini"),
+    ("RERANKER_ENABLED", True),
+    ("CONTEXT_COMPRESSION_ENABLED", True),
+    ("MAX_CONTEXT_TOKENS", 400),
+])
+async def test_fingerprint_covers_generation_settings(tmp_path, setting, value):
+    config = {
+        **get_config(),
+        "VECTOR_DB_PATH": str(tmp_path / "vector_store.db"),
+        "RESPONSE_CACHE_ENABLED": True,
+        "LLM_MODEL_NAME": "gpt-3.5-turbo",
+        "RERANKER_ENABLED": False,
+        "CONTEXT_COMPRESSION_ENABLED": False,
+        "MAX_CONTEXT_TOKENS": 1000
+    }
+    baseline = await cache_fingerprint(config)
+
+    assert await cache_fingerprint(config) == baseline
+    assert await cache_fingerprint({**config, setting: value}) != baseline
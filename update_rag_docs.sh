@@ -61,7 +61,7 @@ if [[ "$TRIGGER_API" == "s" || "$TRIGGER_API" == "S" ]]; then
     else
         echo "Attenzione: Richiesta di aggiornamento/re-index RAG fallita (HTTP $API_RESPONSE_CODE)."
     fi
-    echo "Controllare i log del backend per i dettagli del processo di re-indicizzazione."
+    echo "La re-indicizzazione prosegue in background; stato: ${RAG_UPDATE_API_ENDPOINT}/status"
 else
     echo "Aggiornamento RAG tramite API saltato. Potrebbe essere necessario un riavvio del backend."
 fi